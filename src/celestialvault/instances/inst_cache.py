@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+# 命中缓存时还原到响应中的响应头，其余响应头（如 Content-Encoding）与缓存内容无关
+_STORED_HEADERS = ("content-type", "etag", "last-modified")
+
+
+class ResponseCache:
+    """
+    持久化的 HTTP 响应缓存：索引保存在 SQLite 中，响应体按键保存在磁盘上，总大小超过上限时按 LRU 淘汰。
+
+    只缓存带有 ETag 或 Last-Modified 的 200 响应。再次请求时 Fetcher 会带上
+    If-None-Match / If-Modified-Since 发送条件请求，服务器返回 304 时直接使用缓存内容。
+    缓存是线程安全的，同一个实例可以同时被 Fetcher 与 AsyncFetcher 使用。
+    """
+
+    def __init__(self, cache_dir: str | Path, max_size: int = 512 * 1024 * 1024):
+        """
+        :param cache_dir: 缓存目录，不存在时会自动创建。
+        :param max_size: 响应体的总大小上限（字节）。
+        """
+        if max_size <= 0:
+            raise ValueError(f"max_size 必须大于 0: {max_size}")
+        self.cache_dir = Path(cache_dir)
+        self.blob_dir = self.cache_dir / "blobs"
+        self.max_size = max_size
+
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            self.cache_dir / "index.sqlite", check_same_thread=False
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+        )
+        self._db.commit()
+        self._total_size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(
+        method: str,
+        url: str | httpx.URL,
+        params: Any = None,
+        body: Any = None,
+    ) -> str:
+        """
+        由请求方法、URL（含查询参数）与请求体生成缓存键。
+
+        :param method: 请求方法。
+        :param url: 请求的 URL 地址。
+        :param params: 查询参数。
+        :param body: 请求体，可以是 bytes、str 或可 JSON 序列化的对象。
+        :return: 十六进制的 sha256 键。
+        """
+        full_url = str(httpx.URL(str(url), params=params) if params else url)
+        if body is None:
+            body_bytes = b""
+        elif isinstance(body, bytes):
+            body_bytes = body
+        elif isinstance(body, str):
+            body_bytes = body.encode("utf-8")
+        else:
+            body_bytes = json.dumps(
+                body, sort_keys=True, ensure_ascii=False, default=str
+            ).encode("utf-8")
+
+        hasher = hashlib.sha256(f"{method.upper()} {full_url}\n".encode("utf-8"))
+        hasher.update(body_bytes)
+        return hasher.hexdigest()
+
+    def _blob_path(self, key: str) -> Path:
+        return self.blob_dir / key[:2] / key
+
+    def get_validators(self, key: str) -> dict[str, str]:
+        """
+        获取条件请求所需的请求头。
+
+        :param key: 缓存键。
+        :return: 包含 If-None-Match / If-Modified-Since 的字典，未缓存或响应体已丢失时为空字典。
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT headers FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and not self._blob_path(key).exists():
+                # 响应体已丢失，不能再用条件请求，否则 304 时没有内容可用
+                self._delete_locked(key)
+                self._db.commit()
+                row = None
+        if row is None:
+            return {}
+        headers = json.loads(row[0])
+        validators = {}
+        if "etag" in headers:
+            validators["If-None-Match"] = headers["etag"]
+        if "last-modified" in headers:
+            validators["If-Modified-Since"] = headers["last-modified"]
+        return validators
+
+    def load(
+        self, key: str, request: httpx.Request | None = None
+    ) -> httpx.Response | None:
+        """
+        读取缓存的响应并刷新其访问时间。
+
+        :param key: 缓存键。
+        :param request: 关联到还原响应上的请求。
+        :return: 还原的 httpx.Response，未缓存或响应体丢失时为 None。
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                content = self._blob_path(key).read_bytes()
+            except FileNotFoundError:
+                self._delete_locked(key)
+                return None
+            self._db.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+
+        status, headers = row
+        return httpx.Response(
+            status, headers=json.loads(headers), content=content, request=request
+        )
+
+    def store(self, key: str, response: httpx.Response) -> bool:
+        """
+        缓存一个已读取完毕的响应；只缓存带有 ETag 或 Last-Modified 的 200 响应。
+
+        :param key: 缓存键。
+        :param response: 响应对象。
+        :return: 是否写入了缓存。
+        """
+        headers = {
+            name: response.headers[name]
+            for name in _STORED_HEADERS
+            if name in response.headers
+        }
+        if response.status_code != 200 or not (
+            "etag" in headers or "last-modified" in headers
+        ):
+            return False
+
+        content = response.content
+        if len(content) > self.max_size:
+            return False
+
+        blob_path = self._blob_path(key)
+        blob_path.parent.mkdir(exist_ok=True)
+        part_path = blob_path.with_name(f"{key}.{threading.get_ident()}.part")
+        part_path.write_bytes(content)
+
+        with self._lock:
+            os.replace(part_path, blob_path)
+            row = self._db.execute(
+                "SELECT size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            self._total_size += len(content) - (row[0] if row else 0)
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    str(response.url),
+                    response.status_code,
+                    json.dumps(headers),
+                    len(content),
+                    time.time(),
+                ),
+            )
+            self._evict_locked()
+            self._db.commit()
+        return True
+
+    def _delete_locked(self, key: str) -> None:
+        row = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return
+        self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._total_size -= row[0]
+        self._blob_path(key).unlink(missing_ok=True)
+
+    def _evict_locked(self) -> None:
+        """按最近访问时间淘汰，直到总大小不超过上限。"""
+        while self._total_size > self.max_size:
+            rows = self._db.execute(
+                "SELECT key FROM entries ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for (key,) in rows:
+                self._delete_locked(key)
+                if self._total_size <= self.max_size:
+                    break
+
+    def delete(self, key: str) -> None:
+        """
+        删除一条缓存。
+
+        :param key: 缓存键。
+        """
+        with self._lock:
+            self._delete_locked(key)
+            self._db.commit()
+
+    @property
+    def total_size(self) -> int:
+        return self._total_size
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None
+
+    def close(self) -> None:
+        """关闭索引数据库。"""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> ResponseCache:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .inst_fetch import AsyncFetcher, Fetcher
+
+
+class _JsonlIndex:
+    """只追加的 JSON Lines 键值索引，读取时忽略崩溃时写了一半的末行，后写入的记录覆盖先写入的。"""
+
+    def __init__(self, path: Path, key: str, value: str):
+        self.path = path
+        self.key = key
+        self.value = value
+        self._data: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(record, dict) and key in record and value in record:
+                        self._data[record[key]] = record[value]
+        self._file = open(path, "a", encoding="utf-8")
+
+    def get(self, key: str) -> str | None:
+        return self._data.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        line = json.dumps({self.key: key, self.value: value}, ensure_ascii=False)
+        with self._lock:
+            if self._data.get(key) == value:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._data[key] = value
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class ContentStore:
+    """
+    内容寻址存储：文件内容按哈希只保存一份，位于 'objects/<哈希前两位>/<哈希>'。
+
+    - 下载时边流式写入边计算哈希，内容已存在时直接丢弃新下载的数据；
+    - 请求的文件名以硬链接指向对象，文件系统不支持硬链接时改为记录在 manifest.jsonl 中；
+    - urls.jsonl 记录 URL 到哈希的映射，已下载过的 URL 不再重复下载。
+
+    硬链接与对象共享数据，原地修改链接出来的文件会同时修改对象，需要修改时请先复制。
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        hash_algorithm: str = "sha256",
+        use_hardlinks: bool = True,
+    ):
+        """
+        :param root: 存储根目录，不存在时会自动创建。
+        :param hash_algorithm: hashlib 支持的哈希算法名。
+        :param use_hardlinks: 是否为请求的文件名创建硬链接，为 False 时只记录在 manifest 中。
+        """
+        hashlib.new(hash_algorithm)  # 提前校验算法名
+        self.root = Path(root)
+        self.hash_algorithm = hash_algorithm
+        self.use_hardlinks = use_hardlinks
+        self.objects_dir = self.root / "objects"
+        self.tmp_dir = self.root / "tmp"
+
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(exist_ok=True)
+        self._urls = _JsonlIndex(self.root / "urls.jsonl", "url", "hash")
+        self._manifest = _JsonlIndex(self.root / "manifest.jsonl", "path", "hash")
+
+    def object_path(self, digest: str) -> Path:
+        """
+        获取哈希对应的对象路径。
+
+        :param digest: 十六进制哈希。
+        :return: 对象路径（不保证存在）。
+        """
+        return self.objects_dir / digest[:2] / digest
+
+    def has(self, digest: str) -> bool:
+        """
+        判断对象是否已经存在。
+
+        :param digest: 十六进制哈希。
+        :return: 是否存在。
+        """
+        return self.object_path(digest).exists()
+
+    def temp_path(self) -> Path:
+        """
+        获取一个唯一的临时文件路径，供下载时写入。
+
+        :return: 位于存储目录内的临时路径（与对象在同一文件系统，便于原子重命名）。
+        """
+        return self.tmp_dir / f"{uuid.uuid4().hex}.part"
+
+    def add_file(self, temp_path: Path, digest: str) -> Path:
+        """
+        把已计算好哈希的临时文件移入存储；对象已存在时删除临时文件。
+
+        :param temp_path: 临时文件路径。
+        :param digest: 临时文件内容的十六进制哈希。
+        :return: 对象路径。
+        """
+        object_path = self.object_path(digest)
+        if object_path.exists():
+            temp_path.unlink(missing_ok=True)
+            return object_path
+        object_path.parent.mkdir(exist_ok=True)
+        os.replace(temp_path, object_path)
+        return object_path
+
+    def add_bytes(self, data: bytes) -> tuple[str, Path]:
+        """
+        保存一段内容。
+
+        :param data: 要保存的内容。
+        :return: (十六进制哈希, 对象路径) 元组。
+        """
+        digest = hashlib.new(self.hash_algorithm, data).hexdigest()
+        if self.has(digest):
+            return digest, self.object_path(digest)
+        temp_path = self.temp_path()
+        temp_path.write_bytes(data)
+        return digest, self.add_file(temp_path, digest)
+
+    def lookup_url(self, url: str) -> str | None:
+        """
+        查询 URL 已下载内容的哈希。
+
+        :param url: 资源的 URL 地址。
+        :return: 十六进制哈希；未下载过或对象已被删除时为 None。
+        """
+        digest = self._urls.get(url)
+        return digest if digest is not None and self.has(digest) else None
+
+    def record_url(self, url: str, digest: str) -> None:
+        """
+        记录 URL 对应的内容哈希。
+
+        :param url: 资源的 URL 地址。
+        :param digest: 十六进制哈希。
+        """
+        self._urls.set(url, digest)
+
+    def fetch(self, fetcher: Fetcher, url: str) -> tuple[str, Path]:
+        """
+        获取 URL 的内容对象：URL 已下载过时直接返回，否则流式下载并边下载边计算哈希。
+
+        :param fetcher: 用于下载的 Fetcher。
+        :param url: 资源的 URL 地址。
+        :return: (十六进制哈希, 对象路径) 元组。
+        """
+        digest = self.lookup_url(url)
+        if digest is not None:
+            return digest, self.object_path(digest)
+
+        temp_path = self.temp_path()
+        try:
+            _path, _size, digest = fetcher.stream_to_file(
+                url, temp_path, resume=False, hash_algorithm=self.hash_algorithm
+            )
+        finally:
+            temp_path.with_name(temp_path.name + ".part").unlink(missing_ok=True)
+        object_path = self.add_file(temp_path, digest)
+        self.record_url(url, digest)
+        return digest, object_path
+
+    async def fetch_async(self, fetcher: AsyncFetcher, url: str) -> tuple[str, Path]:
+        """
+        fetch 的异步版本，通过 AsyncFetcher.stream_to_file 流式下载，入库在线程中进行。
+
+        :param fetcher: 用于下载的 AsyncFetcher。
+        :param url: 资源的 URL 地址。
+        :return: (十六进制哈希, 对象路径) 元组。
+        """
+        digest = self.lookup_url(url)
+        if digest is not None:
+            return digest, self.object_path(digest)
+
+        temp_path = self.temp_path()
+        try:
+            _path, _size, digest = await fetcher.stream_to_file(
+                url, temp_path, resume=False, hash_algorithm=self.hash_algorithm
+            )
+        finally:
+            temp_path.with_name(temp_path.name + ".part").unlink(missing_ok=True)
+        object_path = await asyncio.to_thread(self.add_file, temp_path, digest)
+        self.record_url(url, digest)
+        return digest, object_path
+
+    def link(self, digest: str, target: str | Path) -> bool:
+        """
+        让目标路径指向对象：优先创建硬链接，失败时（如跨文件系统）从对象复制一份。
+        两种情况都记录在 manifest 中，已存在的目标会被替换。
+
+        :param digest: 十六进制哈希。
+        :param target: 目标路径。
+        :return: 是否创建了硬链接；复制或未启用硬链接时返回 False。
+        :raises FileNotFoundError: 对象不存在时抛出。
+        """
+        target = Path(target)
+        object_path = self.object_path(digest)
+        if not object_path.exists():
+            raise FileNotFoundError(f"对象不存在: {digest}")
+
+        linked = False
+        if self.use_hardlinks:
+            temp_link = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}.link")
+            try:
+                try:
+                    os.link(object_path, temp_link)
+                    linked = True
+                except OSError:
+                    # 跨文件系统或文件系统不支持硬链接，退回复制
+                    shutil.copyfile(object_path, temp_link)
+                os.replace(temp_link, target)
+            except BaseException:
+                temp_link.unlink(missing_ok=True)
+                raise
+        self._manifest.set(str(target), digest)
+        return linked
+
+    def resolve(self, target: str | Path) -> Path | None:
+        """
+        由请求的文件名找到对应的对象。
+
+        :param target: 目标路径。
+        :return: 对象路径；manifest 中没有记录时为 None。
+        """
+        digest = self._manifest.get(str(Path(target)))
+        return self.object_path(digest) if digest is not None else None
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.objects_dir.glob("*/*"))
+
+    def close(self) -> None:
+        """关闭索引文件。"""
+        self._urls.close()
+        self._manifest.close()
+
+    def __enter__(self) -> ContentStore:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
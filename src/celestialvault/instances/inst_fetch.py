@@ -1,6 +1,14 @@
+import asyncio
+import hashlib
+import importlib.util
+import os
 import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from html import unescape
+from pathlib import Path
 from typing import Any
 from urllib.parse import unquote
 
@@ -10,16 +18,34 @@ from httpx import (
     ConnectError,
     ConnectTimeout,
     PoolTimeout,
-    ProtocolError,
     ProxyError,
     ReadError,
     ReadTimeout,
     RequestError,
 )
 
+from .inst_cache import ResponseCache
+from .inst_error import DownloadError
+from .inst_proxy import ProxyPool
+from .inst_ratelimit import (
+    THROTTLE_STATUS,
+    HostRateLimiter,
+    backoff_delay,
+    parse_retry_after,
+)
+
+# 代理模式下视为节点被目标站点限制、需要换代理的状态码
+PROXY_FAILURE_STATUS = frozenset({403, 429, 503, 502, 302})
+
+# 单端口模式下切换 Clash 选择器后等待生效的时间（秒）
+PROXY_SWITCH_DELAY = 1.0
 
-class Fetcher:
-    """HTTP 请求封装器，支持自动重试、代理切换和文本/二进制内容获取。"""
+
+class BaseFetcher:
+    """
+    Fetcher 与 AsyncFetcher 共用的部分：请求配置、按主机限速器、响应缓存与代理池选择。
+    不持有任何客户端，客户端的创建、借出与关闭由同步 / 异步子类各自实现。
+    """
 
     def __init__(
         self,
@@ -32,43 +58,51 @@ class Fetcher:
         clash_api: str = "http://127.0.0.1:9097",
         clash_proxy_port: int = 7899,
         use_proxy: bool = False,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        pool_timeout: float | None = None,
+        rate_limiter: HostRateLimiter | None = None,
+        cache: ResponseCache | None = None,
+        proxy_pool: ProxyPool | None = None,
     ):
         """
-        初始化 HTTP 请求封装器。
-
-        :param headers: 自定义请求头。
-        :param sleep_time: 每次请求间隔的睡眠时间（秒）。
-        :param wait_time: 请求超时时间（秒）。
-        :param max_repeat: 最大重试次数。
-        :param text_encoding: 文本响应的编码格式。
-        :param verify: 是否验证 SSL 证书。
-        :param clash_api: Clash API 地址。
-        :param clash_proxy_port: Clash 代理端口。
-        :param use_proxy: 是否使用代理。
+        保存请求配置，参数含义见 Fetcher.__init__。
         """
         self._sleep_time = sleep_time
         self._wait_time = wait_time
         self._max_repeat = max_repeat
         self._text_encoding = text_encoding
         self.verify = verify
-        self.use_proxy = use_proxy  # 🟢 保存是否使用代理的开关
         self.clash_api = clash_api
+        self.proxy_pool = proxy_pool
+        self.use_proxy = use_proxy or proxy_pool is not None  # 🟢 保存是否使用代理的开关
+        # 未给出代理池时所有请求经由 Clash 的单个混合端口，失败时切换 GLOBAL 选择器
         self.proxies = (
-            {
-                "http://": f"http://127.0.0.1:{clash_proxy_port}",
-                "https://": f"http://127.0.0.1:{clash_proxy_port}",
-            }
-            if use_proxy
+            f"http://127.0.0.1:{clash_proxy_port}"
+            if self.use_proxy and proxy_pool is None
             else None
-        )  # 🟢 不使用代理则为 None
+        )  # 🟢 不使用代理或使用代理池时为 None
+        if self.proxies is not None:
+            self.proxy_list = self._load_proxy_list()
+            self.proxy_index = 0
 
         self.show_info = False
 
         self.headers = headers
-        self.cl = None
-        if self.use_proxy:
-            self.proxy_list = self._load_proxy_list()
-            self.proxy_index = 0
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(wait_time, pool=pool_timeout)
+        # 默认限速器的并发窗口从连接池上限开始，只在服务器要求降速时收缩
+        self.rate_limiter = rate_limiter or HostRateLimiter(
+            rate=1 / sleep_time if sleep_time > 0 else None,
+            concurrency=max_connections,
+            max_concurrency=max_connections,
+        )
+        self.cache = cache
 
     def _load_proxy_list(self):
         """
@@ -76,63 +110,30 @@ class Fetcher:
 
         :return: 延迟最低的 40 个代理节点名称列表。
         """
-        resp = requests.get(f"{self.clash_api}/proxies")
-        proxies_info = resp.json().get("proxies", {})
-        global_proxy_names = proxies_info.get("GLOBAL", {}).get("all", [])
-        exclude = {
-            "DIRECT",
-            "REJECT",
-            "GLOBAL",
-            "Proxy",
-            "节点选择",
-            "自动选择",
-        }  # 需要排除的一些特殊节点
-
-        # 收集每个代理的延迟（如果有的话）
-        proxy_delays = []
-        for name in global_proxy_names:
-            if name in exclude:
-                continue
-            proxy_info = proxies_info.get(name, {})
-            delay = 99999  # 默认延迟大值
-            try:
-                delay = proxy_info["extra"]["http://www.gstatic.com/generate_204"][
-                    "history"
-                ][0]["delay"]
-            except (KeyError, IndexError, TypeError):
-                pass  # 该节点没有延迟信息，默认99999
-            proxy_delays.append((name, delay))
-
-        # 按延迟排序，取最小的40个
-        sorted_proxies = sorted(proxy_delays, key=lambda x: x[1])
-        top_40 = [name for name, delay in sorted_proxies[:40]]
+        nodes = ProxyPool.load_clash_nodes(self.clash_api)
+        sorted_nodes = sorted(nodes, key=lambda node: node[1] or float("inf"))
+        return [name for name, _ in sorted_nodes[:40]]
 
-        # print("🌟 选出延迟最低的 40 个代理:", top_40)
-        return top_40
-
-    def _switch_proxy(self, tried_proxies=None):
+    def _choose_next_proxy(self, tried_proxies: set[str]) -> str:
         """
-        随机切换到一个未尝试过的代理节点，并重新初始化 HTTP 客户端。
+        单端口模式下随机选择一个未尝试过的节点，并记为当前节点。
 
-        :param tried_proxies: 已尝试过的代理名称集合，用于避免重复选择。
+        :param tried_proxies: 已尝试过的代理名称集合，全部试过时在所有节点中选择。
+        :return: 节点名称。
         """
-        if not self.use_proxy:
-            return
-
-        if tried_proxies is None:
-            tried_proxies = set()
-
         available_proxies = [p for p in self.proxy_list if p not in tried_proxies]
-        if not available_proxies:
-            # 所有代理都试过了，重新随机
-            available_proxies = self.proxy_list
-
-        next_proxy = random.choice(available_proxies)
+        next_proxy = random.choice(available_proxies or self.proxy_list)
         self.proxy_index = self.proxy_list.index(next_proxy)
-        print(f"⚡️ 随机切换到节点: {next_proxy}") if self.show_info else None
-        resp = requests.put(
-            f"{self.clash_api}/proxies/GLOBAL", json={"name": next_proxy}
-        )
+        return next_proxy
+
+    def _put_global_proxy(self, name: str) -> None:
+        """
+        通过 Clash API 把 GLOBAL 选择器切换到指定节点。
+
+        :param name: 节点名称。
+        """
+        print(f"⚡️ 随机切换到节点: {name}") if self.show_info else None
+        resp = requests.put(f"{self.clash_api}/proxies/GLOBAL", json={"name": name})
         if resp.status_code == 204:
             print("✅ 切换成功!") if self.show_info else None
         else:
@@ -141,21 +142,739 @@ class Fetcher:
                 if self.show_info
                 else None
             )
-        time.sleep(1)
+
+    def _acquire_proxy(self, tried_proxies: set[str]) -> str | None:
+        """
+        选择本次请求使用的代理：代理池模式下加权选择，单端口模式下为当前选中的节点。
+
+        :param tried_proxies: 本次请求已失败过的代理，尽量避开。
+        :return: 代理名称，未使用代理时为 None。
+        """
+        if self.proxy_pool is not None:
+            return self.proxy_pool.acquire(tried_proxies)
+        if self.proxies is not None:
+            return self.proxy_list[self.proxy_index]
+        return None
+
+    def _release_proxy(
+        self,
+        proxy: str | None,
+        latency: float | None = None,
+        error: bool = False,
+        tried_proxies: set[str] | None = None,
+    ) -> None:
+        """
+        归还代理并把本次请求的结果计入代理池的统计（单端口模式下只记录失败的节点）。
+
+        :param proxy: 代理名称，为 None 时忽略。
+        :param latency: 请求耗时（秒），失败或不适合作为延迟样本时为 None。
+        :param error: 是否因代理问题失败。
+        :param tried_proxies: 失败时把代理加入该集合，重试时避开。
+        """
+        if proxy is None:
+            return
+        if self.proxy_pool is not None:
+            self.proxy_pool.release(proxy, latency, error)
+        if error and tried_proxies is not None:
+            tried_proxies.add(proxy)
+
+    @staticmethod
+    def _hash_file(path: Path, hash_algorithm: str, chunk_size: int):
+        """
+        计算已有文件内容的哈希对象，用于断点续传时接着计算。
+
+        :param path: 文件路径。
+        :param hash_algorithm: hashlib 支持的哈希算法名。
+        :param chunk_size: 每次读取的块大小。
+        :return: 已更新过文件内容的哈希对象。
+        """
+        hasher = hashlib.new(hash_algorithm)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                hasher.update(chunk)
+        return hasher
+
+    def _open_part(
+        self, path: str | Path, resume: bool, hash_algorithm: str, chunk_size: int
+    ):
+        """
+        准备流式下载的临时文件 '<文件名>.part'：续传时对已有内容计算哈希，否则删除旧的部分文件。
+
+        :param path: 目标文件路径。
+        :param resume: 是否对已存在的部分文件续传。
+        :param hash_algorithm: hashlib 支持的哈希算法名。
+        :param chunk_size: 计算哈希时每次读取的块大小。
+        :return: (目标路径, 临时文件路径, 哈希对象) 元组。
+        """
+        path = Path(path)
+        part_path = path.with_name(path.name + ".part")
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if resume and part_path.exists():
+            hasher = self._hash_file(part_path, hash_algorithm, chunk_size)
+        else:
+            part_path.unlink(missing_ok=True)
+            hasher = hashlib.new(hash_algorithm)
+        return path, part_path, hasher
+
+    @staticmethod
+    def _get_stream_action(url: str, status: int, headers, offset: int) -> str:
+        """
+        根据流式下载的响应状态决定如何处理临时文件。
+
+        :param url: 下载的 URL 地址。
+        :param status: 响应状态码。
+        :param headers: 响应头。
+        :param offset: 临时文件已有的字节数。
+        :return: 'done'（已经下载完整）、'restart'（删除临时文件后重新下载）、'retry'（被限速，稍后重试）、
+            'append'（按 Range 续写）或 'write'（从头写入）。
+        :raises DownloadError: 服务器返回错误状态码时抛出。
+        """
+        if status == 416 and offset:
+            # 请求范围越界：若服务器报告的总长度与已下载长度一致，说明已经下载完整
+            total = headers.get("Content-Range", "").rpartition("/")[2]
+            return "done" if total.isdigit() and int(total) == offset else "restart"
+        if status in THROTTLE_STATUS:
+            # 限速器会记录 Retry-After，下次 acquire 时自动等待
+            return "retry"
+        if status >= 400:
+            raise DownloadError(f"下载失败, 状态码 {status}: {url}")
+        if status == 206 and headers.get("Content-Range", "").startswith(
+            f"bytes {offset}-"
+        ):
+            return "append"
+        # 服务器不支持续传，从头开始
+        return "write"
+
+    @staticmethod
+    def _write_chunk(f, hasher, chunk: bytes) -> int:
+        """
+        写入一个数据块并更新哈希。
+
+        :param f: 以二进制模式打开的文件。
+        :param hasher: 哈希对象。
+        :param chunk: 数据块。
+        :return: 写入的字节数。
+        """
+        f.write(chunk)
+        hasher.update(chunk)
+        return len(chunk)
+
+    @staticmethod
+    def _parse_probe(url: str, status: int, headers) -> tuple[int | None, bool]:
+        """
+        由 'Range: bytes=0-0' 请求的响应得到资源大小与是否支持 Range。
+
+        :param url: 资源的 URL 地址。
+        :param status: 响应状态码。
+        :param headers: 响应头。
+        :return: (文件大小, 是否支持 Range) 元组；大小未知时为 None。
+        :raises DownloadError: 服务器返回错误状态码时抛出。
+        """
+        if status == 206:
+            total = headers.get("Content-Range", "").rpartition("/")[2]
+            return (int(total), True) if total.isdigit() else (None, False)
+        if status >= 400:
+            raise DownloadError(f"探测失败, 状态码 {status}: {url}")
+        length = headers.get("Content-Length")
+        return (int(length) if length and length.isdigit() else None), False
+
+    @staticmethod
+    def _plan_ranges(
+        size: int | None, accept_ranges: bool, connections: int, min_part_size: int
+    ) -> list[tuple[int, int]]:
+        """
+        把文件切成最多 connections 个字节范围。
+
+        :param size: 文件大小，未知时为 None。
+        :param accept_ranges: 服务器是否支持 Range。
+        :param connections: 并发连接数。
+        :param min_part_size: 每个分块的最小字节数。
+        :return: (起始偏移, 结束偏移) 列表（均含）；不适合分块下载时为空列表。
+        """
+        parts = min(connections, size // min_part_size) if size else 0
+        if not accept_ranges or parts < 2:
+            return []
+        step = -(-size // parts)
+        return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+    @staticmethod
+    def _allocate_part(path: Path, size: int) -> Path:
+        """
+        预分配分块下载的临时文件 '<文件名>.part'，各分块按偏移写入。
+
+        :param path: 目标文件路径。
+        :param size: 文件大小。
+        :return: 临时文件路径。
+        """
+        part_path = path.with_name(path.name + ".part")
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(part_path, "wb") as f:
+            f.truncate(size)
+        return part_path
+
+    @staticmethod
+    def _write_at(f, chunk: bytes, offset: int) -> None:
+        """
+        把数据块写入文件的指定偏移。
+
+        :param f: 以 'r+b' 打开的文件，每个分块使用独立的句柄。
+        :param chunk: 数据块。
+        :param offset: 写入偏移。
+        """
+        if hasattr(os, "pwrite"):
+            os.pwrite(f.fileno(), chunk, offset)
+        else:
+            # Windows 没有 pwrite，每个分块使用独立的文件句柄，seek 互不影响
+            f.seek(offset)
+            f.write(chunk)
+
+    def _finish_ranged(
+        self,
+        url: str,
+        path: Path,
+        part_path: Path,
+        size: int,
+        written: int,
+        hash_algorithm: str,
+        chunk_size: int,
+    ) -> str:
+        """
+        校验分块下载的大小，计算哈希后把临时文件原子重命名为目标文件。
+
+        :param url: 资源的 URL 地址。
+        :param path: 目标文件路径。
+        :param part_path: 临时文件路径。
+        :param size: 期望的文件大小。
+        :param written: 各分块写入的字节数之和。
+        :param hash_algorithm: hashlib 支持的哈希算法名。
+        :param chunk_size: 计算哈希时每次读取的块大小。
+        :return: 十六进制哈希。
+        :raises DownloadError: 大小不一致时抛出，此时删除临时文件。
+        """
+        if written != size or part_path.stat().st_size != size:
+            part_path.unlink(missing_ok=True)
+            raise DownloadError(f"文件大小不一致: {written}/{size} bytes ({url})")
+        digest = self._hash_file(part_path, hash_algorithm, chunk_size).hexdigest()
+        os.replace(part_path, path)
+        return digest
+
+    @staticmethod
+    def _check_hash(url: str, path: Path, digest: str, expected_hash: str | None) -> None:
+        """
+        校验下载结果的哈希，不一致时删除文件。
+
+        :param url: 资源的 URL 地址。
+        :param path: 下载得到的文件。
+        :param digest: 实际的十六进制哈希。
+        :param expected_hash: 期望的十六进制哈希，None 表示不校验。
+        :raises DownloadError: 哈希不一致时抛出。
+        """
+        if expected_hash is not None and digest != expected_hash.lower():
+            path.unlink(missing_ok=True)
+            raise DownloadError(f"哈希校验失败: {digest} != {expected_hash} ({url})")
+
+    @staticmethod
+    def _get_throttle_delay(status: int | None, headers, attempt: int) -> float:
+        """
+        计算被限速后重试前需要等待的时间。
+
+        :param status: 响应状态码。
+        :param headers: 响应头。
+        :param attempt: 第几次重试（从 0 开始）。
+        :return: 带 Retry-After 时由限速器在下次 acquire 时等待，返回 0；
+            没有 Retry-After 时返回指数退避时间；未被限速时返回 0。
+        """
+        if status not in THROTTLE_STATUS:
+            return 0.0
+        if headers is not None and parse_retry_after(headers.get("Retry-After")) is not None:
+            return 0.0
+        return backoff_delay(attempt)
+
+    def _get_cache_key(self, request_mode, method_args, method_kwargs) -> str | None:
+        """
+        计算请求的缓存键，未启用缓存时返回 None。
+
+        :param request_mode: 请求方式，'GET' 或 'POST'。
+        :return: 缓存键或 None。
+        """
+        if self.cache is None:
+            return None
+        url = method_args[0] if method_args else method_kwargs["url"]
+        body = next(
+            (
+                method_kwargs[name]
+                for name in ("content", "data", "json")
+                if method_kwargs.get(name) is not None
+            ),
+            None,
+        )
+        return self.cache.make_key(
+            request_mode, url, method_kwargs.get("params"), body
+        )
+
+    def _add_validators(self, cache_key: str | None, kwargs: dict) -> dict:
+        """
+        为请求加上条件请求头，用户显式给出的请求头优先。
+
+        :param cache_key: 缓存键，None 表示不使用缓存。
+        :param kwargs: 原始的请求参数，不会被修改。
+        :return: 加上条件请求头后的请求参数。
+        """
+        if cache_key is None:
+            return kwargs
+        validators = self.cache.get_validators(cache_key)
+        if not validators:
+            return kwargs
+        return {**kwargs, "headers": {**validators, **(kwargs.get("headers") or {})}}
+
+    def _apply_cache(
+        self, cache_key: str | None, response: httpx.Response
+    ) -> httpx.Response | None:
+        """
+        304 响应替换为缓存内容，可缓存的 200 响应写入缓存。
+
+        :param cache_key: 缓存键，None 表示不使用缓存。
+        :param response: 服务器返回的响应（已读取完毕）。
+        :return: 交给 obtainText / obtainContent 的响应；304 但缓存内容已被淘汰时返回 None，
+            调用方应不带条件请求头重新请求。
+        """
+        if cache_key is None:
+            return response
+        if response.status_code == 304:
+            return self.cache.load(cache_key, response.request)
+        self.cache.store(cache_key, response)
+        return response
+
+    # ==== 同步与异步版本共用的决策逻辑，子类只负责 I/O ====
+    def _handle_request_error(
+        self,
+        url: str,
+        error: RequestError,
+        proxy: str | None,
+        attempt: int,
+        tried_proxies: set[str],
+    ) -> tuple[bool, float]:
+        """
+        请求出错后归还限速器名额与代理，并决定如何重试。
+
+        :param url: 请求的 URL 地址。
+        :param error: 捕获到的异常。
+        :param proxy: 使用的代理名称，None 表示直连。
+        :param attempt: 第几次尝试（从 0 开始）。
+        :param tried_proxies: 已失败的代理集合。
+        :return: (是否需要切换代理, 重试前等待的秒数) 元组。
+        :raises httpx.RequestError: 不应重试时重新抛出 error。
+        """
+        if isinstance(error, PoolTimeout):
+            # 连接池耗尽，多为本地瞬时高并发问题，与服务器无关
+            self.rate_limiter.release(url)
+            self._release_proxy(proxy)
+            if proxy is None:
+                raise error
+            print(
+                f"⚠️ 连接池耗尽: {type(error).__name__}，等待后重试…"
+            ) if self.show_info else None
+            return False, backoff_delay(attempt, base=1.0)
+
+        self.rate_limiter.release(url, error=True)
+        if isinstance(error, (ReadTimeout, ReadError)):
+            self._release_proxy(proxy, error=True)
+            if proxy is None and attempt == self._max_repeat - 1:
+                raise error
+            # 这些通常是服务器响应慢，直连与代理模式下都原地退避重试
+            print(
+                f"⏳ 响应超时: {type(error).__name__}，重试…"
+            ) if self.show_info else None
+            return False, backoff_delay(attempt)
+
+        self._release_proxy(proxy, error=True, tried_proxies=tried_proxies)
+        if proxy is None:
+            raise error
+        # 这些通常说明代理节点或网络本身问题 → 下次换一个代理，无需等待
+        print(
+            f"⚠️ 网络级错误: {type(error).__name__}，切换代理…"
+        ) if self.show_info else None
+        return True, 0.0
+
+    def _handle_response(
+        self,
+        status: int,
+        headers,
+        proxy: str | None,
+        started: float,
+        attempt: int,
+        tried_proxies: set[str],
+    ) -> tuple[bool, bool, float]:
+        """
+        请求完成后归还代理，并根据状态码决定返回结果还是重试。
+
+        :param status: 响应状态码。
+        :param headers: 响应头。
+        :param proxy: 使用的代理名称，None 表示直连。
+        :param started: 请求开始的时间（time.perf_counter）。
+        :param attempt: 第几次尝试（从 0 开始）。
+        :param tried_proxies: 已失败的代理集合。
+        :return: (是否返回结果, 是否需要切换代理, 重试前等待的秒数) 元组。
+        """
+        # 代理模式下这些状态码多半说明节点被目标站点限制，计为该代理的失败
+        proxy_failed = proxy is not None and status in PROXY_FAILURE_STATUS
+        self._release_proxy(
+            proxy,
+            None if proxy_failed else time.perf_counter() - started,
+            proxy_failed,
+            tried_proxies,
+        )
+
+        if status in THROTTLE_STATUS and attempt < self._max_repeat - 1:
+            # 服务器要求降速：限速器已减速并记录 Retry-After，下次 acquire 时自动等待；
+            # 没有 Retry-After 时按指数退避等待
+            print(f"🐢 状态码 {status}, 降速后重试…") if self.show_info else None
+            return False, proxy_failed, self._get_throttle_delay(status, headers, attempt)
+
+        if proxy_failed:
+            print(f"⚠️ 状态码 {status}, 需要换代理…") if self.show_info else None
+            return False, True, 0.0
+        if proxy is None:
+            print(f"✅ 直连成功, 状态码: {status}") if self.show_info else None
+        else:
+            print(f"✅ 成功请求, 状态码: {status}") if self.show_info else None
+        return True, False, 0.0
+
+    @staticmethod
+    def _apply_stream_action(action: str, part_path: Path, hasher) -> tuple[Any, bool | None]:
+        """
+        执行 _get_stream_action 的结果中不需要写入数据的部分。
+
+        :param action: _get_stream_action 返回的动作。
+        :param part_path: 临时文件路径。
+        :param hasher: 已包含临时文件现有内容的哈希对象。
+        :return: (哈希对象, 是否已完整) 元组；需要继续写入响应体时第二项为 None。
+        """
+        if action == "done":
+            return hasher, True
+        if action == "restart":
+            part_path.unlink()
+            return hashlib.new(hasher.name), False
+        if action == "retry":
+            return hasher, False
+        if action == "write":
+            return hashlib.new(hasher.name), None
+        return hasher, None
+
+    @staticmethod
+    def _check_body_length(url: str, expected: str | None, written: int) -> None:
+        """
+        校验写入的字节数与 Content-Length 一致。
+
+        :raises httpx.ReadError: 响应体不完整时抛出，以便续传。
+        """
+        if expected is not None and written != int(expected):
+            raise ReadError(f"响应体不完整: {written}/{expected} bytes ({url})")
+
+    def _handle_stream_error(
+        self,
+        error: RequestError,
+        proxy: str | None,
+        attempt: int,
+        tried_proxies: set[str],
+        part_path: Path,
+        hasher,
+        resume: bool,
+    ) -> tuple[Any, float]:
+        """
+        流式下载出错后归还代理，并决定续传前需要等待多久；调用方随后切换代理。
+
+        :param error: 捕获到的异常。
+        :param proxy: 使用的代理名称，None 表示直连。
+        :param attempt: 第几次尝试（从 0 开始）。
+        :param tried_proxies: 已失败的代理集合。
+        :param part_path: 临时文件路径。
+        :param hasher: 当前的哈希对象。
+        :param resume: 是否续传；不续传时删除临时文件并重置哈希。
+        :return: (哈希对象, 重试前等待的秒数) 元组。
+        """
+        self._release_proxy(proxy, error=True, tried_proxies=tried_proxies)
+        if isinstance(error, (ConnectError, ProxyError, ConnectTimeout)):
+            print(f"⚠️ 网络级错误: {type(error).__name__}") if self.show_info else None
+            delay = backoff_delay(attempt) if proxy is None else 0.0
+        else:
+            # 读超时、连接中断等：保留已下载部分，稍后续传
+            print(
+                f"⏳ 下载中断: {type(error).__name__}，稍后续传…"
+            ) if self.show_info else None
+            delay = backoff_delay(attempt)
+        if not resume:
+            part_path.unlink(missing_ok=True)
+            hasher = hashlib.new(hasher.name)
+        return hasher, delay
+
+    @staticmethod
+    def _commit_part(part_path: Path, path: Path, hasher) -> tuple[Path, int, str]:
+        """
+        将下载完整的临时文件原子重命名为目标文件。
+
+        :return: (路径, 文件大小, 十六进制哈希) 元组。
+        """
+        os.replace(part_path, path)
+        return path, path.stat().st_size, hasher.hexdigest()
+
+    def _release_probe(
+        self,
+        url: str,
+        status: int | None,
+        headers,
+        error: bool,
+        proxy: str | None,
+        started: float,
+    ) -> None:
+        """归还探测请求的限速器名额与代理；没有得到响应时不记录延迟样本。"""
+        self.rate_limiter.release(url, status, headers, error)
+        latency = None if status is None else time.perf_counter() - started
+        self._release_proxy(proxy, latency, error)
+
+    @staticmethod
+    def _check_range_response(url: str, status: int, headers, offset: int) -> bool:
+        """
+        检查分块请求的响应。
+
+        :param url: 资源的 URL 地址。
+        :param status: 响应状态码。
+        :param headers: 响应头。
+        :param offset: 请求的起始偏移。
+        :return: 是否可以写入响应体；被限速时返回 False，稍后重试。
+        :raises DownloadError: 服务器不按范围响应时抛出。
+        """
+        if status in THROTTLE_STATUS:
+            return False
+        if status != 206 or not headers.get("Content-Range", "").startswith(
+            f"bytes {offset}-"
+        ):
+            raise DownloadError(f"服务器未按范围响应, 状态码 {status}: {url}")
+        return True
+
+    def _end_range_attempt(
+        self,
+        url: str,
+        status: int | None,
+        headers,
+        error: RequestError | None,
+        proxy: str | None,
+        attempt: int,
+        tried_proxies: set[str],
+        offset: int,
+    ) -> float:
+        """
+        结束一次分块请求：归还限速器名额与代理，并计算重试前需要等待的时间。
+
+        :param error: 网络错误，没有出错时为 None。
+        :param offset: 已写入到的位置，用于提示续传位置。
+        :return: 重试前等待的秒数；出错时为指数退避时间，被限速且没有 Retry-After 时同样退避。
+        """
+        self.rate_limiter.release(url, status, headers, error is not None)
+        self._release_proxy(proxy, error=error is not None, tried_proxies=tried_proxies)
+        if error is not None:
+            print(
+                f"⏳ 分块中断: {type(error).__name__}，从 {offset} 续传…"
+            ) if self.show_info else None
+            return backoff_delay(attempt)
+        return self._get_throttle_delay(status, headers, attempt)
+
+
+class Fetcher(BaseFetcher):
+    """HTTP 请求封装器，支持自动重试、代理切换和文本/二进制内容获取。"""
+
+    def __init__(
+        self,
+        headers: dict = None,
+        sleep_time: int = 0,
+        wait_time: int = 5,
+        max_repeat: int = 3,
+        text_encoding: str = "utf-8",
+        verify: bool = True,
+        clash_api: str = "http://127.0.0.1:9097",
+        clash_proxy_port: int = 7899,
+        use_proxy: bool = False,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        pool_timeout: float | None = None,
+        rate_limiter: HostRateLimiter | None = None,
+        cache: ResponseCache | None = None,
+        proxy_pool: ProxyPool | None = None,
+    ):
+        """
+        初始化 HTTP 请求封装器。
+        同一个 Fetcher 可以在多个线程间共享：客户端的创建与替换受锁保护，
+        切换代理节点会替换客户端，旧客户端上的请求会正常完成，最后一个请求结束后旧客户端才被关闭。
+        使用代理池时每个代理拥有独立的客户端，不同线程可以同时通过不同的代理发出请求。
+
+        :param headers: 自定义请求头。
+        :param sleep_time: 对同一主机的请求间隔（秒），即默认限速器的初始速率为 1/sleep_time；0 表示不限速率。
+        :param wait_time: 请求超时时间（秒）。
+        :param max_repeat: 最大重试次数。
+        :param text_encoding: 文本响应的编码格式。
+        :param verify: 是否验证 SSL 证书。
+        :param clash_api: Clash API 地址。
+        :param clash_proxy_port: Clash 代理端口。
+        :param use_proxy: 是否使用代理；未给出 proxy_pool 时所有请求经由 clash_proxy_port，失败时通过 Clash API 切换节点。
+        :param max_connections: 连接池的最大连接数。
+        :param max_keepalive_connections: 连接池中保持空闲的最大连接数。
+        :param keepalive_expiry: 空闲连接的保活时间（秒）。
+        :param pool_timeout: 等待空闲连接的超时时间（秒），None 表示一直等待，避免高并发时出现 PoolTimeout。
+        :param rate_limiter: 按主机的限速器，可在多个 Fetcher / AsyncFetcher 之间共享；
+            为 None 时按 sleep_time 创建，单个主机的并发窗口初始为 max_connections。
+        :param cache: 持久化的响应缓存，给出时 get/post 请求会带上 ETag / Last-Modified 做条件请求，304 时使用缓存内容。
+        :param proxy_pool: 代理池（需为每个节点配置独立端口，见 ProxyPool.from_clash），
+            给出时每次请求按代理的实时延迟与错误率加权选择代理，不再切换 Clash 选择器。
+        """
+        super().__init__(
+            headers=headers,
+            sleep_time=sleep_time,
+            wait_time=wait_time,
+            max_repeat=max_repeat,
+            text_encoding=text_encoding,
+            verify=verify,
+            clash_api=clash_api,
+            clash_proxy_port=clash_proxy_port,
+            use_proxy=use_proxy,
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+            pool_timeout=pool_timeout,
+            rate_limiter=rate_limiter,
+            cache=cache,
+            proxy_pool=proxy_pool,
+        )
+
         self.cl = None
-        self.init_client()
+        # 每个代理一个客户端，按代理名称索引
+        self._proxy_clients: dict[str, Any] = {}
+        # 每个客户端上正在进行的请求数；被替换的客户端在请求全部结束时才关闭
+        self._client_users: dict[Any, int] = {}
+        self._retired_clients: set[Any] = set()
+        self._client_lock = threading.RLock()
+        self._switch_lock = threading.Lock()
+
+    def _switch_proxy(self, tried_proxies=None, failed_proxy: str | None = None):
+        """
+        随机切换到一个未尝试过的代理节点，并替换 HTTP 客户端。仅在单端口模式下生效。
+
+        :param tried_proxies: 已尝试过的代理名称集合，用于避免重复选择。
+        :param failed_proxy: 失败请求所用的节点；其他线程已经切走时不再重复切换。
+        """
+        if self.proxies is None:
+            return
+
+        with self._switch_lock:
+            current_proxy = self.proxy_list[self.proxy_index]
+            if failed_proxy is not None and failed_proxy != current_proxy:
+                return
+            self._put_global_proxy(self._choose_next_proxy(tried_proxies or set()))
+            time.sleep(PROXY_SWITCH_DELAY)
+            # 新节点只对新建立的连接生效，旧客户端上的请求结束后关闭
+            self._replace_client()
+
+    def _new_client(self, proxy_url: str | None = None):
+        """
+        创建一个新的 httpx 客户端。
+
+        :param proxy_url: 代理地址，None 表示直连。
+        :return: httpx.Client 实例。
+        """
+        return httpx.Client(
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=self.limits,
+            verify=self.verify,
+            proxy=proxy_url,
+        )
 
     def init_client(self):
         """
-        初始化 httpx 客户端（懒加载），如已存在则跳过。
+        初始化 httpx 客户端（懒加载），如已存在则跳过。线程安全。
         """
-        if self.cl is None:
-            self.cl = httpx.Client(
-                headers=self.headers,
-                timeout=self._wait_time,
-                verify=self.verify,
-                proxy=self.proxies,  # 🟢 如果不使用代理，proxies=None
-            )
+        if self.cl is not None:
+            return
+        with self._client_lock:
+            if self.cl is None:
+                self.cl = self._new_client(self.proxies)
+                self._client_users[self.cl] = 0
+
+    def _replace_client(self):
+        """
+        用新客户端替换当前客户端。旧客户端上没有进行中的请求时立即关闭，否则在最后一个请求结束时关闭。
+        """
+        with self._client_lock:
+            old_client, self.cl = self.cl, None
+            self.init_client()
+            if old_client is None:
+                return
+            if self._client_users.get(old_client, 0) > 0:
+                self._retired_clients.add(old_client)
+                return
+            self._client_users.pop(old_client, None)
+        old_client.close()
+
+    def _get_proxy_client(self, proxy: str):
+        """
+        获取（或创建）代理对应的客户端，多线程下调用方需持有客户端锁。
+
+        :param proxy: 代理名称。
+        :return: 该代理专用的客户端。
+        """
+        client = self._proxy_clients.get(proxy)
+        if client is None:
+            client = self._new_client(self.proxy_pool.get_proxy_url(proxy))
+            self._proxy_clients[proxy] = client
+            self._client_users[client] = 0
+        return client
+
+    @contextmanager
+    def _lease_client(self, proxy: str | None = None):
+        """
+        借出客户端，请求期间客户端即使被替换也不会被关闭。
+
+        :param proxy: 代理池中的代理名称；None 或单端口模式下使用共享的客户端。
+        """
+        with self._client_lock:
+            if proxy is None or self.proxy_pool is None:
+                self.init_client()
+                client = self.cl
+            else:
+                client = self._get_proxy_client(proxy)
+            self._client_users[client] += 1
+        try:
+            yield client
+        finally:
+            with self._client_lock:
+                self._client_users[client] -= 1
+                drained = (
+                    client in self._retired_clients and self._client_users[client] == 0
+                )
+                if drained:
+                    self._retired_clients.discard(client)
+                    del self._client_users[client]
+            if drained:
+                client.close()
+
+    def close(self):
+        """关闭所有客户端。"""
+        with self._client_lock:
+            clients = set(self._client_users) | self._retired_clients
+            self.cl = None
+            self._proxy_clients.clear()
+            self._client_users.clear()
+            self._retired_clients.clear()
+        for client in clients:
+            client.close()
+
+    def __enter__(self):
+        self.init_client()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def obtainText(self, func: object, *args, **kwargs) -> tuple[int, Any, str]:
         """
@@ -227,72 +946,955 @@ class Fetcher:
             self.obtainContent, "POST", url, data=data, json=json, *args, **kwargs
         )[1]
 
+    def _stream_once(
+        self,
+        url: str,
+        part_path: Path,
+        hasher,
+        chunk_size: int,
+        resume: bool,
+        proxy: str | None = None,
+    ):
+        """
+        发送一次流式请求并把响应体追加写入临时文件，部分文件存在时使用 Range 续传。
+
+        :param url: 下载的 URL 地址。
+        :param part_path: 临时文件路径。
+        :param hasher: 已包含临时文件现有内容的哈希对象。
+        :param chunk_size: 每次写入的块大小。
+        :param resume: 是否使用 Range 续传。
+        :param proxy: 使用的代理名称，None 表示直连。
+        :return: (哈希对象, 是否已完整) 元组。
+        :raises DownloadError: 服务器返回错误状态码时抛出。
+        """
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if resume and offset else {}
+
+        self.rate_limiter.acquire(url)
+        status = None
+        response_headers = None
+        error = False
+        try:
+            with self._lease_client(proxy) as client:
+                with client.stream("GET", url, headers=headers) as response:
+                    status, response_headers = response.status_code, response.headers
+                    action = self._get_stream_action(
+                        url, status, response_headers, offset
+                    )
+                    hasher, complete = self._apply_stream_action(
+                        action, part_path, hasher
+                    )
+                    if complete is not None:
+                        return hasher, complete
+
+                    written = 0
+                    with open(part_path, "ab" if action == "append" else "wb") as f:
+                        for chunk in response.iter_bytes(chunk_size):
+                            written += self._write_chunk(f, hasher, chunk)
+                    self._check_body_length(
+                        url, response.headers.get("Content-Length"), written
+                    )
+                    return hasher, True
+        except RequestError:
+            error = True
+            raise
+        finally:
+            self.rate_limiter.release(url, status, response_headers, error)
+
+    def stream_to_file(
+        self,
+        url: str,
+        path: str | Path,
+        chunk_size: int = 1024 * 1024,
+        resume: bool = True,
+        hash_algorithm: str = "sha256",
+    ) -> tuple[Path, int, str]:
+        """
+        以流的方式下载到文件，内存占用与文件大小无关。
+        数据先写入 '<文件名>.part'，边下载边计算哈希，完成后原子重命名为目标文件；
+        中断后再次调用（或自动重试时）会以 HTTP Range 从已下载的位置续传。
+
+        :param url: 下载的 URL 地址。
+        :param path: 目标文件路径。
+        :param chunk_size: 每次写入的块大小。
+        :param resume: 是否对已存在的部分文件续传。
+        :param hash_algorithm: hashlib 支持的哈希算法名。
+        :return: (路径, 文件大小, 十六进制哈希) 元组。
+        :raises DownloadError: 服务器返回错误状态码，或重试次数用尽时抛出。
+        """
+        path, part_path, hasher = self._open_part(
+            path, resume, hash_algorithm, chunk_size
+        )
+
+        tried_proxies = set()
+        for attempt in range(self._max_repeat):
+            proxy = self._acquire_proxy(tried_proxies)
+            try:
+                hasher, complete = self._stream_once(
+                    url, part_path, hasher, chunk_size, resume, proxy
+                )
+            except RequestError as e:
+                hasher, delay = self._handle_stream_error(
+                    e, proxy, attempt, tried_proxies, part_path, hasher, resume
+                )
+                self._switch_proxy(tried_proxies, proxy)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self._release_proxy(proxy)
+                raise
+            # 下载耗时与文件大小有关，不作为代理的延迟样本
+            self._release_proxy(proxy)
+
+            if complete:
+                return self._commit_part(part_path, path, hasher)
+
+        raise DownloadError(f"🚫 下载失败, 已重试 {self._max_repeat} 次: {url}")
+
+    def probe(self, url: str) -> tuple[int | None, bool]:
+        """
+        探测资源大小与是否支持按范围下载：发送 'Range: bytes=0-0' 的流式请求，不读取响应体。
+
+        :param url: 资源的 URL 地址。
+        :return: (文件大小, 是否支持 Range) 元组；大小未知时为 None。
+        :raises DownloadError: 服务器返回错误状态码时抛出。
+        """
+        proxy = self._acquire_proxy(set())
+        self.rate_limiter.acquire(url)
+        status = None
+        response_headers = None
+        started = time.perf_counter()
+        error = False
+        try:
+            with self._lease_client(proxy) as client:
+                with client.stream(
+                    "GET", url, headers={"Range": "bytes=0-0"}
+                ) as response:
+                    status, response_headers = response.status_code, response.headers
+        except RequestError:
+            error = True
+            raise
+        finally:
+            # 被取消或抛出其他异常时也要归还限速器名额与代理
+            self._release_probe(url, status, response_headers, error, proxy, started)
+        return self._parse_probe(url, status, response_headers)
+
+    def _fetch_range(
+        self, url: str, part_path: Path, start: int, end: int, chunk_size: int
+    ) -> int:
+        """
+        下载 [start, end] 字节范围并按偏移写入预分配的文件，中断后从已写入的位置继续请求。
+
+        :param url: 资源的 URL 地址。
+        :param part_path: 预分配的临时文件。
+        :param start: 起始偏移（含）。
+        :param end: 结束偏移（含）。
+        :param chunk_size: 每次写入的块大小。
+        :return: 写入的字节数。
+        :raises DownloadError: 服务器不按范围响应，或重试次数用尽时抛出。
+        """
+        offset = start
+        tried_proxies = set()
+        with open(part_path, "r+b") as f:
+            for attempt in range(self._max_repeat):
+                proxy = self._acquire_proxy(tried_proxies)
+                self.rate_limiter.acquire(url)
+                status = None
+                response_headers = None
+                error = None
+                try:
+                    with self._lease_client(proxy) as client:
+                        with client.stream(
+                            "GET", url, headers={"Range": f"bytes={offset}-{end}"}
+                        ) as response:
+                            status, response_headers = (
+                                response.status_code,
+                                response.headers,
+                            )
+                            if self._check_range_response(
+                                url, status, response_headers, offset
+                            ):
+                                for chunk in response.iter_bytes(chunk_size):
+                                    chunk = chunk[: end + 1 - offset]
+                                    self._write_at(f, chunk, offset)
+                                    offset += len(chunk)
+                except RequestError as e:
+                    error = e
+                finally:
+                    delay = self._end_range_attempt(
+                        url,
+                        status,
+                        response_headers,
+                        error,
+                        proxy,
+                        attempt,
+                        tried_proxies,
+                        offset,
+                    )
+
+                if error is not None:
+                    self._switch_proxy(tried_proxies, proxy)
+                if offset > end:
+                    return end + 1 - start
+                time.sleep(delay)
+
+        raise DownloadError(
+            f"🚫 分块 {start}-{end} 下载失败, 已重试 {self._max_repeat} 次: {url}"
+        )
+
+    def download_ranged(
+        self,
+        url: str,
+        path: str | Path,
+        connections: int = 4,
+        min_part_size: int = 8 * 1024 * 1024,
+        chunk_size: int = 1024 * 1024,
+        hash_algorithm: str = "sha256",
+        expected_hash: str | None = None,
+    ) -> tuple[Path, int, str]:
+        """
+        多连接分块下载大文件：先探测大小与 Range 支持，再把文件切成若干字节范围并发下载，
+        按偏移写入预分配的 '<文件名>.part'，校验大小（与哈希）后原子重命名。
+        服务器不支持 Range、大小未知或文件较小时退回 stream_to_file 单连接下载。
+
+        :param url: 下载的 URL 地址。
+        :param path: 目标文件路径。
+        :param connections: 并发连接数。
+        :param min_part_size: 每个分块的最小字节数，文件不足两个分块时不拆分。
+        :param chunk_size: 每次写入的块大小。
+        :param hash_algorithm: hashlib 支持的哈希算法名。
+        :param expected_hash: 期望的十六进制哈希，给出时校验不一致会抛出异常。
+        :return: (路径, 文件大小, 十六进制哈希) 元组。
+        :raises DownloadError: 下载失败、大小或哈希校验不通过时抛出。
+        """
+        path = Path(path)
+        size, accept_ranges = self.probe(url)
+        ranges = self._plan_ranges(size, accept_ranges, connections, min_part_size)
+        if not ranges:
+            path, size, digest = self.stream_to_file(
+                url, path, chunk_size, hash_algorithm=hash_algorithm
+            )
+        else:
+            part_path = self._allocate_part(path, size)
+            try:
+                with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                    written = sum(
+                        executor.map(
+                            lambda r: self._fetch_range(url, part_path, *r, chunk_size),
+                            ranges,
+                        )
+                    )
+            except BaseException:
+                part_path.unlink(missing_ok=True)
+                raise
+            digest = self._finish_ranged(
+                url, path, part_path, size, written, hash_algorithm, chunk_size
+            )
+
+        self._check_hash(url, path, digest, expected_hash)
+        return path, size, digest
+
     def _auto_request(self, method, request_mode, *method_args, **method_kwargs):
         """
         自动请求核心方法：支持直连或代理模式，失败时自动重试和切换代理。
+        每次请求前由 rate_limiter 按主机限速；收到 429/503 时降速并遵守 Retry-After 后重试，
+        没有 Retry-After 时按指数退避等待；
+        代理模式下每次尝试从 proxy_pool 加权选择代理（单端口模式下为当前 Clash 节点），
+        遇到 403/502/302 或网络错误时计入该代理的错误率，下次尝试避开它（单端口模式下切换节点）；
+        读超时、读错误在直连与代理模式下都按指数退避原地重试。
+        启用 cache 时发送条件请求，304 响应以缓存内容返回。
 
         :param method: 获取响应内容的方法（obtainText 或 obtainContent）。
         :param request_mode: 请求方式，'GET' 或 'POST'。
         :return: (状态码, 响应内容) 元组。
-        :raises RuntimeError: 所有重试均失败时抛出。
+        :raises RuntimeError: 代理模式下所有重试均失败时抛出。
+        :raises httpx.RequestError: 直连模式下连接失败，或读超时重试次数用尽时抛出。
         """
-        if not self.use_proxy:
-            self.init_client()
-            if request_mode == "POST":
-                status, content = method(self.cl.post, *method_args, **method_kwargs)
-            else:
-                status, content = method(self.cl.get, *method_args, **method_kwargs)
-            print(f"✅ 直连成功, 状态码: {status}") if self.show_info else None
-            return status, content
-
+        url = str(method_args[0] if method_args else method_kwargs["url"])
+        cache_key = self._get_cache_key(request_mode, method_args, method_kwargs)
         tried_proxies = set()
-        for _ in range(self._max_repeat):
+        for attempt in range(self._max_repeat):
+            proxy = self._acquire_proxy(tried_proxies)
+            responses: list[httpx.Response] = []
+            self.rate_limiter.acquire(url)
+            started = time.perf_counter()
+            status = None
+            released = False
             try:
-                self.init_client()
-                if request_mode == "POST":
-                    status, content = method(
-                        self.cl.post, *method_args, **method_kwargs
+                with self._lease_client(proxy) as client:
+                    request_func = client.post if request_mode == "POST" else client.get
+
+                    def func(*args, **kwargs):
+                        response = request_func(
+                            *args, **self._add_validators(cache_key, kwargs)
+                        )
+                        cached = self._apply_cache(cache_key, response)
+                        if cached is None:
+                            # 304 时缓存内容已被淘汰，不带条件请求头重新请求
+                            response = request_func(*args, **kwargs)
+                            cached = self._apply_cache(cache_key, response)
+                        responses.append(response)
+                        return cached if cached is not None else response
+
+                    status, content = method(func, *method_args, **method_kwargs)
+            except RequestError as e:
+                released = True
+                switch, delay = self._handle_request_error(
+                    url, e, proxy, attempt, tried_proxies
+                )
+                if switch:
+                    self._switch_proxy(tried_proxies, proxy)
+                time.sleep(delay)
+                continue
+            finally:
+                if not released:
+                    # 正常返回，或被取消、抛出其他异常时也要归还名额
+                    self.rate_limiter.release(
+                        url, status, responses[-1].headers if responses else None
                     )
-                else:
-                    status, content = method(self.cl.get, *method_args, **method_kwargs)
-
-                if status in [403, 429, 503, 502, 302]:
-                    print(f"⚠️ 状态码 {status}, 需要换代理…") if self.show_info else None
-                    tried_proxies.add(self.proxy_list[self.proxy_index])
-                    self._switch_proxy(tried_proxies)
-                    continue
-                print(f"✅ 成功请求, 状态码: {status}") if self.show_info else None
+
+            headers = responses[-1].headers if responses else None
+            done, switch, delay = self._handle_response(
+                status, headers, proxy, started, attempt, tried_proxies
+            )
+            if switch:
+                self._switch_proxy(tried_proxies, proxy)
+            if done:
                 return status, content
+            time.sleep(delay)
 
-            except (
-                ConnectError,
-                ProxyError,
-                ConnectTimeout,
-                ProtocolError,
-                RequestError,
-            ) as e:
-                # 这些通常说明代理节点或网络本身问题 → 换代理
-                print(
-                    f"⚠️ 网络级错误: {type(e).__name__}，切换代理…"
-                ) if self.show_info else None
-                tried_proxies.add(self.proxy_list[self.proxy_index])
-                self._switch_proxy(tried_proxies)
-                continue
+        raise RuntimeError("🚫 所有节点均请求失败！")
+
+
+class AsyncFetcher(BaseFetcher):
+    """
+    基于 asyncio 的 HTTP 请求封装器，共享一个 httpx.AsyncClient（可用时启用 HTTP/2）。
+    通过全局与按主机的信号量限制并发，重试与代理切换逻辑与 Fetcher._auto_request 一致。
+    与 Fetcher 只共享 BaseFetcher 中的配置、限速器、缓存与代理池，不继承任何同步方法。
+    """
+
+    def __init__(
+        self,
+        headers: dict = None,
+        sleep_time: int = 0,
+        wait_time: int = 5,
+        max_repeat: int = 3,
+        text_encoding: str = "utf-8",
+        verify: bool = True,
+        clash_api: str = "http://127.0.0.1:9097",
+        clash_proxy_port: int = 7899,
+        use_proxy: bool = False,
+        max_concurrency: int = 100,
+        per_host_concurrency: int = 8,
+        http2: bool = True,
+        keepalive_expiry: float = 30.0,
+        pool_timeout: float | None = None,
+        rate_limiter: HostRateLimiter | None = None,
+        cache: ResponseCache | None = None,
+        proxy_pool: ProxyPool | None = None,
+    ):
+        """
+        初始化异步 HTTP 请求封装器。
+
+        :param headers: 自定义请求头。
+        :param sleep_time: 对同一主机的请求间隔（秒），0 表示不限速率。
+        :param wait_time: 请求超时时间（秒）。
+        :param max_repeat: 最大重试次数。
+        :param text_encoding: 文本响应的编码格式。
+        :param verify: 是否验证 SSL 证书。
+        :param clash_api: Clash API 地址。
+        :param clash_proxy_port: Clash 代理端口。
+        :param use_proxy: 是否使用代理；未给出 proxy_pool 时所有请求经由 clash_proxy_port，失败时通过 Clash API 切换节点。
+        :param max_concurrency: 全局最大并发请求数。
+        :param per_host_concurrency: 单个主机的最大并发请求数。
+        :param http2: 是否启用 HTTP/2（需要安装 h2，未安装时自动退回 HTTP/1.1）。
+        :param keepalive_expiry: 空闲连接的保活时间（秒）。
+        :param pool_timeout: 等待空闲连接的超时时间（秒），None 表示一直等待。
+        :param rate_limiter: 按主机的限速器，可与同步的 Fetcher 共享同一个实例。
+        :param cache: 持久化的响应缓存，可与同步的 Fetcher 共享同一个实例。
+        :param proxy_pool: 代理池，可与同步的 Fetcher 共享同一个实例；给出时不再切换 Clash 选择器。
+        """
+        super().__init__(
+            headers=headers,
+            sleep_time=sleep_time,
+            wait_time=wait_time,
+            max_repeat=max_repeat,
+            text_encoding=text_encoding,
+            verify=verify,
+            clash_api=clash_api,
+            clash_proxy_port=clash_proxy_port,
+            use_proxy=use_proxy,
+            max_connections=max_concurrency,
+            max_keepalive_connections=max_concurrency,
+            keepalive_expiry=keepalive_expiry,
+            pool_timeout=pool_timeout,
+            rate_limiter=rate_limiter,
+            cache=cache,
+            proxy_pool=proxy_pool,
+        )
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+
+        self.cl = None
+        # 每个代理一个客户端，按代理名称索引
+        self._proxy_clients: dict[str, Any] = {}
+        # 每个客户端上正在进行的请求数；切换节点替换下来的客户端在请求全部结束时才关闭
+        self._client_users: dict[Any, int] = {}
+        self._retired_clients: set[Any] = set()
+
+        self._global_semaphore: asyncio.Semaphore | None = None
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+        self._switch_lock: asyncio.Lock | None = None
+
+    def _new_client(self, proxy_url: str | None = None):
+        """
+        创建一个新的 httpx.AsyncClient。
+
+        :param proxy_url: 代理地址，None 表示直连。
+        :return: httpx.AsyncClient 实例。
+        """
+        return httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            verify=self.verify,
+            proxy=proxy_url,
+            http2=self.http2,
+            limits=self.limits,
+        )
+
+    async def init_client(self):
+        """
+        初始化 httpx.AsyncClient（懒加载），如已存在则跳过。
+        """
+        if self.cl is None:
+            self.cl = self._new_client(self.proxies)
+            self._client_users[self.cl] = 0
+
+    async def _replace_client(self):
+        """
+        用新客户端替换当前客户端。旧客户端上没有进行中的请求时立即关闭，否则在最后一个请求结束时关闭。
+        """
+        old_client, self.cl = self.cl, None
+        await self.init_client()
+        if old_client is None:
+            return
+        if self._client_users.get(old_client, 0) > 0:
+            self._retired_clients.add(old_client)
+            return
+        self._client_users.pop(old_client, None)
+        await old_client.aclose()
+
+    async def _switch_proxy(self, tried_proxies=None, failed_proxy: str | None = None):
+        """
+        随机切换到一个未尝试过的代理节点，并替换 HTTP 客户端。仅在单端口模式下生效。
+
+        :param tried_proxies: 已尝试过的代理名称集合，用于避免重复选择。
+        :param failed_proxy: 失败请求所用的节点；其他协程已经切走时不再重复切换。
+        """
+        if self.proxies is None:
+            return
+        if self._switch_lock is None:
+            self._switch_lock = asyncio.Lock()
+
+        async with self._switch_lock:
+            current_proxy = self.proxy_list[self.proxy_index]
+            if failed_proxy is not None and failed_proxy != current_proxy:
+                return
+            next_proxy = self._choose_next_proxy(tried_proxies or set())
+            await asyncio.to_thread(self._put_global_proxy, next_proxy)
+            await asyncio.sleep(PROXY_SWITCH_DELAY)
+            await self._replace_client()
+
+    def _get_proxy_client(self, proxy: str):
+        """
+        获取（或创建）代理对应的客户端。
+
+        :param proxy: 代理名称。
+        :return: 该代理专用的客户端。
+        """
+        client = self._proxy_clients.get(proxy)
+        if client is None:
+            client = self._new_client(self.proxy_pool.get_proxy_url(proxy))
+            self._proxy_clients[proxy] = client
+            self._client_users[client] = 0
+        return client
 
-            except (ReadTimeout, ReadError) as e:
-                # 这些通常是服务器响应慢，可以原地重试一次
-                print(
-                    f"⏳ 响应超时: {type(e).__name__}，重试…"
-                ) if self.show_info else None
-                time.sleep(random.uniform(1, 3))
+    def _get_host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """
+        获取 URL 所属主机的信号量。
+
+        :param url: 请求的 URL 地址。
+        :return: 该主机对应的信号量。
+        """
+        host = httpx.URL(url).host
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_semaphores[host]
+
+    @asynccontextmanager
+    async def _lease_client(self, proxy: str | None = None):
+        """
+        借出客户端。请求期间客户端即使被替换也不会被关闭，
+        最后一个使用者归还时才关闭已退役的客户端。
+
+        :param proxy: 代理池中的代理名称；None 或单端口模式下使用共享的客户端。
+        """
+        if proxy is None or self.proxy_pool is None:
+            await self.init_client()
+            client = self.cl
+        else:
+            client = self._get_proxy_client(proxy)
+        self._client_users[client] += 1
+        try:
+            yield client
+        finally:
+            self._client_users[client] -= 1
+            if client in self._retired_clients and self._client_users[client] == 0:
+                self._retired_clients.discard(client)
+                del self._client_users[client]
+                await client.aclose()
+
+    async def obtainText(self, func: object, *args, **kwargs) -> tuple[int, Any, str]:
+        """
+        执行异步请求函数并返回解码后的文本内容。
+
+        :param func: 要执行的 httpx 异步请求函数（如 cl.get 或 cl.post）。
+        :return: (状态码, 解码后的文本内容) 元组。
+        """
+        response: httpx.Response = await func(*args, **kwargs)
+        response_text = response.content.decode(self._text_encoding, "ignore")
+        response_text = unquote(unescape(response_text))
+        return response.status_code, response_text
+
+    async def obtainContent(
+        self, func: object, *args, **kwargs
+    ) -> tuple[int, Any, str]:
+        """
+        执行异步请求函数并返回原始二进制内容。
+
+        :param func: 要执行的 httpx 异步请求函数（如 cl.get 或 cl.post）。
+        :return: (状态码, 原始二进制内容) 元组。
+        """
+        response: httpx.Response = await func(*args, **kwargs)
+        return response.status_code, response.content
+
+    async def getText(self, url: str, *args, **kwargs) -> str:
+        """
+        发送异步 GET 请求并返回解码后的文本内容。
+
+        :param url: 请求的 URL 地址。
+        :return: 解码后的文本内容。
+        """
+        return (await self._auto_request(self.obtainText, "GET", url, *args, **kwargs))[1]
+
+    async def getContent(self, url: str, *args, **kwargs) -> bytes:
+        """
+        发送异步 GET 请求并返回原始二进制内容。
+
+        :param url: 请求的 URL 地址。
+        :return: 原始二进制内容。
+        """
+        return (
+            await self._auto_request(self.obtainContent, "GET", url, *args, **kwargs)
+        )[1]
+
+    async def postText(
+        self, url: str, data: Any = None, json: Any = None, *args, **kwargs
+    ) -> str:
+        """
+        发送异步 POST 请求并返回解码后的文本内容。
+
+        :param url: 请求的 URL 地址。
+        :param data: 表单数据。
+        :param json: JSON 数据。
+        :return: 解码后的文本内容。
+        """
+        return (
+            await self._auto_request(
+                self.obtainText, "POST", url, data=data, json=json, *args, **kwargs
+            )
+        )[1]
+
+    async def postContent(
+        self, url: str, data: Any = None, json: Any = None, *args, **kwargs
+    ) -> bytes:
+        """
+        发送异步 POST 请求并返回原始二进制内容。
+
+        :param url: 请求的 URL 地址。
+        :param data: 表单数据。
+        :param json: JSON 数据。
+        :return: 原始二进制内容。
+        """
+        return (
+            await self._auto_request(
+                self.obtainContent, "POST", url, data=data, json=json, *args, **kwargs
+            )
+        )[1]
+
+    async def _stream_once(
+        self,
+        url: str,
+        part_path: Path,
+        hasher,
+        chunk_size: int,
+        resume: bool,
+        proxy: str | None = None,
+    ):
+        """
+        异步发送一次流式请求并把响应体追加写入临时文件，部分文件存在时使用 Range 续传。
+        写文件与计算哈希在线程中进行，不阻塞事件循环。
+
+        :param url: 下载的 URL 地址。
+        :param part_path: 临时文件路径。
+        :param hasher: 已包含临时文件现有内容的哈希对象。
+        :param chunk_size: 每次写入的块大小。
+        :param resume: 是否使用 Range 续传。
+        :param proxy: 使用的代理名称，None 表示直连。
+        :return: (哈希对象, 是否已完整) 元组。
+        :raises DownloadError: 服务器返回错误状态码时抛出。
+        """
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if resume and offset else {}
+
+        await self.rate_limiter.acquire_async(url)
+        status = None
+        response_headers = None
+        error = False
+        try:
+            async with self._limit(url), self._lease_client(proxy) as client:
+                async with client.stream("GET", url, headers=headers) as response:
+                    status, response_headers = response.status_code, response.headers
+                    action = self._get_stream_action(
+                        url, status, response_headers, offset
+                    )
+                    hasher, complete = self._apply_stream_action(
+                        action, part_path, hasher
+                    )
+                    if complete is not None:
+                        return hasher, complete
+
+                    written = 0
+                    with open(part_path, "ab" if action == "append" else "wb") as f:
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            written += await asyncio.to_thread(
+                                self._write_chunk, f, hasher, chunk
+                            )
+                    self._check_body_length(
+                        url, response.headers.get("Content-Length"), written
+                    )
+                    return hasher, True
+        except RequestError:
+            error = True
+            raise
+        finally:
+            self.rate_limiter.release(url, status, response_headers, error)
+
+    async def stream_to_file(
+        self,
+        url: str,
+        path: str | Path,
+        chunk_size: int = 1024 * 1024,
+        resume: bool = True,
+        hash_algorithm: str = "sha256",
+    ) -> tuple[Path, int, str]:
+        """
+        以流的方式异步下载到文件，语义与 Fetcher.stream_to_file 一致：
+        先写入 '<文件名>.part'，边下载边计算哈希，完成后原子重命名；中断后以 HTTP Range 续传。
+
+        :param url: 下载的 URL 地址。
+        :param path: 目标文件路径。
+        :param chunk_size: 每次写入的块大小。
+        :param resume: 是否对已存在的部分文件续传。
+        :param hash_algorithm: hashlib 支持的哈希算法名。
+        :return: (路径, 文件大小, 十六进制哈希) 元组。
+        :raises DownloadError: 服务器返回错误状态码，或重试次数用尽时抛出。
+        """
+        path, part_path, hasher = await asyncio.to_thread(
+            self._open_part, path, resume, hash_algorithm, chunk_size
+        )
+
+        tried_proxies = set()
+        for attempt in range(self._max_repeat):
+            proxy = self._acquire_proxy(tried_proxies)
+            try:
+                hasher, complete = await self._stream_once(
+                    url, part_path, hasher, chunk_size, resume, proxy
+                )
+            except RequestError as e:
+                hasher, delay = self._handle_stream_error(
+                    e, proxy, attempt, tried_proxies, part_path, hasher, resume
+                )
+                await self._switch_proxy(tried_proxies, proxy)
+                await asyncio.sleep(delay)
                 continue
+            except BaseException:
+                self._release_proxy(proxy)
+                raise
+            # 下载耗时与文件大小有关，不作为代理的延迟样本
+            self._release_proxy(proxy)
 
-            except PoolTimeout as e:
-                # 连接池耗尽，多为瞬时高并发问题
-                print(
-                    f"⚠️ 连接池耗尽: {type(e).__name__}，等待后重试…"
-                ) if self.show_info else None
-                time.sleep(random.uniform(2, 4))
+            if complete:
+                return self._commit_part(part_path, path, hasher)
+
+        raise DownloadError(f"🚫 下载失败, 已重试 {self._max_repeat} 次: {url}")
+
+    async def probe(self, url: str) -> tuple[int | None, bool]:
+        """
+        异步探测资源大小与是否支持按范围下载，语义与 Fetcher.probe 一致。
+
+        :param url: 资源的 URL 地址。
+        :return: (文件大小, 是否支持 Range) 元组；大小未知时为 None。
+        :raises DownloadError: 服务器返回错误状态码时抛出。
+        """
+        proxy = self._acquire_proxy(set())
+        await self.rate_limiter.acquire_async(url)
+        status = None
+        response_headers = None
+        started = time.perf_counter()
+        error = False
+        try:
+            async with self._limit(url), self._lease_client(proxy) as client:
+                async with client.stream(
+                    "GET", url, headers={"Range": "bytes=0-0"}
+                ) as response:
+                    status, response_headers = response.status_code, response.headers
+        except RequestError:
+            error = True
+            raise
+        finally:
+            # 被取消或抛出其他异常时也要归还限速器名额与代理
+            self._release_probe(url, status, response_headers, error, proxy, started)
+        return self._parse_probe(url, status, response_headers)
+
+    async def _fetch_range(
+        self, url: str, part_path: Path, start: int, end: int, chunk_size: int
+    ) -> int:
+        """
+        异步下载 [start, end] 字节范围并按偏移写入预分配的文件，中断后从已写入的位置继续请求。
+
+        :param url: 资源的 URL 地址。
+        :param part_path: 预分配的临时文件。
+        :param start: 起始偏移（含）。
+        :param end: 结束偏移（含）。
+        :param chunk_size: 每次写入的块大小。
+        :return: 写入的字节数。
+        :raises DownloadError: 服务器不按范围响应，或重试次数用尽时抛出。
+        """
+        offset = start
+        tried_proxies = set()
+        with open(part_path, "r+b") as f:
+            for attempt in range(self._max_repeat):
+                proxy = self._acquire_proxy(tried_proxies)
+                await self.rate_limiter.acquire_async(url)
+                status = None
+                response_headers = None
+                error = None
+                try:
+                    async with self._limit(url), self._lease_client(proxy) as client:
+                        async with client.stream(
+                            "GET", url, headers={"Range": f"bytes={offset}-{end}"}
+                        ) as response:
+                            status, response_headers = (
+                                response.status_code,
+                                response.headers,
+                            )
+                            if self._check_range_response(
+                                url, status, response_headers, offset
+                            ):
+                                async for chunk in response.aiter_bytes(chunk_size):
+                                    chunk = chunk[: end + 1 - offset]
+                                    await asyncio.to_thread(
+                                        self._write_at, f, chunk, offset
+                                    )
+                                    offset += len(chunk)
+                except RequestError as e:
+                    error = e
+                finally:
+                    delay = self._end_range_attempt(
+                        url,
+                        status,
+                        response_headers,
+                        error,
+                        proxy,
+                        attempt,
+                        tried_proxies,
+                        offset,
+                    )
+
+                if error is not None:
+                    await self._switch_proxy(tried_proxies, proxy)
+                if offset > end:
+                    return end + 1 - start
+                await asyncio.sleep(delay)
+
+        raise DownloadError(
+            f"🚫 分块 {start}-{end} 下载失败, 已重试 {self._max_repeat} 次: {url}"
+        )
+
+    async def download_ranged(
+        self,
+        url: str,
+        path: str | Path,
+        connections: int = 4,
+        min_part_size: int = 8 * 1024 * 1024,
+        chunk_size: int = 1024 * 1024,
+        hash_algorithm: str = "sha256",
+        expected_hash: str | None = None,
+    ) -> tuple[Path, int, str]:
+        """
+        多连接分块下载大文件的异步版本，语义与 Fetcher.download_ranged 一致：
+        各字节范围由 asyncio.gather 并发下载并按偏移写入预分配的 '<文件名>.part'，
+        服务器不支持 Range、大小未知或文件较小时退回 stream_to_file 单连接下载。
+
+        :param url: 下载的 URL 地址。
+        :param path: 目标文件路径。
+        :param connections: 并发连接数。
+        :param min_part_size: 每个分块的最小字节数，文件不足两个分块时不拆分。
+        :param chunk_size: 每次写入的块大小。
+        :param hash_algorithm: hashlib 支持的哈希算法名。
+        :param expected_hash: 期望的十六进制哈希，给出时校验不一致会抛出异常。
+        :return: (路径, 文件大小, 十六进制哈希) 元组。
+        :raises DownloadError: 下载失败、大小或哈希校验不通过时抛出。
+        """
+        path = Path(path)
+        size, accept_ranges = await self.probe(url)
+        ranges = self._plan_ranges(size, accept_ranges, connections, min_part_size)
+        if not ranges:
+            path, size, digest = await self.stream_to_file(
+                url, path, chunk_size, hash_algorithm=hash_algorithm
+            )
+        else:
+            part_path = await asyncio.to_thread(self._allocate_part, path, size)
+            tasks = [
+                asyncio.create_task(self._fetch_range(url, part_path, *r, chunk_size))
+                for r in ranges
+            ]
+            try:
+                written = sum(await asyncio.gather(*tasks))
+            except BaseException:
+                # 一个分块失败时取消其余分块，等它们退出后再删除临时文件
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                part_path.unlink(missing_ok=True)
+                raise
+            digest = await asyncio.to_thread(
+                self._finish_ranged,
+                url,
+                path,
+                part_path,
+                size,
+                written,
+                hash_algorithm,
+                chunk_size,
+            )
+
+        self._check_hash(url, path, digest, expected_hash)
+        return path, size, digest
+
+    @asynccontextmanager
+    async def _limit(self, url: str):
+        """
+        在全局与主机并发限制内执行一段请求。
+
+        :param url: 请求的 URL 地址。
+        """
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._global_semaphore, self._get_host_semaphore(url):
+            yield
+
+    async def _auto_request(self, method, request_mode, *method_args, **method_kwargs):
+        """
+        异步自动请求核心方法，重试、限速与代理切换逻辑与 Fetcher._auto_request 一致。
+
+        :param method: 获取响应内容的方法（obtainText 或 obtainContent）。
+        :param request_mode: 请求方式，'GET' 或 'POST'。
+        :return: (状态码, 响应内容) 元组。
+        :raises RuntimeError: 代理模式下所有重试均失败时抛出。
+        :raises httpx.RequestError: 直连模式下连接失败，或读超时重试次数用尽时抛出。
+        """
+        url = str(method_args[0] if method_args else method_kwargs["url"])
+        cache_key = self._get_cache_key(request_mode, method_args, method_kwargs)
+        tried_proxies = set()
+        for attempt in range(self._max_repeat):
+            proxy = self._acquire_proxy(tried_proxies)
+            responses: list[httpx.Response] = []
+            await self.rate_limiter.acquire_async(url)
+            started = time.perf_counter()
+            status = None
+            released = False
+            try:
+                async with self._limit(url), self._lease_client(proxy) as client:
+                    request_func = client.post if request_mode == "POST" else client.get
+
+                    async def func(*args, **kwargs):
+                        if cache_key is None:
+                            response = await request_func(*args, **kwargs)
+                            responses.append(response)
+                            return response
+
+                        # 缓存的 SQLite 与响应体读写放到线程中，不阻塞事件循环
+                        request_kwargs = await asyncio.to_thread(
+                            self._add_validators, cache_key, kwargs
+                        )
+                        response = await request_func(*args, **request_kwargs)
+                        cached = await asyncio.to_thread(
+                            self._apply_cache, cache_key, response
+                        )
+                        if cached is None:
+                            # 304 时缓存内容已被淘汰，不带条件请求头重新请求
+                            response = await request_func(*args, **kwargs)
+                            cached = await asyncio.to_thread(
+                                self._apply_cache, cache_key, response
+                            )
+                        responses.append(response)
+                        return cached if cached is not None else response
+
+                    status, content = await method(func, *method_args, **method_kwargs)
+            except RequestError as e:
+                released = True
+                switch, delay = self._handle_request_error(
+                    url, e, proxy, attempt, tried_proxies
+                )
+                if switch:
+                    await self._switch_proxy(tried_proxies, proxy)
+                await asyncio.sleep(delay)
                 continue
+            finally:
+                if not released:
+                    # 正常返回，或被取消、抛出其他异常时也要归还名额
+                    self.rate_limiter.release(
+                        url, status, responses[-1].headers if responses else None
+                    )
+
+            headers = responses[-1].headers if responses else None
+            done, switch, delay = self._handle_response(
+                status, headers, proxy, started, attempt, tried_proxies
+            )
+            if switch:
+                await self._switch_proxy(tried_proxies, proxy)
+            if done:
+                return status, content
+            await asyncio.sleep(delay)
 
         raise RuntimeError("🚫 所有节点均请求失败！")
+
+    async def aclose(self):
+        """关闭所有客户端。"""
+        clients = set(self._client_users) | self._retired_clients
+        self.cl = None
+        self._proxy_clients.clear()
+        self._client_users.clear()
+        self._retired_clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    async def __aenter__(self):
+        await self.init_client()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
@@ -3,7 +3,12 @@
 
 
 from ..tools.ListDictTools import dictkey_mix
-from ..tools.TextTools import calculate_similarity, get_lcs, string_split
+from ..tools.TextTools import (
+    calculate_similarity,
+    get_lcs,
+    get_matching_blocks,
+    string_split,
+)
 
 
 class Findiffer:
@@ -25,30 +30,70 @@ class Findiffer:
         """
         比较两个字符串的差异，按分隔符分段后逐段高亮不同部分并输出相似度。
 
+        先以整段为单位对齐两边的分段（插入或删除一段不会让后面的分段错位），
+        再只对改动过的分段做字符级比较。
+
         :param string_a: 第一个字符串。
         :param string_b: 第二个字符串。
-        :param split_str: 分隔符，用于将字符串分段比较；为 None 时不分段。
+        :param split_str: 分隔符，如 '\n' 按行、' ' 按词分段；为 None 时按空白字符分段。
         """
         # 以split_str为分割符将a和b分割
         list_a = string_split(string_a, split_str=split_str)
         list_b = string_split(string_b, split_str=split_str)
-        part_len = min(len(list_a), len(list_b))
+        multi_part = len(list_a) > 1 or len(list_b) > 1
 
-        # 比较a和b的每一部分
-        for i in range(part_len):
-            if list_a[i] == list_b[i]:
+        for tag, i1, i2, j1, j2 in self.get_opcodes(list_a, list_b):
+            if tag == "equal":
                 continue
 
-            # 如果a和b的每一行不同，则调用compare_strings()方法比较
-            lcs_part = get_lcs(list_a[i], list_b[i])
-            self.compare_strings(list_a[i], list_b[i], lcs_part)
+            # 改动区间内按顺序两两配对做字符级比较，多出的分段整段高亮
+            paired = min(i2 - i1, j2 - j1)
+            for offset in range(paired):
+                i, j = i1 + offset, j1 + offset
+                lcs_part = get_lcs(list_a[i], list_b[j])
+                self.compare_strings(list_a[i], list_b[j], lcs_part)
+
+                # print(f"(LCS: {self.split_part_str.join(lcs_part)})")
+                similarity = calculate_similarity(list_a[i], list_b[j], lcs_part)
+                if not multi_part:
+                    print(f"(相似度：{similarity})\n")
+                elif i == j:
+                    print(f"(第{i + 1}行, 相似度：{similarity})\n")
+                else:
+                    print(f"(a第{i + 1}行 b第{j + 1}行, 相似度：{similarity})\n")
+
+            for i in range(i1 + paired, i2):
+                self.print_diffs(list_a[i], [[0, len(list_a[i])]])
+                print(f"(a第{i + 1}行, b中没有)\n")
+            for j in range(j1 + paired, j2):
+                self.print_diffs(list_b[j], [[0, len(list_b[j])]])
+                print(f"(b第{j + 1}行, a中没有)\n")
+
+    def get_opcodes(
+        self, list_a: list[str], list_b: list[str]
+    ) -> list[tuple[str, int, int, int, int]]:
+        """
+        以整段为单位对齐两个分段列表，返回与 difflib 相同格式的操作码。
 
-            # print(f"(LCS: {self.split_part_str.join(lcs_part)})")
-            similarity = calculate_similarity(list_a[i], list_b[i], lcs_part)
-            if part_len > 1:
-                print(f"(第{i + 1}行, 相似度：{similarity})\n")
-            else:
-                print(f"(相似度：{similarity})\n")
+        :param list_a: 第一个分段列表。
+        :param list_b: 第二个分段列表。
+        :return: (tag, i1, i2, j1, j2) 列表，tag 为 'equal'、'replace'、'delete' 或 'insert'，
+            表示 list_a[i1:i2] 与 list_b[j1:j2] 的关系。
+        """
+        opcodes = []
+        i = j = 0
+        blocks = get_matching_blocks(list_a, list_b)
+        for block_i, block_j, size in [*blocks, (len(list_a), len(list_b), 0)]:
+            if i < block_i and j < block_j:
+                opcodes.append(("replace", i, block_i, j, block_j))
+            elif i < block_i:
+                opcodes.append(("delete", i, block_i, j, j))
+            elif j < block_j:
+                opcodes.append(("insert", i, i, j, block_j))
+            if size:
+                opcodes.append(("equal", block_i, block_i + size, block_j, block_j + size))
+            i, j = block_i + size, block_j + size
+        return opcodes
 
     def fd_dict(self, dict_a: dict, dict_b: dict):
         """
@@ -90,7 +135,7 @@ class Findiffer:
         :param str2: 第二个字符串。
         :param lcs_part: 预计算的最长公共子序列部分列表；为 None 时自动计算。
         """
-        lcs_part = get_lcs(str1, str2, lcs_part) if lcs_part is None else lcs_part
+        lcs_part = get_lcs(str1, str2) if lcs_part is None else lcs_part
 
         diff_ranges_1 = self.get_diff_ranges(str1, lcs_part[:])
         diff_ranges_2 = self.get_diff_ranges(str2, lcs_part[:])
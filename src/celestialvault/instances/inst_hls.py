@@ -0,0 +1,474 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+from urllib.parse import urljoin
+
+from httpx import RequestError
+
+from .inst_error import DownloadError, FFmpegError
+from .inst_fetch import Fetcher
+from .inst_ratelimit import backoff_delay
+
+_ATTRIBUTE_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def parse_attribute_list(text: str) -> dict[str, str]:
+    """
+    解析 m3u8 标签的属性列表，如 'METHOD=AES-128,URI="key.bin",IV=0x...'。
+
+    :param text: 标签冒号之后的内容。
+    :return: 属性名到属性值的字典，带引号的值会去掉引号。
+    """
+    return {
+        name: value.strip('"') for name, value in _ATTRIBUTE_PATTERN.findall(text)
+    }
+
+
+@dataclass(frozen=True)
+class HLSKey:
+    """
+    分段的加密信息（#EXT-X-KEY）。
+
+    :param method: 加密方式，'AES-128' 或 'NONE'。
+    :param uri: 密钥的绝对 URL。
+    :param iv: 显式给出的 16 字节 IV，未给出时按分段序号生成。
+    """
+
+    method: str
+    uri: str | None = None
+    iv: bytes | None = None
+
+
+@dataclass(frozen=True)
+class HLSSegment:
+    """
+    媒体播放列表中的一个分段。
+
+    :param sequence: 分段序号（#EXT-X-MEDIA-SEQUENCE 起算）。
+    :param url: 分段的绝对 URL。
+    :param duration: 分段时长（秒）。
+    :param key: 加密信息，未加密时为 None。
+    :param init_url: fMP4 初始化分段（#EXT-X-MAP）的绝对 URL。
+    """
+
+    sequence: int
+    url: str
+    duration: float = 0.0
+    key: HLSKey | None = None
+    init_url: str | None = None
+
+    def get_iv(self) -> bytes:
+        """
+        获取解密使用的 IV：优先使用显式 IV，否则为分段序号的 16 字节大端表示。
+
+        :return: 16 字节 IV。
+        """
+        if self.key is not None and self.key.iv is not None:
+            return self.key.iv
+        return self.sequence.to_bytes(16, "big")
+
+
+@dataclass
+class HLSPlaylist:
+    """
+    解析后的 m3u8 播放列表。主播放列表只包含 variants，媒体播放列表只包含 segments。
+
+    :param variants: (带宽, 绝对 URL) 列表。
+    :param segments: 分段列表。
+    """
+
+    variants: list[tuple[int, str]] = field(default_factory=list)
+    segments: list[HLSSegment] = field(default_factory=list)
+
+    @property
+    def is_master(self) -> bool:
+        return bool(self.variants)
+
+    def get_best_variant(self) -> str:
+        """
+        获取带宽最高的子播放列表。
+
+        :return: 子播放列表的绝对 URL。
+        """
+        return max(self.variants, key=lambda variant: variant[0])[1]
+
+
+def parse_m3u8(text: str, base_url: str) -> HLSPlaylist:
+    """
+    解析 m3u8 播放列表，支持主播放列表与媒体播放列表。
+
+    :param text: 播放列表文本。
+    :param base_url: 播放列表自身的 URL，用于解析相对地址。
+    :return: 解析后的 HLSPlaylist。
+    :raises ValueError: 文本不是 m3u8 播放列表，或包含不支持的特性时抛出。
+    """
+    lines = [line.strip() for line in text.lstrip("\ufeff").splitlines()]
+    if not lines or lines[0] != "#EXTM3U":
+        raise ValueError(f"不是有效的 m3u8 播放列表: {base_url}")
+
+    playlist = HLSPlaylist()
+    sequence = 0
+    duration = 0.0
+    key: HLSKey | None = None
+    init_url: str | None = None
+    pending_bandwidth: int | None = None
+
+    for line in lines[1:]:
+        if not line:
+            continue
+        if line.startswith("#"):
+            tag, _, value = line.partition(":")
+            if tag == "#EXT-X-STREAM-INF":
+                attributes = parse_attribute_list(value)
+                pending_bandwidth = int(attributes.get("BANDWIDTH", 0))
+            elif tag == "#EXT-X-MEDIA-SEQUENCE":
+                sequence = int(value)
+            elif tag == "#EXTINF":
+                duration = float(value.split(",", 1)[0] or 0)
+            elif tag == "#EXT-X-KEY":
+                attributes = parse_attribute_list(value)
+                method = attributes.get("METHOD", "NONE")
+                if method == "NONE":
+                    key = None
+                elif method == "AES-128":
+                    iv = attributes.get("IV")
+                    key = HLSKey(
+                        method,
+                        urljoin(base_url, attributes["URI"]),
+                        bytes.fromhex(iv[2:].rjust(32, "0")) if iv else None,
+                    )
+                else:
+                    raise ValueError(f"不支持的加密方式: {method}")
+            elif tag == "#EXT-X-MAP":
+                init_url = urljoin(base_url, parse_attribute_list(value)["URI"])
+            elif tag == "#EXT-X-BYTERANGE":
+                raise ValueError("暂不支持 #EXT-X-BYTERANGE 分段")
+            continue
+
+        url = urljoin(base_url, line)
+        if pending_bandwidth is not None:
+            playlist.variants.append((pending_bandwidth, url))
+            pending_bandwidth = None
+            continue
+        playlist.segments.append(HLSSegment(sequence, url, duration, key, init_url))
+        sequence += 1
+        duration = 0.0
+
+    return playlist
+
+
+def decrypt_aes128(data: bytes, key: bytes, iv: bytes) -> bytes:
+    """
+    按 HLS 规范解密 AES-128（CBC + PKCS7 填充）分段。
+
+    :param data: 密文。
+    :param key: 16 字节密钥。
+    :param iv: 16 字节 IV。
+    :return: 明文。
+    :raises ValueError: 密文长度或填充不合法时抛出。
+    """
+    from Cryptodome.Cipher import AES
+    from Cryptodome.Util.Padding import unpad
+
+    return unpad(AES.new(key, AES.MODE_CBC, iv).decrypt(data), AES.block_size)
+
+
+class HLSDownloader:
+    """
+    原生 HLS（m3u8）下载器：解析播放列表后通过 Fetcher 并发下载分段，
+    支持 AES-128 解密、单个分段失败重试，以及基于分段清单的断点续传；
+    所有分段下载完成后只拼接一次，目标格式不是 TS/fMP4 时再用 ffmpeg 无损转封装一次。
+    """
+
+    def __init__(
+        self,
+        fetcher: Fetcher | None = None,
+        max_workers: int = 8,
+        max_retries: int = 3,
+    ):
+        """
+        :param fetcher: 用于下载的 Fetcher，为 None 时每次下载自动创建并在结束时关闭。
+        :param max_workers: 同时下载的分段数。
+        :param max_retries: 单个分段的最大重试次数（在 Fetcher 自身的重试之外）。
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers 必须大于 0: {max_workers}")
+        self.fetcher = fetcher
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+
+        self._keys: dict[str, bytes] = {}
+        self._key_lock = threading.Lock()
+        self._manifest_lock = threading.Lock()
+
+    # ==== playlist ====
+    def get_playlist(self, fetcher: Fetcher, m3u8_url: str) -> HLSPlaylist:
+        """
+        下载并解析媒体播放列表；若为主播放列表，则选择带宽最高的子播放列表。
+
+        :param fetcher: 用于下载的 Fetcher。
+        :param m3u8_url: m3u8 地址。
+        :return: 媒体播放列表。
+        :raises DownloadError: 播放列表无法解析或不包含分段时抛出。
+        """
+        for _ in range(4):
+            content: bytes = fetcher.getContent(m3u8_url)  # type: ignore[reportUnknownMemberType]
+            try:
+                playlist = parse_m3u8(content.decode("utf-8", "ignore"), m3u8_url)
+            except ValueError as e:
+                raise DownloadError(f"播放列表解析失败: {e}") from e
+            if not playlist.is_master:
+                break
+            m3u8_url = playlist.get_best_variant()
+
+        if playlist.is_master or not playlist.segments:
+            raise DownloadError(f"播放列表中没有可下载的分段: {m3u8_url}")
+        return playlist
+
+    def _get_key(self, fetcher: Fetcher, uri: str) -> bytes:
+        """获取（并缓存）密钥，同一密钥只下载一次。"""
+        with self._key_lock:
+            if uri not in self._keys:
+                key: bytes = fetcher.getContent(uri)  # type: ignore[reportUnknownMemberType]
+                if len(key) != 16:
+                    raise DownloadError(f"密钥长度应为 16 字节, 实际为 {len(key)}: {uri}")
+                self._keys[uri] = key
+            return self._keys[uri]
+
+    # ==== manifest ====
+    @staticmethod
+    def _load_manifest(manifest_path: Path) -> dict[str, dict[str, Any]]:
+        """读取分段清单，忽略崩溃时写了一半的末行。"""
+        records: dict[str, dict[str, Any]] = {}
+        if not manifest_path.exists():
+            return records
+        with open(manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and "file" in record:
+                    records[record["file"]] = record
+        return records
+
+    def _record(self, manifest_path: Path, record: dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._manifest_lock, open(manifest_path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    @staticmethod
+    def _is_done(record: dict[str, Any] | None, url: str, path: Path) -> bool:
+        return (
+            record is not None
+            and record.get("url") == url
+            and path.exists()
+            and path.stat().st_size == record.get("size")
+        )
+
+    # ==== segments ====
+    def _download_segment(
+        self,
+        fetcher: Fetcher,
+        segment: HLSSegment,
+        segment_path: Path,
+        manifest_path: Path,
+    ) -> int:
+        """
+        下载（并解密）单个分段，完成后写入分段清单。
+
+        :return: 分段大小（字节）。
+        :raises DownloadError: 重试次数用尽时抛出。
+        """
+        for attempt in range(self.max_retries):
+            try:
+                if segment.key is None:
+                    _path, size, _digest = fetcher.stream_to_file(segment.url, segment_path)
+                else:
+                    encrypted_path = segment_path.with_suffix(".enc")
+                    fetcher.stream_to_file(segment.url, encrypted_path)
+                    key = self._get_key(fetcher, segment.key.uri)  # type: ignore[arg-type]
+                    data = decrypt_aes128(
+                        encrypted_path.read_bytes(), key, segment.get_iv()
+                    )
+                    part_path = segment_path.with_name(segment_path.name + ".part")
+                    part_path.write_bytes(data)
+                    os.replace(part_path, segment_path)
+                    encrypted_path.unlink()
+                    size = len(data)
+                break
+            except (DownloadError, RequestError, ValueError) as e:
+                if attempt == self.max_retries - 1:
+                    raise DownloadError(
+                        f"分段下载失败, 已重试 {self.max_retries} 次: {segment.url}"
+                    ) from e
+                time.sleep(backoff_delay(attempt))
+
+        self._record(
+            manifest_path,
+            {"file": segment_path.name, "url": segment.url, "size": size},
+        )
+        return size
+
+    def download_segments(
+        self, fetcher: Fetcher, playlist: HLSPlaylist, work_dir: Path
+    ) -> list[Path]:
+        """
+        并发下载所有分段与初始化分段，已记录在分段清单中的分段直接跳过。
+
+        :param fetcher: 用于下载的 Fetcher。
+        :param playlist: 媒体播放列表。
+        :param work_dir: 分段保存目录。
+        :return: 按播放顺序排列的待拼接文件列表（初始化分段插在其首个媒体分段之前）。
+        :raises DownloadError: 任一分段最终下载失败时抛出（已完成的分段保留以便续传）。
+        """
+        work_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = work_dir / "manifest.jsonl"
+        records = self._load_manifest(manifest_path)
+
+        # 初始化分段与媒体分段统一处理；key 为 None 表示不加密
+        jobs: list[tuple[HLSSegment, Path]] = []
+        ordered_paths: list[Path] = []
+        init_paths: dict[str, Path] = {}
+        current_init = None
+        for segment in playlist.segments:
+            if segment.init_url is not None and segment.init_url != current_init:
+                current_init = segment.init_url
+                if current_init not in init_paths:
+                    init_path = work_dir / f"init-{len(init_paths):04d}.mp4"
+                    init_paths[current_init] = init_path
+                    jobs.append((HLSSegment(-1, current_init), init_path))
+                ordered_paths.append(init_paths[current_init])
+            segment_path = work_dir / f"{segment.sequence:08d}.ts"
+            jobs.append((segment, segment_path))
+            ordered_paths.append(segment_path)
+
+        pending = [
+            (segment, path)
+            for segment, path in jobs
+            if not self._is_done(records.get(path.name), segment.url, path)
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self._download_segment, fetcher, segment, path, manifest_path
+                )
+                for segment, path in pending
+            ]
+            errors = [future.exception() for future in futures]
+
+        failed = [error for error in errors if error is not None]
+        if failed:
+            raise DownloadError(
+                f"{len(failed)}/{len(pending)} 个分段下载失败, 重新调用可续传"
+            ) from failed[0]
+        return ordered_paths
+
+    # ==== output ====
+    @staticmethod
+    def concat_segments(segment_paths: list[Path], output_path: Path) -> int:
+        """
+        将分段按顺序拼接为单个文件（先写入临时文件再原子重命名）。
+
+        :param segment_paths: 待拼接的文件列表。
+        :param output_path: 输出路径。
+        :return: 输出文件大小（字节）。
+        """
+        part_path = output_path.with_name(output_path.name + ".part")
+        with open(part_path, "wb") as out:
+            for segment_path in segment_paths:
+                with open(segment_path, "rb") as f:
+                    shutil.copyfileobj(f, out, 1024 * 1024)
+        os.replace(part_path, output_path)
+        return output_path.stat().st_size
+
+    @staticmethod
+    def remux(input_path: Path, output_path: Path, timeout: int = 3600) -> None:
+        """
+        使用 ffmpeg 将拼接好的流无损转封装为目标格式。
+
+        :param input_path: 拼接好的 TS/fMP4 文件。
+        :param output_path: 输出路径，格式由后缀决定。
+        :param timeout: ffmpeg 超时时间（秒）。
+        :raises TimeoutError: 转封装超时时抛出。
+        :raises FFmpegError: ffmpeg 执行失败时抛出。
+        """
+        # 临时文件保留原后缀，ffmpeg 按后缀选择封装格式
+        part_path = output_path.with_name(
+            f".{output_path.stem}.part{output_path.suffix}"
+        )
+        command = ["ffmpeg", "-y", "-i", str(input_path), "-c", "copy", str(part_path)]
+        try:
+            result = subprocess.run(
+                command,
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired as e:
+            raise TimeoutError(f"Remux process timed out for {input_path}.") from e
+        except Exception as e:
+            raise FFmpegError(f"Failed to remux {input_path}.", stderr=str(e)) from e
+
+        if result.returncode != 0:
+            part_path.unlink(missing_ok=True)
+            raise FFmpegError(
+                f"Failed to remux {input_path}.", stderr=result.stderr.strip()
+            )
+        os.replace(part_path, output_path)
+
+    def download(
+        self,
+        m3u8_url: str,
+        output_path: str | Path,
+        keep_segments: bool = False,
+        timeout: int = 3600,
+    ) -> tuple[Path, int]:
+        """
+        下载 m3u8 流媒体并保存为单个文件。
+        分段保存在 '<输出文件名>.segments' 目录，中断后再次调用只下载缺失的分段。
+
+        :param m3u8_url: m3u8 地址。
+        :param output_path: 输出路径；后缀为 .ts（fMP4 流为 .mp4）时直接拼接，否则再用 ffmpeg 转封装。
+        :param keep_segments: 完成后是否保留分段目录。
+        :param timeout: ffmpeg 转封装的超时时间（秒）。
+        :return: (路径, 文件大小) 元组。
+        :raises DownloadError: 播放列表或分段下载失败时抛出。
+        :raises FFmpegError: 转封装失败时抛出。
+        """
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        work_dir = output_path.with_name(output_path.name + ".segments")
+
+        fetcher = self.fetcher or Fetcher()
+        try:
+            playlist = self.get_playlist(fetcher, m3u8_url)
+            segment_paths = self.download_segments(fetcher, playlist, work_dir)
+        finally:
+            if self.fetcher is None:
+                fetcher.close()
+
+        is_fmp4 = any(segment.init_url for segment in playlist.segments)
+        stream_suffix = ".mp4" if is_fmp4 else ".ts"
+        if output_path.suffix.lower() == stream_suffix:
+            size = self.concat_segments(segment_paths, output_path)
+        else:
+            joined_path = work_dir / f"joined{stream_suffix}"
+            self.concat_segments(segment_paths, joined_path)
+            self.remux(joined_path, output_path, timeout)
+            size = output_path.stat().st_size
+
+        if not keep_segments:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_path, size
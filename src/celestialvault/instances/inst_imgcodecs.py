@@ -10,22 +10,19 @@ from ..constants import image_mode_params, style_params
 from ..tools.ImageProcessing import ensure_capacity, generate_palette
 from ..tools.NumberUtils import choose_square_container, redundancy_from_container
 from ..tools.TextTools import (
-    add_length_header_to_bytes,
-    compress_text_to_bytes,
-    crc_decode_bytes,
+    choose_compression,
+    compress_to_frame,
     crc_decode_text,
-    crc_encode_bytes,
     crc_encode_text,
     decode_bytes_from_base64,
     decompress_text_from_bytes,
     encode_bytes_to_base64,
-    pad_bytes,
-    pad_to_align,
-    restore_bytes_from_length_header,
+    frame_bytes,
+    iter_text_bytes,
     rs_decode,
     rs_encode,
     safe_open_txt,
-    unpad_bytes,
+    unframe_bytes,
 )
 
 
@@ -35,6 +32,8 @@ class BaseCodec:
 
     mode_name: str = ""
     show_progress: bool = True  # 默认开启进度条
+    compression: str = "zlib"  # 文本压缩算法，'auto' 时按采样结果自动选择
+    compression_level: int | None = None
 
     # ======== 文本接口 ========
     def encode_text(self, text: str) -> Image.Image:
@@ -50,15 +49,22 @@ class BaseCodec:
     # ======== 二进制接口 ========
     def encode_bytes(self, data: bytes) -> Image.Image:
         """对二进制数据加上 CRC 后再调用子类实现的像素编码"""
-        crc_bytes = crc_encode_bytes(data)
-        lh_bytes = add_length_header_to_bytes(crc_bytes)
+        # [长度头][CRC32][数据]，一次分配完成
+        lh_bytes = frame_bytes(data, length_headers=1, crc=True)
         return self._encode_bytes_core(lh_bytes)
 
     def decode_bytes(self, img: Image.Image) -> bytes:
         """对像素数据解码后，再做 CRC 校验"""
         lh_bytes = self._decode_bytes_core(img)
-        crc_bytes = restore_bytes_from_length_header(lh_bytes)
-        return crc_decode_bytes(crc_bytes)
+        return bytes(unframe_bytes(lh_bytes, length_headers=1, crc=True))
+
+    # ======== 压缩 ========
+    def _compress_text(self, text: str) -> bytearray:
+        """按 compression 与 compression_level 压缩文本，所用算法记录在帧中，解码时自动识别"""
+        algorithm, level = self.compression, self.compression_level
+        if algorithm == "auto":
+            algorithm, level = choose_compression(text)
+        return compress_to_frame(iter_text_bytes(text), level, algorithm)
 
     # ======== 文件接口 ========
     def encode_txt_file(
@@ -437,7 +443,7 @@ class OneBitCodec(BaseCodec):
 
     def _encode_text_core(self, text: str) -> Image.Image:
         # 压缩为二进制
-        compressed_binary = compress_text_to_bytes(text)
+        compressed_binary = self._compress_text(text)
         return self._encode_bytes_core(compressed_binary)
 
     def _decode_text_core(self, img: Image.Image) -> str:
@@ -518,7 +524,7 @@ class ChannelCodec(BaseCodec):
 
     def _encode_text_core(self, text: str) -> Image.Image:
         # 压缩为二进制
-        compressed_binary = compress_text_to_bytes(text)
+        compressed_binary = self._compress_text(text)
         return self._encode_bytes_core(compressed_binary)
 
     def _decode_text_core(self, img: Image.Image) -> str:
@@ -527,7 +533,9 @@ class ChannelCodec(BaseCodec):
         return decompress_text_from_bytes(compressed_binary)
 
     def _encode_bytes_core(self, data: bytes) -> Image.Image:
-        pad_binary = pad_to_align(data, self.channels)
+        pad_binary = frame_bytes(
+            data, length_headers=0, crc=False, align=self.channels
+        )
 
         str_len = len(pad_binary)
         total_pixels_needed = math.ceil(str_len / self.channels)
@@ -602,7 +610,7 @@ class RefRGBALSBCodec(BaseCodec):
 
     def _encode_text_core(self, text: str) -> Image.Image:
         # 压缩为二进制
-        compressed_binary = compress_text_to_bytes(text)
+        compressed_binary = self._compress_text(text)
         return self._encode_bytes_core(compressed_binary)
 
     def _decode_text_core(self, img: Image.Image) -> str:
@@ -692,7 +700,7 @@ class PaletteCodec(BaseCodec):
 
     def _encode_text_core(self, text: str) -> Image.Image:
         # 压缩为二进制
-        compressed_binary = compress_text_to_bytes(text)
+        compressed_binary = self._compress_text(text)
         return self._encode_bytes_core(compressed_binary)
 
     def _decode_text_core(self, img: Image.Image) -> str:
@@ -758,7 +766,7 @@ class PaletteWithRsCodec(BaseCodec):
 
     def _encode_text_core(self, text: str) -> Image.Image:
         # 压缩为二进制
-        compressed_binary = compress_text_to_bytes(text)
+        compressed_binary = self._compress_text(text)
         return self._encode_bytes_core(compressed_binary)
 
     def _decode_text_core(self, img: Image.Image) -> str:
@@ -768,7 +776,9 @@ class PaletteWithRsCodec(BaseCodec):
 
     def _encode_bytes_core(self, data: bytes) -> Image.Image:
         side_len, max_payload, nsym = choose_square_container(len(data), self.threshold)
-        pad_binary = pad_bytes(data, max_payload)
+        pad_binary = frame_bytes(
+            data, length_headers=1, crc=False, target_len=max_payload
+        )
         rs_binary = rs_encode(pad_binary, nsym)
 
         img = Image.new("P", (side_len, side_len))
@@ -804,7 +814,7 @@ class PaletteWithRsCodec(BaseCodec):
 
         nsym = redundancy_from_container(side_len * side_len, self.threshold)
         ders_binary = rs_decode(bytes(bytes_list), nsym)
-        unpad_binary = unpad_bytes(ders_binary)
+        unpad_binary = bytes(unframe_bytes(ders_binary, length_headers=1, crc=False))
 
         return unpad_binary
 
@@ -823,7 +833,7 @@ class RedundancyCodec(BaseCodec):
 
     def _encode_text_core(self, text: str) -> Image.Image:
         # 压缩为二进制
-        compressed_binary = compress_text_to_bytes(text)
+        compressed_binary = self._compress_text(text)
         return self._encode_bytes_core(compressed_binary)
 
     def _decode_text_core(self, img: Image.Image) -> str:
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+
+class JobJournal:
+    """
+    目录处理任务的进度日志（JSON Lines，只追加）。
+
+    每处理完一个文件追加一条记录：源文件路径、大小、修改时间、输出路径与输出大小。
+    输出先写入临时路径，完成后原子地重命名为最终路径，再写入日志；
+    因此日志中的记录一定对应完整的输出，中途崩溃只会留下可丢弃的临时文件。
+    恢复任务时只需比对源文件的大小与修改时间，不再检查输出是否存在。
+    """
+
+    def __init__(
+        self, journal_path: str | Path, fsync: bool = False, adopt_existing: bool = False
+    ):
+        """
+        :param journal_path: 日志文件路径，不存在时会自动创建。
+        :param fsync: 每条记录写入后是否调用 fsync，开启后更安全但更慢。
+        :param adopt_existing: 是否接管日志中没有记录的已有输出（见 seed），默认重新生成。
+        """
+        self.journal_path = Path(journal_path)
+        self.fsync = fsync
+        self.adopt_existing = adopt_existing
+        self._records: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self._load()
+        self._file = open(self.journal_path, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        """读取已有日志，忽略崩溃时写了一半的末行。"""
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and "source" in record:
+                    self._records[record["source"]] = record
+
+    @staticmethod
+    def temp_path(destination: Path) -> Path:
+        """
+        获取输出对应的临时路径，保留原后缀以便按后缀选择格式的处理函数正常工作。
+
+        :param destination: 最终输出路径。
+        :return: 临时路径，形如 '.name.part.ext'。
+        """
+        return destination.with_name(f".{destination.stem}.part{destination.suffix}")
+
+    def is_done(self, source: Path, destination: Path) -> bool:
+        """
+        判断源文件是否已经处理完成：日志中存在记录，且源文件的大小、修改时间与输出路径均未变化。
+
+        :param source: 源文件路径。
+        :param destination: 期望的输出路径。
+        :return: 是否已完成。
+        """
+        record = self._records.get(str(source))
+        if record is None or record.get("output") != str(destination):
+            return False
+        try:
+            stat = source.stat()
+        except FileNotFoundError:
+            return False
+        return record["size"] == stat.st_size and record["mtime"] == stat.st_mtime_ns
+
+    def seed(self, source: Path, destination: Path) -> bool:
+        """
+        开启 adopt_existing 时，源文件在日志中没有任何记录、但输出已经存在（日志启用之前生成的输出，
+        或是原子重命名之后、写入记录之前中断），且输出看起来完整时，把它视为已完成并补写一条记录。
+        日志启用之前的输出可能是中断时写了一半的文件，因此只接管非空、且不早于源文件修改时间的输出。
+
+        :param source: 源文件路径。
+        :param destination: 期望的输出路径。
+        :return: 是否补写了记录；未开启 adopt_existing、源文件已有记录或输出不完整时返回 False。
+        """
+        # 先查日志：已有记录的源文件不再访问文件系统
+        if not self.adopt_existing or str(source) in self._records:
+            return False
+        try:
+            output_stat = destination.stat()
+            source_mtime = source.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if destination.is_dir():
+            if not any(destination.iterdir()):
+                return False
+        elif output_stat.st_size == 0:
+            return False
+        if output_stat.st_mtime_ns < source_mtime:
+            return False
+        self._record_output(source, destination)
+        return True
+
+    def commit(self, source: Path, temp_path: Path, destination: Path) -> int:
+        """
+        将临时输出原子地替换为最终输出，并写入一条完成记录。
+
+        :param source: 源文件路径。
+        :param temp_path: 处理函数写入的临时路径。
+        :param destination: 最终输出路径。
+        :return: 输出大小（字节）。
+        :raises FileNotFoundError: 处理函数没有生成临时输出时抛出。
+        """
+        if not temp_path.exists():
+            raise FileNotFoundError(f"处理函数没有生成输出: {temp_path}")
+
+        # 走到这里的旧输出来自日志中已过期的记录（源文件已变化），或是没有被 seed 接管的输出，
+        # 直接用新输出覆盖
+        if destination.is_dir() and not destination.is_symlink():
+            shutil.rmtree(destination)
+        os.replace(temp_path, destination)
+        return self._record_output(source, destination)
+
+    def _record_output(self, source: Path, destination: Path) -> int:
+        """统计输出大小，并写入源文件当前状态对应的完成记录。"""
+        if destination.is_dir():
+            output_size = sum(
+                file.stat().st_size for file in destination.rglob("*") if file.is_file()
+            )
+        else:
+            output_size = destination.stat().st_size
+
+        stat = source.stat()
+        self.record(
+            {
+                "source": str(source),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "output": str(destination),
+                "output_size": output_size,
+                "finished": time.time(),
+            }
+        )
+        return output_size
+
+    def record(self, record: dict[str, Any]) -> None:
+        """
+        追加一条记录。
+
+        :param record: 记录内容，必须包含 'source' 字段。
+        """
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._records[record["source"]] = record
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def close(self) -> None:
+        """关闭日志文件。"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self) -> JobJournal:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import random
+import threading
+from typing import Any
+
+import requests
+
+# Clash 中不是真实节点的特殊代理名
+CLASH_SPECIAL_PROXIES = frozenset(
+    {"DIRECT", "REJECT", "GLOBAL", "Proxy", "节点选择", "自动选择"}
+)
+
+
+class _ProxyState:
+    """单个代理的统计信息。"""
+
+    def __init__(self, url: str, latency: float):
+        self.url = url
+        self.latency = latency
+        self.error = 0.0
+        self.in_flight = 0
+        self.requests = 0
+
+
+class ProxyPool:
+    """
+    按实时表现调度的代理池。
+
+    每个代理对应一个本地代理地址（例如 Clash 为每个节点单独开放的监听端口），
+    不同线程/协程可以同时通过不同的代理发出请求，无需切换全局选择器。
+    每次请求结束后用实际耗时与成败更新该代理的延迟、错误率 EWMA，
+    选择代理时按 (1 - 错误率)² / (延迟 × (1 + 进行中请求数)) 加权随机。
+    """
+
+    def __init__(
+        self,
+        proxies: dict[str, str],
+        alpha: float = 0.3,
+        latencies: dict[str, float] | None = None,
+        default_latency: float = 1.0,
+    ):
+        """
+        :param proxies: 代理名称到代理地址的映射，如 {'HK-01': 'http://127.0.0.1:7901'}。
+        :param alpha: EWMA 的平滑系数，越大越偏向最近的请求。
+        :param latencies: 各代理的初始延迟（秒），例如 Clash 的测速结果。
+        :param default_latency: 没有初始延迟时使用的延迟（秒）。
+        """
+        if not proxies:
+            raise ValueError("代理池不能为空")
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha 必须在 (0, 1] 之间: {alpha}")
+        latencies = latencies or {}
+        self.alpha = alpha
+        self._states = {
+            name: _ProxyState(url, latencies.get(name, default_latency))
+            for name, url in proxies.items()
+        }
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load_clash_nodes(clash_api: str) -> list[tuple[str, float | None]]:
+        """
+        从 Clash API 读取节点列表（保持 GLOBAL 中的顺序）及其最近一次测速延迟。
+
+        :param clash_api: Clash API 地址。
+        :return: (节点名称, 延迟秒数) 列表，没有测速记录的延迟为 None。
+        """
+        resp = requests.get(f"{clash_api}/proxies")
+        proxies_info = resp.json().get("proxies", {})
+        global_proxy_names = proxies_info.get("GLOBAL", {}).get("all", [])
+
+        nodes = []
+        for name in global_proxy_names:
+            if name in CLASH_SPECIAL_PROXIES:
+                continue
+            delay = None
+            try:
+                delay = proxies_info[name]["extra"][
+                    "http://www.gstatic.com/generate_204"
+                ]["history"][0]["delay"]
+                delay = delay / 1000 if delay else None  # 0 表示测速超时
+            except (KeyError, IndexError, TypeError):
+                pass  # 该节点没有测速记录
+            nodes.append((name, delay))
+        return nodes
+
+    @staticmethod
+    def make_clash_listeners(
+        names: list[str], base_port: int, listen: str = "127.0.0.1"
+    ) -> list[dict[str, Any]]:
+        """
+        生成 Clash（mihomo）的 listeners 配置：第 i 个节点监听 base_port + i。
+
+        :param names: 节点名称列表，顺序需与 from_clash 使用的顺序一致（即 load_clash_nodes 的顺序）。
+        :param base_port: 起始端口。
+        :param listen: 监听地址。
+        :return: 可写入配置文件 listeners 字段的列表。
+        """
+        return [
+            {
+                "name": f"pool-{index}",
+                "type": "mixed",
+                "port": base_port + index,
+                "listen": listen,
+                "proxy": name,
+            }
+            for index, name in enumerate(names)
+        ]
+
+    @classmethod
+    def from_clash(
+        cls,
+        clash_api: str,
+        base_port: int,
+        top_n: int = 40,
+        host: str = "127.0.0.1",
+        **kwargs: Any,
+    ) -> ProxyPool:
+        """
+        基于 Clash 构建代理池。需要事先用 make_clash_listeners 为每个节点配置独立的监听端口。
+
+        :param clash_api: Clash API 地址。
+        :param base_port: 第一个节点的监听端口。
+        :param top_n: 按测速延迟保留的节点数。
+        :param host: 监听端口所在的主机。
+        :return: 代理池。
+        """
+        nodes = cls.load_clash_nodes(clash_api)
+        ports = {name: base_port + index for index, (name, _) in enumerate(nodes)}
+        fastest = sorted(nodes, key=lambda node: node[1] or float("inf"))[:top_n]
+        return cls(
+            {name: f"http://{host}:{ports[name]}" for name, _ in fastest},
+            latencies={name: delay for name, delay in fastest if delay},
+            **kwargs,
+        )
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._states)
+
+    def get_proxy_url(self, name: str) -> str:
+        """
+        获取代理地址。
+
+        :param name: 代理名称。
+        :return: 代理地址。
+        """
+        return self._states[name].url
+
+    @staticmethod
+    def _get_weight(state: _ProxyState) -> float:
+        return max(1 - state.error, 0.02) ** 2 / (
+            max(state.latency, 0.01) * (1 + state.in_flight)
+        )
+
+    def acquire(self, exclude: set[str] | None = None) -> str:
+        """
+        加权随机选择一个代理并记为进行中。
+
+        :param exclude: 本次请求已经失败过的代理，全部排除时在所有代理中选择。
+        :return: 代理名称。
+        """
+        with self._lock:
+            names = [name for name in self._states if name not in (exclude or ())]
+            names = names or list(self._states)
+            weights = [self._get_weight(self._states[name]) for name in names]
+            name = random.choices(names, weights)[0]
+            self._states[name].in_flight += 1
+            return name
+
+    def release(
+        self, name: str, latency: float | None = None, error: bool = False
+    ) -> None:
+        """
+        归还代理并更新统计。
+
+        :param name: 代理名称。
+        :param latency: 本次请求耗时（秒）。
+        :param error: 本次请求是否因代理问题失败。
+        """
+        with self._lock:
+            state = self._states[name]
+            state.in_flight = max(state.in_flight - 1, 0)
+            state.requests += 1
+            state.error += self.alpha * (float(error) - state.error)
+            if latency is not None:
+                state.latency += self.alpha * (latency - state.latency)
+
+    def get_stats(self) -> dict[str, dict[str, Any]]:
+        """
+        查看各代理的统计信息。
+
+        :return: 代理名称到 {url, latency, error, in_flight, requests} 的映射。
+        """
+        with self._lock:
+            return {
+                name: {
+                    "url": state.url,
+                    "latency": state.latency,
+                    "error": state.error,
+                    "in_flight": state.in_flight,
+                    "requests": state.requests,
+                }
+                for name, state in self._states.items()
+            }
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import httpx
+
+# 表示服务器要求降速的状态码
+THROTTLE_STATUS = frozenset({429, 503})
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    解析 Retry-After 响应头，支持秒数与 HTTP 日期两种格式。
+
+    :param value: Retry-After 的值。
+    :return: 需要等待的秒数；无法解析时返回 None。
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class _HostState:
+    """单个主机的令牌桶与拥塞窗口状态。"""
+
+    def __init__(self, rate: float | None, burst: float, concurrency: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.success_streak = 0
+        self.blocked_until = 0.0
+
+    def refill(self, now: float) -> None:
+        if self.rate is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def get_wait(self, now: float) -> float:
+        """返回还需等待的秒数，0 表示可以立即发出请求。"""
+        self.refill(now)
+        wait = max(self.blocked_until - now, 0.0)
+        if self.in_flight >= int(self.concurrency):
+            wait = max(wait, 0.01)
+        if self.rate is not None and self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+
+class HostRateLimiter:
+    """
+    按主机的令牌桶限速器，带 AIMD（加性增、乘性减）的自适应并发。
+
+    - 每个主机一个令牌桶，rate 为每秒请求数，None 表示不限速率只限并发；
+    - 收到 429/503 或网络错误时，速率与并发窗口减半，并遵守 Retry-After；
+    - 连续成功一个窗口的请求后，并发窗口加一、速率加 rate_step，直到上限。
+
+    限速器是线程安全的，同一个实例可以同时被 Fetcher（线程）与 AsyncFetcher（协程）使用。
+    """
+
+    def __init__(
+        self,
+        rate: float | None = None,
+        burst: float | None = None,
+        concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        min_rate: float = 0.2,
+        max_rate: float | None = None,
+        rate_step: float | None = None,
+    ):
+        """
+        :param rate: 每个主机的初始速率（请求/秒），None 表示不限速率。
+        :param burst: 令牌桶容量，默认等于 max(rate, 1)。
+        :param concurrency: 每个主机的初始并发窗口。
+        :param min_concurrency: 并发窗口下限。
+        :param max_concurrency: 并发窗口上限。
+        :param min_rate: 降速时的速率下限。
+        :param max_rate: 提速时的速率上限，默认为初始速率的 4 倍。
+        :param rate_step: 每次加性提速的幅度，默认为初始速率的 10%。
+        """
+        if rate is not None and rate <= 0:
+            raise ValueError(f"rate 必须大于 0: {rate}")
+        if not 1 <= min_concurrency <= concurrency <= max_concurrency:
+            raise ValueError(
+                "需要满足 1 <= min_concurrency <= concurrency <= max_concurrency"
+            )
+        self.rate = rate
+        self.burst = burst or max(rate or 1.0, 1.0)
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.min_rate = min(min_rate, rate) if rate else min_rate
+        self.max_rate = max_rate or (rate * 4 if rate else None)
+        self.rate_step = rate_step or (rate * 0.1 if rate else 0.0)
+
+        self._hosts: dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_host(url: str | httpx.URL) -> str:
+        """
+        获取 URL 的主机名（含端口）。
+
+        :param url: 请求的 URL 地址。
+        :return: 主机名。
+        """
+        url = httpx.URL(str(url))
+        return f"{url.host}:{url.port}" if url.port else url.host
+
+    def _get_state(self, host: str) -> _HostState:
+        if host not in self._hosts:
+            self._hosts[host] = _HostState(self.rate, self.burst, self.concurrency)
+        return self._hosts[host]
+
+    def _try_acquire(self, host: str) -> float:
+        """尝试占用一个名额，成功返回 0，否则返回建议等待的秒数。"""
+        with self._lock:
+            state = self._get_state(host)
+            wait = state.get_wait(time.monotonic())
+            if wait > 0:
+                return wait
+            if state.rate is not None:
+                state.tokens -= 1
+            state.in_flight += 1
+            return 0.0
+
+    def acquire(self, url: str | httpx.URL) -> None:
+        """
+        阻塞直到可以向该主机发出请求。
+
+        :param url: 请求的 URL 地址。
+        """
+        host = self.get_host(url)
+        while (wait := self._try_acquire(host)) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url: str | httpx.URL) -> None:
+        """
+        异步等待直到可以向该主机发出请求。
+
+        :param url: 请求的 URL 地址。
+        """
+        host = self.get_host(url)
+        while (wait := self._try_acquire(host)) > 0:
+            await asyncio.sleep(wait)
+
+    def release(
+        self,
+        url: str | httpx.URL,
+        status: int | None = None,
+        headers: Any = None,
+        error: bool = False,
+    ) -> None:
+        """
+        归还名额并根据结果调整速率与并发窗口。
+
+        :param url: 请求的 URL 地址。
+        :param status: 响应状态码，请求失败时为 None。
+        :param headers: 响应头，用于读取 Retry-After。
+        :param error: 请求是否因网络错误失败。
+        """
+        host = self.get_host(url)
+        retry_after = parse_retry_after(headers.get("Retry-After")) if headers else None
+
+        with self._lock:
+            state = self._get_state(host)
+            state.in_flight = max(state.in_flight - 1, 0)
+            now = time.monotonic()
+
+            if error or status in THROTTLE_STATUS:
+                # 乘性减
+                state.success_streak = 0
+                state.concurrency = max(self.min_concurrency, state.concurrency / 2)
+                if state.rate is not None:
+                    state.refill(now)
+                    state.rate = max(self.min_rate, state.rate / 2)
+                    state.tokens = min(state.tokens, 0.0)
+                if retry_after is not None:
+                    state.blocked_until = max(state.blocked_until, now + retry_after)
+                return
+
+            if status is not None and status < 400:
+                # 加性增：连续成功一个窗口后再提升
+                state.success_streak += 1
+                if state.success_streak >= int(state.concurrency):
+                    state.success_streak = 0
+                    state.concurrency = min(self.max_concurrency, state.concurrency + 1)
+                    if state.rate is not None:
+                        state.refill(now)
+                        state.rate = min(
+                            self.max_rate or state.rate, state.rate + self.rate_step
+                        )
+
+    def get_host_state(self, url: str | httpx.URL) -> dict[str, Any]:
+        """
+        查看主机当前的限速状态。
+
+        :param url: 请求的 URL 地址（或任意同主机的 URL）。
+        :return: 包含 rate、concurrency、in_flight、blocked_for 的字典。
+        """
+        with self._lock:
+            state = self._get_state(self.get_host(url))
+            return {
+                "rate": state.rate,
+                "concurrency": int(state.concurrency),
+                "in_flight": state.in_flight,
+                "blocked_for": max(state.blocked_until - time.monotonic(), 0.0),
+            }
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """
+    带抖动的指数退避时间。
+
+    :param attempt: 第几次重试（从 0 开始）。
+    :param base: 基础等待时间（秒）。
+    :param cap: 等待时间上限（秒）。
+    :return: 本次应等待的秒数。
+    """
+    return random.uniform(0.5, 1.0) * min(cap, base * 2**attempt)
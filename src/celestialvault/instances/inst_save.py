@@ -1,56 +1,194 @@
+import asyncio
 import io
 import json
+import locale
+import os
 import pickle
-import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
 import pandas as pd
 from celestialflow import TaskChain, TaskStage
 
+from ..constants import IMAGE_SUFFIX_TO_FORMAT
 from ..tools.ImageProcessing import binary_to_img, convert_img_format
-from .inst_error import FFmpegError
-from .inst_fetch import Fetcher
+from .inst_cas import ContentStore
+from .inst_fetch import AsyncFetcher, Fetcher
+from .inst_hls import HLSDownloader
 
 
-def meta_get_content(fetcher: Fetcher):
-    def get_content(task: tuple[str, str, str]) -> tuple[bytes, str, str]:
+def meta_stream_content(fetcher: Fetcher, saver: "Saver"):
+    def stream_content(task: tuple[str, str, str | None]) -> tuple[Path, int | None]:
         """
-        从抓取结果中提取内容。
+        将 URL 内容流式下载到 saver 的保存路径，不在内存中缓存整个响应。
 
         :param task: (url, file_name, file_suffix) 元组。
-        :return: (内容, 文件名, 后缀) 元组。
+        :return: (路径, 文件大小) 元组；不可写入时大小为 None。
         """
         url, file_name, file_suffix = task
-        content: bytes = fetcher.getContent(url)  # type: ignore[reportUnknownMemberType]
-        return content, file_name, file_suffix
+        path, can_write = saver._get_writable_path(file_name, file_suffix)
+        if not can_write:
+            return path, None
+        if saver.content_store is not None:
+            return path, saver._store_download(fetcher, url, path)
+        path, size, _digest = fetcher.stream_to_file(url, path)
+        return path, size
+
+    return stream_content
+
+
+class WriteBehindWriter:
+    """
+    后台写入器：写入请求进入有界队列，由专用的写线程池写盘。
+    队列已满时 submit 会阻塞（背压），避免内存中堆积过多待写数据。
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 256):
+        """
+        :param workers: 写线程数。
+        :param max_pending: 队列中最多允许的待写文件数。
+        """
+        if workers < 1 or max_pending < 1:
+            raise ValueError("workers 与 max_pending 必须大于 0")
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="saver-writer"
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending: dict[Future[int], Path] = {}
+        self._errors: list[BaseException] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def write_bytes(path: Path, data: bytes) -> int:
+        """
+        写入文件并返回写入的字节数；目录被外部删除时重新创建后重试一次。
+
+        :param path: 目标路径。
+        :param data: 要写入的内容。
+        :return: 写入的字节数。
+        """
+        try:
+            path.write_bytes(data)
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        return len(data)
+
+    def _done(self, future: Future[int]) -> None:
+        with self._lock:
+            self._pending.pop(future, None)
+            if future.exception() is not None:
+                self._errors.append(future.exception())
+        self._slots.release()
+
+    def submit(self, path: Path, data: bytes) -> Future[int]:
+        """
+        提交一次写入，队列已满时阻塞直到有空位。
 
-    return get_content
+        :param path: 目标路径。
+        :param data: 要写入的内容。
+        :return: 写入完成后结果为字节数的 Future。
+        """
+        self._slots.acquire()
+        future = self._executor.submit(self.write_bytes, path, data)
+        with self._lock:
+            self._pending[future] = path
+        future.add_done_callback(self._done)
+        return future
+
+    def is_pending(self, path: Path) -> bool:
+        """
+        判断路径是否还有尚未写完的写入。
+
+        :param path: 目标路径。
+        :return: 是否在队列中。
+        """
+        with self._lock:
+            return path in self._pending.values()
 
+    def flush(self) -> None:
+        """
+        等待所有已提交的写入完成。
 
-def _save_content_for_task_stage(task: tuple[bytes, str, str | None]) -> Path:
-    """供 TaskStage 使用的包装函数，保持返回 Path 以兼容任务链。"""
-    content, file_name, file_suffix = task
-    saver = Saver()
-    path, _size = saver.save_content(content, file_name, file_suffix)
-    return path
+        :raises OSError: 有写入失败时抛出第一个错误，其余错误被丢弃。
+        """
+        while True:
+            with self._lock:
+                futures = list(self._pending)
+            if not futures:
+                break
+            for future in futures:
+                future.exception()
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        """等待所有写入完成并关闭写线程池。"""
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
 
 
 class Saver:
     """文件保存器，支持文本、二进制、DataFrame、JSON、Pickle 等多种格式的保存和下载。"""
 
-    def __init__(self, base_path: str | Path = ".", overwrite: bool = False):
+    def __init__(
+        self,
+        base_path: str | Path = ".",
+        overwrite: bool = False,
+        write_behind: bool = False,
+        writer_workers: int = 4,
+        max_pending: int = 256,
+        content_store: ContentStore | None = None,
+    ):
         """
         初始化保存器并设置基础路径与覆盖策略。
 
         :param base_path: 文件保存的基础路径。
         :param overwrite: 是否允许覆盖已存在文件。
+        :param write_behind: 是否启用后台写入。启用后 save_* 在数据交给写线程池后立即返回，
+            需要调用 flush() 或 close()（或使用 with 语句）确保数据落盘。
+        :param writer_workers: 后台写线程数。
+        :param max_pending: 后台写入队列的容量，队列满时 save_* 阻塞等待。
+        :param content_store: 内容寻址存储。给出时 download_content / download_image / download_urls(_async)
+            下载的内容按哈希只保存一份，文件名以硬链接（或 manifest 记录）指向它，已下载过的 URL 不再重复下载。
         """
         self.overwrite = overwrite
+        self.content_store = content_store
+        self._created_dirs: set[Path] = set()
+        self._writer = (
+            WriteBehindWriter(writer_workers, max_pending) if write_behind else None
+        )
 
         self.set_base_path(base_path)
         self.set_add_path("")
 
+    def flush(self) -> None:
+        """
+        等待后台写入全部完成；未启用后台写入时什么也不做。
+
+        :raises OSError: 有写入失败时抛出。
+        """
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self) -> None:
+        """等待后台写入完成并关闭写线程池。"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> "Saver":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
     def set_base_path(self, base_path: str | Path) -> None:
         """
         设置文件保存的基础路径。
@@ -76,7 +214,9 @@ class Saver:
         :return: 完整的文件路径（Path）。
         """
         middle_path = self.base_path / self.add_path  # 拼接路径
-        middle_path.mkdir(parents=True, exist_ok=True)  # 确保目录存在
+        if middle_path not in self._created_dirs:
+            middle_path.mkdir(parents=True, exist_ok=True)  # 确保目录存在
+            self._created_dirs.add(middle_path)
 
         path: Path = middle_path / str(file_name)  # 拼接文件路径
         if file_suffix is not None:
@@ -94,7 +234,9 @@ class Saver:
         :return: (路径, 是否允许写入) 元组。
         """
         path = self.get_path(file_name, file_suffix)
-        if not self.overwrite and path.exists():
+        if not self.overwrite and (
+            path.exists() or (self._writer is not None and self._writer.is_pending(path))
+        ):
             return path, False
         return path, True
 
@@ -103,6 +245,39 @@ class Saver:
         """获取文件大小（字节）。"""
         return file_path.stat().st_size
 
+    @staticmethod
+    def _encode_text(text: str, encoding: str | None) -> bytes:
+        """按文本模式写文件的规则编码：换行符转换为系统换行符，无法编码的字符被忽略。"""
+        if os.linesep != "\n":
+            text = text.replace("\n", os.linesep)
+        return text.encode(encoding or locale.getpreferredencoding(False), "ignore")
+
+    def _write_bytes(self, path: Path, data: bytes) -> int:
+        """
+        写入字节内容，启用后台写入时交给写线程池后立即返回。
+
+        :param path: 目标路径。
+        :param data: 要写入的内容。
+        :return: 写入的字节数（直接取自数据长度，无需再 stat）。
+        """
+        if self._writer is not None:
+            self._writer.submit(path, data)
+            return len(data)
+        return WriteBehindWriter.write_bytes(path, data)
+
+    def _store_download(self, fetcher: Fetcher, url: str, path: Path) -> int:
+        """
+        通过内容寻址存储下载 URL，并让 path 指向对应的对象。
+
+        :param fetcher: 用于下载的 Fetcher。
+        :param url: 下载的 URL 地址。
+        :param path: 目标路径。
+        :return: 内容大小（字节）。
+        """
+        digest, object_path = self.content_store.fetch(fetcher, url)
+        self.content_store.link(digest, path)
+        return object_path.stat().st_size
+
     # ==== core methods ====
     def _text_core(
         self,
@@ -121,8 +296,7 @@ class Saver:
         :return: (路径, 文件大小) 元组。
         """
         path = self.get_path(file_name, file_suffix)
-        path.write_text(text, encoding=encoding, errors="ignore")
-        return path, self._get_size(path)
+        return path, self._write_bytes(path, self._encode_text(text, encoding))
 
     def _content_core(
         self, content: bytes, file_name: str, file_suffix: str | None = None
@@ -136,8 +310,7 @@ class Saver:
         :return: (路径, 文件大小) 元组。
         """
         path = self.get_path(file_name, file_suffix)
-        path.write_bytes(content)
-        return path, self._get_size(path)
+        return path, self._write_bytes(path, content)
 
     def _image_core(
         self, image: Any, file_name: str, file_suffix: str | None = None
@@ -154,8 +327,12 @@ class Saver:
         save_image = image
         if path.suffix:
             save_image = convert_img_format(image, path.suffix)
-        save_image.save(path)
-        return path, self._get_size(path)
+        buffer = io.BytesIO()
+        save_image.save(
+            buffer,
+            format=save_image.format or IMAGE_SUFFIX_TO_FORMAT.get(path.suffix.lower()),
+        )
+        return path, self._write_bytes(path, buffer.getvalue())
 
     def _dataframe_core(
         self, dataframe: pd.DataFrame, file_name: str, file_suffix: str | None = None
@@ -169,8 +346,8 @@ class Saver:
         :return: (路径, 文件大小) 元组。
         """
         path = self.get_path(file_name, file_suffix)
-        dataframe.to_csv(path, index=False, sep=",", encoding="utf-8-sig")  # type: ignore[reportUnknownMemberType]
-        return path, self._get_size(path)
+        text: str = dataframe.to_csv(index=False, sep=",", lineterminator=os.linesep)  # type: ignore[reportUnknownMemberType]
+        return path, self._write_bytes(path, text.encode("utf-8-sig"))
 
     def _pickle_core(
         self, obj: Any, file_name: str, file_suffix: str | None = None
@@ -184,9 +361,7 @@ class Saver:
         :return: (路径, 文件大小) 元组。
         """
         path = self.get_path(file_name, file_suffix)
-        with open(path, "wb") as f:
-            pickle.dump(obj, f)
-        return path, self._get_size(path)
+        return path, self._write_bytes(path, pickle.dumps(obj))
 
     def _json_core(
         self,
@@ -205,9 +380,8 @@ class Saver:
         :return: (路径, 文件大小) 元组。
         """
         path = self.get_path(file_name, file_suffix)
-        with open(path, "w", encoding=encoding) as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        return path, self._get_size(path)
+        text = json.dumps(data, ensure_ascii=False, indent=4)
+        return path, self._write_bytes(path, self._encode_text(text, encoding))
 
     # ==== save methods ====
     def save_text(
@@ -389,7 +563,11 @@ class Saver:
         return self._text_core(text, file_name, encoding, file_suffix)
 
     def download_content(
-        self, url: str, file_name: str, file_suffix: str | None = None
+        self,
+        url: str,
+        file_name: str,
+        file_suffix: str | None = None,
+        connections: int = 4,
     ) -> tuple[Path, int] | tuple[Path, None]:
         """
         从 URL 下载内容并保存为文件。
@@ -397,15 +575,20 @@ class Saver:
         :param url: 下载的 URL 地址。
         :param file_name: 文件名。
         :param file_suffix: 文件后缀。
+        :param connections: 大文件分块下载的并发连接数，为 1 时始终单连接下载。
         :return: (路径, 文件大小) 元组；不可写入时大小为 None。
         """
         path, can_write = self._get_writable_path(file_name, file_suffix)
         if not can_write:
             return path, None
 
-        fetcher = Fetcher()
-        content: bytes = fetcher.getContent(url)  # type: ignore[reportUnknownMemberType]
-        return self._content_core(content, file_name, file_suffix)
+        # 流式写入临时文件后原子重命名，内存占用与文件大小无关；
+        # 服务器支持 Range 的大文件按字节范围多连接并发下载
+        with Fetcher() as fetcher:
+            if self.content_store is not None:
+                return path, self._store_download(fetcher, url, path)
+            path, size, _digest = fetcher.download_ranged(url, path, connections)
+        return path, size
 
     def download_image(
         self, url: str, file_name: str, file_suffix: str | None = None
@@ -422,6 +605,19 @@ class Saver:
         if not can_write:
             return path, None
 
+        if self.content_store is not None:
+            with Fetcher() as fetcher:
+                digest, object_path = self.content_store.fetch(fetcher, url)
+            content = object_path.read_bytes()
+            image = binary_to_img(content)
+            # 原始内容已是目标格式时直接链接到对象，否则转换格式后单独保存
+            if not path.suffix or image.format == IMAGE_SUFFIX_TO_FORMAT.get(
+                path.suffix.lower()
+            ):
+                self.content_store.link(digest, path)
+                return path, len(content)
+            return self._image_core(image, file_name, file_suffix)
+
         fetcher = Fetcher()
         content: bytes = fetcher.getContent(url)  # type: ignore[reportUnknownMemberType]
         image = binary_to_img(content)
@@ -518,33 +714,64 @@ class Saver:
         :return: 一个字典，包含每个任务的最终结果
         """
         fetcher = Fetcher()  # 创建用于获取 URL 内容的 Fetcher 实例
-        fetch_stage: TaskStage[Any, Any] = TaskStage(  # type: ignore[reportUnknownVariableType]
-            "urlsFetchProcess",
-            meta_get_content(fetcher),
+        # 下载阶段直接把响应流式写入目标文件，不再经由任务链传递整个响应体
+        stream_stage: TaskStage[Any, Any] = TaskStage(  # type: ignore[reportUnknownVariableType]
+            "urlsStreamProcess",
+            meta_stream_content(fetcher, self),
             execution_mode="thread",
         )
-        save_stage: TaskStage[Any, Any] = TaskStage(  # type: ignore[reportUnknownVariableType]
-            "urlsSaveProcess",
-            _save_content_for_task_stage,
-            execution_mode="serial",
-        )
 
-        # 创建 TaskChain 来管理 Fetch 和 Save 两个阶段的任务处理
-        chain = TaskChain(
-            "DownloadUrls", [fetch_stage, save_stage], stage_mode=stage_mode
-        )
-        chain.start_chain({fetch_stage.get_tag(): task_list})  # type: ignore[reportUnknownMemberType]  # 开始任务树
+        chain = TaskChain("DownloadUrls", [stream_stage], stage_mode=stage_mode)
+        with fetcher:
+            chain.start_chain({stream_stage.get_tag(): task_list})  # type: ignore[reportUnknownMemberType]  # 开始任务树
 
-    async def download_urls_async(self, task_list: list[tuple[str, str, str]]):
+    async def download_urls_async(
+        self,
+        task_list: list[tuple[str, str, str]],
+        max_concurrency: int = 100,
+        per_host_concurrency: int = 8,
+        fetcher: AsyncFetcher | None = None,
+    ) -> dict[tuple[str, str, str], tuple[Path, int] | tuple[Path, None] | Exception]:
         """
-        异步批量下载 URL 列表（尚未实现）。
+        基于 AsyncFetcher 异步批量下载 URL 列表。所有请求共享一个 httpx.AsyncClient，
+        并发由全局与按主机的信号量限制；响应流式写入目标文件（启用内容寻址存储时写入存储），
+        写文件在线程中进行，不阻塞事件循环。
 
         :param task_list: 任务列表，每个元组包含 (URL, 文件名, 文件后缀)。
-        """
-        # await self.fetcher.start_session()
-        # await self.fetch_threader.start_async(task_list)
-        # await self.fetcher.close_session()
-        pass
+        :param max_concurrency: 全局最大并发请求数。
+        :param per_host_concurrency: 单个主机的最大并发请求数。
+        :param fetcher: 自定义的 AsyncFetcher，为 None 时自动创建并在结束时关闭。
+        :return: 以任务为键的字典，值为 (路径, 文件大小) 元组，失败时为异常对象。
+        """
+        own_fetcher = fetcher is None
+        fetcher = fetcher or AsyncFetcher(
+            max_concurrency=max_concurrency,
+            per_host_concurrency=per_host_concurrency,
+        )
+
+        async def download_one(
+            task: tuple[str, str, str],
+        ) -> tuple[Path, int] | tuple[Path, None]:
+            url, file_name, file_suffix = task
+            path, can_write = self._get_writable_path(file_name, file_suffix)
+            if not can_write:
+                return path, None
+            if self.content_store is not None:
+                digest, object_path = await self.content_store.fetch_async(fetcher, url)
+                await asyncio.to_thread(self.content_store.link, digest, path)
+                return path, object_path.stat().st_size
+            path, size, _digest = await fetcher.stream_to_file(url, path)
+            return path, size
+
+        try:
+            results = await asyncio.gather(
+                *(download_one(task) for task in task_list), return_exceptions=True
+            )
+        finally:
+            if own_fetcher:
+                await fetcher.aclose()
+
+        return dict(zip(map(tuple, task_list), results))  # type: ignore[arg-type]
 
     def download_m3u8(
         self,
@@ -552,49 +779,25 @@ class Saver:
         file_name: str,
         file_suffix: str | None = None,
         timeout: int = 3600,
+        max_workers: int = 8,
     ) -> tuple[Path, int] | tuple[Path, None]:
         """
-        使用 ffmpeg 下载 m3u8 流媒体并保存为文件。
+        下载 m3u8 流媒体并保存为文件。分段由 HLSDownloader 并发下载（支持 AES-128 与断点续传），
+        全部完成后拼接一次；目标后缀不是 .ts 时再用 ffmpeg 无损转封装。
 
         :param m3u8_url: m3u8 流媒体的 URL 地址。
         :param file_name: 保存的文件名。
         :param file_suffix: 文件后缀。
-        :param timeout: 下载超时时间（秒），默认 3600。
+        :param timeout: ffmpeg 转封装的超时时间（秒），默认 3600。
+        :param max_workers: 同时下载的分段数。
         :return: (路径, 文件大小) 元组；不可写入时大小为 None。
-        :raises TimeoutError: 下载超时时抛出。
+        :raises DownloadError: 播放列表或分段下载失败时抛出。
+        :raises TimeoutError: 转封装超时时抛出。
         :raises FFmpegError: ffmpeg 执行失败时抛出。
         """
         m3u8_path, can_overwrite = self._get_writable_path(file_name, file_suffix)
         if not can_overwrite:
             return m3u8_path, None
 
-        command: list[str | Path] = [
-            "ffmpeg",
-            "-protocol_whitelist",
-            "file,http,https,tcp,tls,crypto",
-            "-i",
-            str(m3u8_url),
-            "-c",
-            "copy",
-            m3u8_path,
-        ]
-        # 运行命令并捕获错误
-        try:
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-                timeout=timeout,
-            )
-        except subprocess.TimeoutExpired as e:
-            raise TimeoutError(f"Download process timed out for {m3u8_url}.") from e
-        except Exception as e:
-            raise FFmpegError(f"Failed to download {m3u8_url}.", stderr=str(e)) from e
-
-        # 检查 FFmpeg 是否返回了错误
-        if result.returncode != 0:
-            error_msg = result.stderr.strip()
-            raise FFmpegError(f"Failed to download {m3u8_url}.", stderr=error_msg)
-
-        return m3u8_path, self._get_size(m3u8_path)
+        downloader = HLSDownloader(max_workers=max_workers)
+        return downloader.download(m3u8_url, m3u8_path, timeout=timeout)
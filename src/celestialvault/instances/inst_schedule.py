@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+EXECUTION_MODES = ("serial", "thread", "process")
+RESOURCES = ("cpu", "io")
+
+
+@dataclass(frozen=True)
+class RulePolicy:
+    """
+    单条处理规则的调度策略。
+
+    :param execution_mode: 执行模式，'serial'、'thread' 或 'process'。
+    :param max_workers: 该规则的并发上限，serial 模式固定为 1；None 表示只受全局预算限制。
+    :param priority: 优先级，数值越大越优先获得全局预算。
+    :param resource: 规则消耗的资源类型，'cpu' 或 'io'。
+    """
+
+    execution_mode: str = "thread"
+    max_workers: int | None = None
+    priority: int = 0
+    resource: str = "io"
+
+    def __post_init__(self):
+        if self.execution_mode not in EXECUTION_MODES:
+            raise ValueError(
+                f"未知的执行模式: {self.execution_mode}，可选 {EXECUTION_MODES}"
+            )
+        if self.resource not in RESOURCES:
+            raise ValueError(f"未知的资源类型: {self.resource}，可选 {RESOURCES}")
+        if self.max_workers is not None and self.max_workers < 1:
+            raise ValueError(f"max_workers 必须大于 0: {self.max_workers}")
+
+    @classmethod
+    def from_options(
+        cls, options: dict[str, Any] | None, default: RulePolicy | None = None
+    ) -> RulePolicy:
+        """
+        由规则中的选项字典构建策略，未给出的字段沿用 default。
+
+        :param options: 选项字典，键为 RulePolicy 的字段名。
+        :param default: 默认策略。
+        :return: 构建好的策略。
+        :raises ValueError: 选项中包含未知字段时抛出。
+        """
+        default = default or cls()
+        options = options or {}
+        unknown = set(options) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"未知的规则选项: {sorted(unknown)}")
+        fields = {name: getattr(default, name) for name in cls.__dataclass_fields__}
+        fields.update(options)
+        return cls(**fields)
+
+    def get_concurrency(self) -> int | None:
+        """
+        该规则允许的最大并发数。
+
+        :return: 并发上限，None 表示不额外限制。
+        """
+        if self.execution_mode == "serial":
+            return 1
+        return self.max_workers
+
+
+class PriorityGate:
+    """按优先级放行的计数信号量：名额不足时，优先级高的等待者先获得名额，同优先级先到先得。"""
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError(f"capacity 必须大于 0: {capacity}")
+        self.capacity = capacity
+        self._in_use = 0
+        self._waiters: list[tuple[int, int]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, priority: int = 0) -> None:
+        """
+        获取一个名额，必要时阻塞等待。
+
+        :param priority: 优先级，数值越大越优先。
+        """
+        with self._cond:
+            ticket = (-priority, next(self._counter))
+            heapq.heappush(self._waiters, ticket)
+            while self._in_use >= self.capacity or self._waiters[0] != ticket:
+                self._cond.wait()
+            heapq.heappop(self._waiters)
+            self._in_use += 1
+            # 还有空余名额时唤醒下一位等待者
+            self._cond.notify_all()
+
+    def release(self) -> None:
+        """归还一个名额。"""
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: int = 0) -> Iterator[None]:
+        """
+        以上下文管理器的方式占用一个名额。
+
+        :param priority: 优先级，数值越大越优先。
+        """
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+
+class RuleScheduler:
+    """
+    多规则调度器：每条规则拥有独立的任务队列与并发上限，
+    所有规则共享全局的 CPU 与 I/O 预算，预算紧张时按规则优先级放行。
+    process 模式的规则通过 offload 将耗 CPU 的操作交给共享的进程池执行。
+    """
+
+    def __init__(self, cpu_budget: int | None = None, io_budget: int | None = None):
+        """
+        :param cpu_budget: 同时运行的 CPU 密集任务数，默认为 CPU 核心数。
+        :param io_budget: 同时运行的 I/O 密集任务数，默认为 CPU 核心数的两倍（至少 8）。
+        """
+        cpu_count = os.cpu_count() or 1
+        self.cpu_budget = cpu_budget or cpu_count
+        self.io_budget = io_budget or max(cpu_count * 2, 8)
+
+        self._gates = {
+            "cpu": PriorityGate(self.cpu_budget),
+            "io": PriorityGate(self.io_budget),
+        }
+        self._executors: dict[RulePolicy, ThreadPoolExecutor] = {}
+        self._process_pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self, policy: RulePolicy) -> ThreadPoolExecutor:
+        """获取（或创建）规则对应的任务队列。"""
+        with self._lock:
+            if policy not in self._executors:
+                budget = self._gates[policy.resource].capacity
+                concurrency = policy.get_concurrency() or budget
+                self._executors[policy] = ThreadPoolExecutor(
+                    max_workers=min(concurrency, budget),
+                    thread_name_prefix=f"rule-{policy.resource}-{len(self._executors)}",
+                )
+            return self._executors[policy]
+
+    def _run(
+        self,
+        policy: RulePolicy,
+        func: Callable[..., Any],
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> Any:
+        with self._gates[policy.resource].slot(policy.priority):
+            return func(*args, **kwargs)
+
+    def submit(
+        self, policy: RulePolicy, func: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> Future[Any]:
+        """
+        按规则策略提交任务。使用相同策略的任务共享同一个队列与并发上限。
+
+        :param policy: 规则策略。
+        :param func: 要执行的函数。
+        :return: 任务的 Future。
+        """
+        return self._get_executor(policy).submit(self._run, policy, func, args, kwargs)
+
+    def offload(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        在共享进程池中执行函数并等待结果，func 与参数必须可被 pickle。
+
+        :param func: 要执行的函数。
+        :return: 函数的返回值。
+        """
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self.cpu_budget)
+            process_pool = self._process_pool
+        return process_pool.submit(func, *args, **kwargs).result()
+
+    @property
+    def total_budget(self) -> int:
+        return self.cpu_budget + self.io_budget
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        关闭所有规则队列与进程池。
+
+        :param wait: 是否等待已提交的任务完成。
+        """
+        with self._lock:
+            executors = list(self._executors.values())
+            process_pool, self._process_pool = self._process_pool, None
+            self._executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=wait)
+        if process_pool is not None:
+            process_pool.shutdown(wait=wait)
+
+    def __enter__(self) -> RuleScheduler:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
@@ -1,3 +1,8 @@
+import os
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
 from html import unescape
 from pathlib import Path
 from urllib.parse import unquote
@@ -5,12 +10,26 @@ from urllib.parse import unquote
 import regex as re
 
 from ..tools.FileOperations import handle_dir_files
-from ..tools.TextTools import pro_slash, safe_open_txt
+from ..tools.TextTools import iter_text_chunks, pro_slash, write_text_chunks
+
+# 形如 '(a|b|c)+' 且各分支都是普通字符的删除规则，可以改写为逐个 str.replace
+_LITERAL_REMOVAL = re.compile(r"\(([^\\.^$*+?{}\[\]()]+)\)\+")
+
+# 形如 '(?<!X)(\n+)...' 或 '(?<!X)\n...' 的换行规则，可以把后顾移到第一个换行符之后
+_NEWLINE_LOOKBEHIND = re.compile(r"\(\?<!(.+)\)(\(\n\+\)|\n)(.*)", re.S)
 
 
 class Suber:
-    def __init__(self):
-        """初始化文本清理器，设置各类正则替换规则。"""
+    def __init__(self, chunk_size: int = 1 << 16, parallel_chunk_size: int = 1 << 20):
+        """
+        初始化文本清理器，设置各类正则替换规则并编译。
+
+        :param chunk_size: clear_text 按段落分块处理时每块的大致字符数。
+        :param parallel_chunk_size: clear_text 使用执行器时，长于此的文本按此大小分块并行清理。
+        """
+        self.chunk_size = chunk_size
+        self.parallel_chunk_size = parallel_chunk_size
+
         # Characters that need both lookbehind and lookahead checks
         self.both_check_chars = r"#|◆|\*|＊|=|＝|…|_|～|—|－"
 
@@ -20,12 +39,16 @@ class Suber:
         # Characters that need only lookbehind checks
         self.lookbehind_only_chars = r"章节|作者|字数|20|第|（|\(|\{|「|\[|【|<"
 
+        # 单字符的分支合并为字符类，前后顾只判断是否匹配，合并后结果不变
+        lookbehind = _merge_char_branches(
+            f"{self.both_check_chars}|{self.lookahead_only_chars}"
+        )
+        lookahead = _merge_char_branches(
+            f"{self.both_check_chars}|{self.lookbehind_only_chars}"
+        )
         self.regex_remove_unwanted_newlines = [
             # 移除不在某些标点符号后的换行符
-            (
-                f"(?<!{self.both_check_chars}|{self.lookahead_only_chars})(\n+)(?!{self.both_check_chars}|{self.lookbehind_only_chars})",
-                "",
-            ),
+            (f"(?<!{lookbehind})(\n+)(?!{lookahead})", ""),
         ]
 
         self.special_character_removal = [
@@ -80,50 +103,338 @@ class Suber:
             ("\n", ""),
         ]
 
-    def clear_book_dir(self, dir_path: Path | str, execution_mode: str = "thread"):
+        self.compile_rules()
+
+    @staticmethod
+    def _compile_steps(rules: list[tuple[str, str]], flags: int = 0) -> list[Callable]:
+        """
+        把 (模式, 替换) 规则编译为替换步骤，每个步骤是接受并返回文本的函数。
+
+        只删除普通字符的规则（如 '(\\t|\\r|　)+'）改写为逐个 str.replace，
+        相邻的这类规则合并为同一步；以换行符开头的规则把后顾移到第一个换行符之后，
+        正则引擎只需在换行符处尝试匹配；其余规则原样编译。
+        """
+        steps: list[Callable] = []
+        merged: list[str] = []
+        for pattern, repl in rules:
+            match = _LITERAL_REMOVAL.fullmatch(pattern)
+            if repl or match is None:
+                compiled = re.compile(Suber._anchor_newline(pattern, repl), flags)
+                steps.append(partial(compiled.sub, repl))
+                merged = []
+                continue
+
+            # 多字符分支先整体删除，再删除单个字符，结果与逐个匹配分支相同
+            branches = match.group(1).split("|")
+            longer = [branch for branch in branches if len(branch) > 1]
+            if longer:
+                merged = []
+            if merged:
+                steps.pop()
+            chars = [branch for branch in branches if len(branch) == 1]
+            merged = list(dict.fromkeys(longer + merged + chars))
+            steps.append(partial(_remove_literals, literals=tuple(merged)))
+        return steps
+
+    @staticmethod
+    def _anchor_newline(pattern: str, repl: str) -> str:
+        """
+        把 '(?<!X)(\\n+)Y' 改写为等价的 '\\n(?<!(?:X)\\n)\\n*Y'（'(?<!X)\\nY' 同理），
+        匹配必须从换行符开始，正则引擎可以直接跳到换行符处，而不是在每个位置先执行后顾。
+        替换内容引用分组、或后顾的边界不唯一时不改写。
+        """
+        match = _NEWLINE_LOOKBEHIND.fullmatch(pattern)
+        splits = pattern.count(")\n") + pattern.count(")(\n+)")
+        if match is None or splits != 1 or "\\" in repl:
+            return pattern
+        lookbehind, newline, rest = match.groups()
+        tail = "\n*" if newline != "\n" else ""
+        return f"\n(?<!(?:{lookbehind})\n){tail}{rest}"
+
+    @staticmethod
+    def _run_steps(text: str, steps: list[Callable]) -> str:
+        for step in steps:
+            text = step(text)
+        return text
+
+    def compile_rules(self):
+        """
+        编译 sub_text_list 与 sub_name_list。初始化时自动调用，修改规则列表后需要重新调用。
+
+        sub_text_list 中第一条涉及换行符的规则之前的规则在整段文本上执行，
+        之后的换行规则按段落分块执行（见 split_chunks）。
+        """
+        split_index = next(
+            (
+                index
+                for index, (pattern, _) in enumerate(self.sub_text_list)
+                if "\n" in pattern
+            ),
+            len(self.sub_text_list),
+        )
+        self._local_steps = self._compile_steps(
+            self.sub_text_list[:split_index], re.S
+        )
+        self._newline_steps = self._compile_steps(
+            self.sub_text_list[split_index:], re.S
+        )
+        self._name_steps = self._compile_steps(
+            self.sub_name_list + self.special_character_removal
+        )
+
+    def get_config(self) -> tuple:
+        """
+        获取可在进程间传递的规则配置，工作进程据此构建（并缓存）同样的 Suber。
+
+        :return: (chunk_size, sub_text_list, sub_name_list) 元组。
+        """
+        return (
+            self.chunk_size,
+            tuple(map(tuple, self.sub_text_list)),
+            tuple(map(tuple, self.sub_name_list)),
+        )
+
+    def clear_book_dir(
+        self,
+        dir_path: Path | str,
+        execution_mode: str = "thread",
+        max_workers: int | None = None,
+    ):
         """
         批量清理文件夹中所有 txt 文件的文本内容。
 
         :param dir_path: 目标文件夹路径。
-        :param execution_mode: 执行模式，如 'thread' 或 'serial'。
+        :param execution_mode: 执行模式，如 'thread'、'serial' 或 'process'。
+            'process' 时各书在线程中读写，清理交给进程池：整本书发送到预先构建好 Suber 的工作进程，
+            超过 parallel_chunk_size 的大书切块后由多个进程并行清理。
+        :param max_workers: 'process' 模式的进程数，默认为 CPU 核心数。
         :return: 批量处理的结果。
         """
-        rules = {".txt": (self.clear_book, lambda a: a, {})}
+        if execution_mode != "process":
+            rules = {".txt": (self.clear_book, lambda a: a, {})}
+            return handle_dir_files(
+                dir_path, rules, execution_mode, name="Clearing book dir"
+            )
 
-        return handle_dir_files(
-            dir_path, rules, execution_mode, name="Clearing book dir"
-        )
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            rules = {".txt": (self.clear_book, lambda a: a, {"executor": executor})}
+            return handle_dir_files(
+                dir_path, rules, "thread", name="Clearing book dir"
+            )
 
-    def clear_book(self, book_path: Path, new_path: Path):
+    def clear_book(
+        self, book_path: Path, new_path: Path, executor: Executor | None = None
+    ):
         """
-        读取并清理单个 txt 文件的文本内容，保存到新路径。
+        流式读取并清理单个 txt 文件的文本内容，边清理边写入新路径。
 
         :param book_path: 原始文件路径。
         :param new_path: 清理后保存的目标路径。
+        :param executor: 用于清理的执行器，见 iter_clear_text。
         """
-        book_text = safe_open_txt(book_path)
-
-        if book_text is None:
-            raise ValueError("无法使用检测到的编码解码文件")
+        pieces = iter_text_chunks(book_path)
+        write_text_chunks(self.iter_clear_text(pieces, executor), new_path)
 
-        # 清理文本并写入新文件
-        book_text = self.clear_text(book_text)
-        new_path.write_text(book_text, encoding="utf-8")
-
-    def clear_text(self, text):
+    def clear_text(self, text, executor: Executor | None = None):
         """
         对文本执行所有预定义的替换规则，返回清理后的文本。
 
         :param text: 待清理的原始文本。
+        :param executor: 进程池等执行器。给出时在其中清理：不超过 parallel_chunk_size 的文本整段提交，
+            更长的文本在换行处切块后并行清理再拼接，结果与不使用执行器时相同。
         :return: 清理后的文本字符串。
         """
+        if executor is None:
+            text = self.prepare_text(text)
+            chunks, boundaries = self.split_chunks(text)
+            return self.join_chunks(
+                [self.clear_chunk(chunk) for chunk in chunks],
+                [self.clear_boundary(boundary) for boundary in boundaries],
+            )
+
+        config = self.get_config()
+        if len(text) <= self.parallel_chunk_size:
+            return executor.submit(_clear_text_task, config, text).result()
+
+        text = executor.submit(_prepare_text_task, config, text).result()
+        chunks, boundaries = self.split_chunks(text, self.parallel_chunk_size)
+        cleared = executor.map(_clear_chunk_task, [config] * len(chunks), chunks)
+        return self.join_chunks(
+            list(cleared), [self.clear_boundary(boundary) for boundary in boundaries]
+        )
+
+    def prepare_text(self, text: str) -> str:
+        """
+        清理的第一阶段：斜杠处理、HTML/URL 解码，以及不涉及换行符的替换规则，在整段文本上执行。
+
+        :param text: 待清理的原始文本。
+        :return: 处理后的文本。
+        """
         text = pro_slash(text)
         text = unquote(unescape(text))
+        return self._run_steps(text, self._local_steps)
+
+    def iter_clear_text(
+        self,
+        pieces: Iterable[str],
+        executor: Executor | None = None,
+        max_pending: int | None = None,
+    ) -> Iterator[str]:
+        """
+        流式清理：输入任意切分的文本块，逐块产出清理后的文本，拼接后与 clear_text 的结果相同。
+
+        输入先在换行符后切开再执行 prepare_text，然后按 split_chunks 的规则切块，
+        切分点之后须已读入足够的上下文才会切分，因此内存占用只与块大小有关。
 
-        for sub in self.sub_text_list:
-            text = re.sub(sub[0], sub[1], text, flags=re.S)
+        :param pieces: 原始文本块的可迭代对象，如 iter_text_chunks 的结果。
+        :param executor: 进程池等执行器。给出时 prepare_text 与各块的清理提交到其中，
+            块大小为 parallel_chunk_size，按顺序产出结果。
+        :param max_pending: 使用执行器时每个阶段最多同时提交的任务数，默认为 CPU 核心数的两倍。
+        :return: 清理后文本块的生成器。
+        """
+        lines = _iter_line_pieces(pieces)
+        if executor is None:
+            prepared = map(self.prepare_text, lines)
+            parts = (
+                self._clear_part(chunk, boundary)
+                for chunk, boundary in self._iter_split_chunks(prepared, self.chunk_size)
+            )
+        else:
+            config = self.get_config()
+            max_pending = max_pending or 2 * (os.cpu_count() or 1)
+            prepared = _ordered_map(
+                executor,
+                _prepare_text_task,
+                ((config, line) for line in lines),
+                max_pending,
+            )
+            parts = _ordered_map(
+                executor,
+                _clear_part_task,
+                (
+                    (config, chunk, boundary)
+                    for chunk, boundary in self._iter_split_chunks(
+                        prepared, self.parallel_chunk_size
+                    )
+                ),
+                max_pending,
+            )
+        return _iter_stripped(parts)
+
+    @staticmethod
+    def _find_split(
+        text: str, start: int, chunk_size: int, final: bool = True
+    ) -> tuple[int, int] | None:
+        """
+        在 text[start + chunk_size:] 中找一处可以切分的连续换行，返回其 (起点, 终点)。
+
+        final 为 False 表示 text 之后还有内容：此时连续换行之后必须已有两个字符（或遇到换行），
+        否则无法确定切分点的上下文，返回 None 等待更多输入。
+        """
+        run_start = text.find("\n", start + chunk_size)
+        if run_start == -1:
+            return None
+        while run_start > start and text[run_start - 1] == "\n":
+            run_start -= 1
+        run_end = run_start + 1
+        while run_end < len(text) and text[run_end] == "\n":
+            run_end += 1
+        if run_end == len(text):
+            return None
+        if not final and run_end + 2 > len(text) and "\n" not in text[run_end:]:
+            return None
+        return run_start, run_end
+
+    @staticmethod
+    def _get_boundary(text: str, run_start: int, run_end: int) -> tuple[str, str, str]:
+        line_start = text.rfind("\n", 0, run_start) + 1
+        after = text[run_end : run_end + 2].split("\n", 1)[0]
+        return text[line_start:run_start], text[run_start:run_end], after
+
+    def split_chunks(
+        self, text: str, chunk_size: int | None = None
+    ) -> tuple[list[str], list[tuple[str, str, str]]]:
+        """
+        在换行符处把 prepare_text 的结果切分为若干块。
+
+        换行规则只取决于换行符所在的连续换行前的那一行与其后的两个字符，
+        因此每处切分点只需保留 (前一行, 换行符, 其后至多两个非换行字符) 作为上下文，
+        各块与各切分点可以分别处理，再由 join_chunks 拼接，结果与整段处理相同。
+
+        :param text: prepare_text 处理后的文本。
+        :param chunk_size: 每块的大致字符数，默认为 self.chunk_size。
+        :return: (块列表, 切分点上下文列表)，块比切分点多一个。
+        """
+        chunk_size = chunk_size or self.chunk_size
+        chunks, boundaries = [], []
+        start = 0
+        while split := self._find_split(text, start, chunk_size):
+            run_start, run_end = split
+            chunks.append(text[start:run_start])
+            boundaries.append(self._get_boundary(text, run_start, run_end))
+            start = run_end
+        chunks.append(text[start:])
+        return chunks, boundaries
+
+    def _iter_split_chunks(
+        self, pieces: Iterable[str], chunk_size: int
+    ) -> Iterator[tuple[str, tuple[str, str, str] | None]]:
+        """
+        split_chunks 的流式版本：输入 prepare_text 处理后的文本块，
+        产出 (块, 其后切分点的上下文)，最后一块的上下文为 None。
+        """
+        buffer = ""
+        for piece in pieces:
+            buffer += piece
+            start = 0
+            while split := self._find_split(buffer, start, chunk_size, final=False):
+                run_start, run_end = split
+                yield buffer[start:run_start], self._get_boundary(
+                    buffer, run_start, run_end
+                )
+                start = run_end
+            buffer = buffer[start:]
+
+        chunks, boundaries = self.split_chunks(buffer, chunk_size)
+        yield from zip(chunks, boundaries + [None])
+
+    def _clear_part(self, chunk: str, boundary: tuple[str, str, str] | None) -> str:
+        cleared = self.clear_chunk(chunk)
+        return cleared + self.clear_boundary(boundary) if boundary else cleared
+
+    def clear_chunk(self, chunk: str) -> str:
+        """
+        对 split_chunks 切出的一块执行换行规则。
+
+        :param chunk: 文本块。
+        :return: 处理后的文本块。
+        """
+        return self._run_steps(chunk, self._newline_steps)
+
+    def clear_boundary(self, boundary: tuple[str, str, str]) -> str:
+        """
+        结合上下文对切分点处的连续换行执行换行规则。
+
+        :param boundary: split_chunks 返回的 (前一行, 换行符, 其后字符)。
+        :return: 切分点处的换行符被替换成的内容。
+        """
+        before, newlines, after = boundary
+        cleared = self._run_steps(before + newlines + after, self._newline_steps)
+        return cleared[len(before) : len(cleared) - len(after)]
+
+    @staticmethod
+    def join_chunks(chunks: list[str], separators: list[str]) -> str:
+        """
+        拼接处理后的块与切分点，得到最终文本。
 
-        return text.strip()
+        :param chunks: clear_chunk 处理后的块。
+        :param separators: clear_boundary 处理后的切分点。
+        :return: 清理后的文本。
+        """
+        parts = [chunks[0]]
+        for separator, chunk in zip(separators, chunks[1:]):
+            parts += [separator, chunk]
+        return "".join(parts).strip()
 
     def sub_name(self, name: str, max_len: int = 100) -> str:
         """
@@ -136,8 +447,7 @@ class Suber:
         name = name.strip()
 
         # 替换非法字符
-        for sub in self.sub_name_list + self.special_character_removal:
-            name = re.sub(sub[0], sub[1], name)
+        name = self._run_steps(name, self._name_steps)
 
         # 平台文件名最大长度限制
         # 通常 Windows 为 255，Linux/Mac 也类似
@@ -148,3 +458,119 @@ class Suber:
             name = f"{name[:front_len]}(省略){name[-back_len:]}"
 
         return name
+
+
+# 工作进程中按规则配置缓存的 Suber，避免每个任务都重新编译规则
+_worker_subers: dict[tuple, Suber] = {}
+
+
+def _get_worker_suber(config: tuple) -> Suber:
+    suber = _worker_subers.get(config)
+    if suber is None:
+        chunk_size, sub_text_list, sub_name_list = config
+        suber = Suber(chunk_size)
+        suber.sub_text_list = [tuple(rule) for rule in sub_text_list]
+        suber.sub_name_list = [tuple(rule) for rule in sub_name_list]
+        suber.compile_rules()
+        _worker_subers[config] = suber
+    return suber
+
+
+def _clear_text_task(config: tuple, text: str) -> str:
+    return _get_worker_suber(config).clear_text(text)
+
+
+def _prepare_text_task(config: tuple, text: str) -> str:
+    return _get_worker_suber(config).prepare_text(text)
+
+
+def _clear_chunk_task(config: tuple, chunk: str) -> str:
+    return _get_worker_suber(config).clear_chunk(chunk)
+
+
+def _clear_part_task(
+    config: tuple, chunk: str, boundary: tuple[str, str, str] | None
+) -> str:
+    return _get_worker_suber(config)._clear_part(chunk, boundary)
+
+
+def _merge_char_branches(pattern: str) -> str:
+    """
+    把 'a|\\*|章节|b' 这样的分支中的单字符分支合并为一个字符类，得到 '[a\\*b]|章节'。
+    只按顶层的 '|' 切分，方括号与圆括号内的 '|' 不受影响。
+    """
+    branches, depth, start, escaped = [], 0, 0, False
+    for index, char in enumerate(pattern):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            branches.append(pattern[start:index])
+            start = index + 1
+    branches.append(pattern[start:])
+
+    chars, others = [], []
+    for branch in branches:
+        if len(branch) == 1 and branch not in ".^$":
+            chars.append(re.escape(branch))
+        elif len(branch) == 2 and branch[0] == "\\" and not branch[1].isalnum():
+            chars.append(branch)
+        else:
+            others.append(branch)
+    if len(chars) < 2:
+        return pattern
+    return "|".join([f"[{''.join(chars)}]", *others])
+
+
+def _remove_literals(text: str, literals: tuple[str, ...]) -> str:
+    for literal in literals:
+        text = text.replace(literal, "")
+    return text
+
+
+def _iter_line_pieces(pieces: Iterable[str]) -> Iterator[str]:
+    """把任意切分的文本块重新切在换行符之后，prepare_text 的各规则都不跨越换行符。"""
+    rest = ""
+    for piece in pieces:
+        cut = piece.rfind("\n") + 1
+        if not cut:
+            rest += piece
+            continue
+        yield rest + piece[:cut]
+        rest = piece[cut:]
+    if rest:
+        yield rest
+
+
+def _iter_stripped(parts: Iterable[str]) -> Iterator[str]:
+    """流式地去掉整段文本首尾的空白：开头的空白直接丢弃，末尾的空白等到后面出现内容时才产出。"""
+    pending = None  # None 表示还没有遇到非空白内容
+    for part in parts:
+        stripped = part.rstrip()
+        if not stripped:
+            if pending is not None:
+                pending += part
+            continue
+        if pending is None:
+            yield stripped.lstrip()
+        else:
+            yield pending + stripped
+        pending = part[len(stripped) :]
+
+
+def _ordered_map(
+    executor: Executor, func: Callable, args_iter: Iterable[tuple], max_pending: int
+) -> Iterator:
+    """按顺序产出 func(*args) 的结果，最多同时提交 max_pending 个任务，不会一次消费整个输入。"""
+    futures = deque()
+    for args in args_iter:
+        futures.append(executor.submit(func, *args))
+        if len(futures) >= max_pending:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
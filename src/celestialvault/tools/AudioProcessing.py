@@ -21,11 +21,14 @@ def convert_mp3_to_wav(mp3_path: Path, wav_path: Path):
     )
 
 
-def convert_mp3_dir(dir_path: Path) -> dict[tuple[str, str], list[Path]]:
+def convert_mp3_dir(
+    dir_path: Path, journal_path: str | Path | None = None
+) -> dict[tuple[str, str], list[Path]]:
     """
     将指定目录下的所有 mp3 文件转换为 wav 文件
 
     :param dir_path: mp3 文件所在的目录
+    :param journal_path: 进度日志路径，默认放在输出目录旁边，中断后重新运行会从日志处继续。
     :return: 处理结果，包含成功和失败的文件路径信息。
     """
 
@@ -49,4 +52,5 @@ def convert_mp3_dir(dir_path: Path) -> dict[tuple[str, str], list[Path]]:
         execution_mode="serial",
         name="Convert Audio Folders",
         dir_name_suffix="_mp3towav",
+        journal_path=journal_path,
     )
@@ -1,23 +1,40 @@
 import hashlib
+import heapq
+import os
 import re
 import shutil
+import struct
 import tarfile
+import tempfile
+import threading
+import time
 import zipfile
+import zlib
 from collections import Counter, defaultdict
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
 from typing import Any
 
 import py7zr
 import rarfile
-from celestialflow import TaskExecutor, TaskProgress
+from celestialflow import TaskChain, TaskExecutor, TaskProgress, TaskSplitter, TaskStage
 from tqdm import tqdm
 from wcwidth import wcswidth
 
-from ..constants import IMG_SUFFIXES, VIDEO_SUFFIXES
+from ..constants import IMG_SUFFIXES, VIDEO_SUFFIXES, ZIP_SUFFIXES
+from ..instances.inst_journal import JobJournal
+from ..instances.inst_schedule import RulePolicy, RuleScheduler
 from ..instances.inst_units import HumanBytes, HumanTimestamp
 from .TextTools import format_table  # type: ignore[reportUnknownVariableType]
 
+# (处理函数, 重命名函数, 额外参数) 或 (处理函数, 重命名函数, 额外参数, 选项)
+FileRule = (
+    tuple[Callable[..., Any], Callable[[Path], Path], dict[str, Any]]
+    | tuple[Callable[..., Any], Callable[[Path], Path], dict[str, Any], dict[str, Any]]
+)
+
 
 def create_dir(path: str | Path) -> Path:
     """
@@ -42,167 +59,397 @@ def create_dir(path: str | Path) -> Path:
     return path
 
 
+@lru_cache(maxsize=65536)
+def _ensure_dir(path: Path) -> Path:
+    """
+    创建文件夹（带缓存），同一目录在一次运行中只会调用一次 mkdir。
+
+    :param path: 要创建的文件夹路径。
+    :return: 文件夹路径。
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _iter_dir_files(dir_path: Path, recursive: bool = True) -> Iterator[Path]:
+    """
+    使用 os.scandir 遍历文件夹中的文件，目录项自带类型信息，无需逐个 stat。
+    不跟随指向目录的符号链接，与 glob("**/*") 的行为一致。
+
+    :param dir_path: 要遍历的文件夹路径。
+    :param recursive: 是否递归遍历子文件夹。
+    :return: 文件路径的迭代器。
+    """
+    stack = [dir_path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(Path(entry.path))
+                    elif entry.is_file():
+                        yield Path(entry.path)
+        except (PermissionError, FileNotFoundError) as e:
+            print(e, current)
+
+
 def handle_item(
     source: Path,
     destination: Path,
     action: Callable[..., Any],
     extra: dict[str, Any],
+    journal: JobJournal | None = None,
 ) -> Any:
     """
     处理文件，如果目标文件不存在则执行指定的操作。
+    传入 journal 时改为依据进度日志判断是否已完成：处理函数写入临时路径，完成后原子重命名并记录到日志。
+    源文件在日志中没有记录而输出已存在时（如启用日志之前生成的输出），只有日志开启了 adopt_existing
+    且输出看起来完整才视为已完成并补写记录，否则重新生成。
 
     :param source: 源文件路径。
     :param destination: 目标文件路径。
     :param action: 处理文件的函数或方法。
-    :return: 如果目标文件已存在，则返回 None；否则返回 action 的结果。
-    """
-    if destination.exists():
-        return f"{destination} already exists."
+    :param extra: 传给 action 的额外参数。
+    :param journal: 进度日志，为 None 时以目标文件是否存在来判断。
+    :return: 如果目标文件已存在（或已完成），则返回提示字符串；否则返回 action 的结果。
+    """
+    if journal is None:
+        if destination.exists():
+            return f"{destination} already exists."
+        output_path = destination
+    else:
+        if journal.is_done(source, destination) or journal.seed(source, destination):
+            return f"{destination} already done."
+        output_path = journal.temp_path(destination)
+        # 清理上次中断留下的临时输出
+        if output_path.is_dir():
+            shutil.rmtree(output_path)
+        elif output_path.exists():
+            output_path.unlink()
 
     # 判断 destination 是文件还是文件夹
-    if destination.suffix:
-        destination.parent.mkdir(parents=True, exist_ok=True)
-    else:
-        destination.mkdir(parents=True, exist_ok=True)
-    action_result = action(source, destination, **extra)  # type: ignore
+    _ensure_dir(destination.parent)
+    if not destination.suffix:
+        output_path.mkdir(exist_ok=True)
+    action_result = action(source, output_path, **extra)  # type: ignore
+
+    if journal is not None:
+        journal.commit(source, output_path, destination)
     return action_result
 
 
+def _default_journal_path(new_dir_path: Path) -> Path:
+    """
+    默认的进度日志路径：放在输出目录旁边，与输出目录同名。
+
+    :param new_dir_path: 输出目录路径。
+    :return: 日志文件路径。
+    """
+    return new_dir_path.with_name(f"{new_dir_path.name}.journal.jsonl")
+
+
+def _copy_error_files(
+    error_pairs: list[tuple[Path, Any]],
+    dir_path: Path,
+    new_dir_path: Path,
+    copy_failed: bool,
+    name: str,
+) -> dict[tuple[str, str], list[Path]]:
+    """
+    汇总处理失败的文件，并（可选地）将其原样批量复制到新目录中。
+
+    :param error_pairs: (源路径, 错误) 列表。
+    :param dir_path: 源文件夹路径。
+    :param new_dir_path: 目标文件夹路径。
+    :param copy_failed: 是否将失败的文件原样复制到新目录。
+    :param name: 任务名称。
+    :return: 以 (错误类型, 错误信息) 为键、目标路径列表为值的字典。
+    """
+    error_path_dict: defaultdict[tuple[str, str], list[Path]] = defaultdict(list)
+    copy_tasks: list[tuple[Path, Path]] = []
+    for file_path, error in error_pairs:
+        new_file_path = new_dir_path / file_path.relative_to(dir_path)
+        error_path_dict[(type(error).__name__, str(error))].append(new_file_path)
+        if copy_failed and file_path.is_file():
+            copy_tasks.append((file_path, new_file_path))
+
+    if copy_tasks:
+
+        def copy_error_file(task: tuple[Path, Path]) -> Path:
+            source, destination = task
+            _ensure_dir(destination.parent)
+            return shutil.copy2(source, destination)
+
+        copy_executor = TaskExecutor(
+            name=f"{name} (copy failed)",
+            func=copy_error_file,
+            execution_mode="thread",
+        )
+        copy_executor.add_observer(TaskProgress())
+        copy_executor.start(copy_tasks)
+
+    return dict(error_path_dict)
+
+
+def _parse_rule(
+    rule: FileRule, default_policy: RulePolicy
+) -> tuple[Callable[..., Any], Callable[[Path], Path], dict[str, Any], RulePolicy]:
+    """
+    将规则统一解析为 (处理函数, 重命名函数, 额外参数, 调度策略)。
+
+    :param rule: (处理函数, 重命名函数, 额外参数) 或附带选项字典的四元组。
+    :param default_policy: 规则未指定选项时使用的默认策略。
+    :return: 解析后的四元组。
+    :raises ValueError: 规则长度不正确或选项不合法时抛出。
+    """
+    if len(rule) not in (3, 4):
+        raise ValueError(f"规则应为 3 或 4 个元素的元组: {rule}")
+    action_func, rename_func, args_extra, *rest = rule
+    options = rest[0] if rest else None
+    return (
+        action_func,
+        rename_func,
+        args_extra,
+        RulePolicy.from_options(options, default_policy),
+    )
+
+
 def handle_dir_files(
     dir_path: str | Path,
-    rules: dict[
-        str,
-        tuple[
-            Callable[..., Any],
-            Callable[[Path], Path],
-            dict[str, Any],
-        ],
-    ],
+    rules: dict[str, FileRule],
     execution_mode: str = "serial",
     name: str = "Processing files",
     dir_name_suffix: str = "_re",
+    max_workers: int | None = None,
+    cpu_budget: int | None = None,
+    io_budget: int | None = None,
+    journal_path: str | Path | None = None,
+    on_result: Callable[[Path, Any], None] | None = None,
+    adopt_existing: bool = False,
 ) -> dict[tuple[str, str], list[Path]]:
     """
     遍历指定文件夹，根据文件后缀名对文件进行处理，并将处理后的文件存储到新的目录中。
     不属于指定后缀的文件将被直接复制到新目录中。处理后的文件会保持原始的目录结构。
     如果目标文件已存在，则会跳过处理。处理过程中遇到的任何错误都会被记录并返回。
 
+    整个流程是一条 TaskChain：扫描（os.scandir，按顶层子目录并行）→ 拆分为单个文件 → 分发 → 等待结果。
+    每条规则可以附带第四个元素作为选项字典（execution_mode, max_workers, priority, resource），
+    分发阶段将文件交给 RuleScheduler，各规则在自己的并发上限内同时运行，并共享全局的 CPU 与 I/O 预算。
+    处理失败的文件在最后由线程池批量复制到新目录。
+    已完成的文件记录在进度日志中，输出先写入临时文件再原子重命名，中断后重新运行会跳过日志中已完成的文件；
+    日志中没有记录的已有输出默认重新生成；adopt_existing 为 True 时接管其中完整的输出（补写记录）。
+
     :param dir_path: 要处理的文件夹的路径，可以是相对路径或绝对路径。
-    :param rules: 一个字典，键为文件后缀，值为处理该类型文件的函数和重命名函数的元组。
-    :param execution_mode: 执行模式，可以是 'serial' 或 'thread' 'process'。默认为 'serial'。
+    :param rules: 一个字典，键为文件后缀，值为 (处理函数, 重命名函数, 额外参数[, 选项]) 的元组。
+    :param execution_mode: 未指定选项的规则使用的执行模式，可以是 'serial' 或 'thread' 'process'。默认为 'serial'。
     :param name: 任务名称。
+    :param dir_name_suffix: 新目录名称的后缀。
+    :param max_workers: 未指定选项的规则使用的并发上限。
+    :param cpu_budget: 全局 CPU 预算，默认为 CPU 核心数。
+    :param io_budget: 全局 I/O 预算，默认为 CPU 核心数的两倍（至少 8）。
+    :param journal_path: 进度日志路径，默认放在输出目录旁边（'<输出目录名>.journal.jsonl'）。
+    :param on_result: 每个文件处理成功后在当前进程中调用 on_result(源文件路径, 处理函数的返回值)，
+        可用于汇总统计；处理函数本身不必是闭包，'process' 模式下也能正常序列化。
+    :param adopt_existing: 是否接管日志中没有记录、但已经存在且完整的输出，默认重新生成。
     :return: 包含因错误未能正确处理的文件及其对应错误信息的列表。每个元素是一个元组，包括文件路径和错误对象。
     """
     dir_path = Path(dir_path)
     new_dir_path = dir_path.parent / (dir_path.name + dir_name_suffix)
+    _ensure_dir.cache_clear()
 
-    def handle_item_wrapper(task: Path) -> Any:
-        rel_path = task.relative_to(dir_path)
-        new_file_path = new_dir_path / rel_path
+    default_policy = RulePolicy(
+        execution_mode=execution_mode,
+        max_workers=max_workers,
+        resource="cpu" if execution_mode == "process" else "io",
+    )
+    parsed_rules = {
+        suffix: _parse_rule(rule, default_policy) for suffix, rule in rules.items()
+    }
+    copy_rule = _parse_rule(
+        (shutil.copy2, lambda x: x, {}, {"resource": "io"}),  # type: ignore[arg-type]
+        default_policy,
+    )
 
-        file_suffix = task.suffix.lower()
-        action_func, rename_func, args_extra = rules.get(
-            file_suffix,
-            (shutil.copy2, lambda x: x, {}),  # type: ignore[assignment]
-        )
+    with (
+        RuleScheduler(cpu_budget, io_budget) as scheduler,
+        JobJournal(
+            journal_path or _default_journal_path(new_dir_path),
+            adopt_existing=adopt_existing,
+        ) as journal,
+    ):
 
-        final_path = rename_func(new_file_path)
+        def scan_dir(task: Path) -> tuple[Path, ...]:
+            # 根目录只扫描自身的文件，子目录交给各自的扫描任务递归处理
+            return tuple(_iter_dir_files(task, recursive=task != dir_path))
 
-        return handle_item(task, final_path, action_func, args_extra)
+        def dispatch_item(task: Path) -> tuple[Path, Future[Any]]:
+            rel_path = task.relative_to(dir_path)
+            new_file_path = new_dir_path / rel_path
 
-    handlefile_executor = TaskExecutor(
-        name=name,
-        func=handle_item_wrapper,
-        execution_mode=execution_mode,
-        persist_result=True,
-    )
-    handlefile_executor.add_observer(TaskProgress())
+            action_func, rename_func, args_extra, policy = parsed_rules.get(
+                task.suffix.lower(), copy_rule
+            )
+            if policy.execution_mode == "process":
+                action_func = partial(scheduler.offload, action_func)
 
-    file_path_iter = (
-        file_path for file_path in dir_path.glob("**/*") if file_path.is_file()
+            try:
+                final_path = rename_func(new_file_path)
+                future = scheduler.submit(
+                    policy, handle_item, task, final_path, action_func, args_extra, journal
+                )
+            except Exception as error:
+                # 重命名或提交失败时同样交给处理阶段，和处理函数的错误一起记录并复制原文件
+                future = Future()
+                future.set_exception(error)
+            return task, future
+
+        def wait_item(task: tuple[Path, Future[Any]]) -> Any:
+            result = task[1].result()
+            if on_result is not None:
+                on_result(task[0], result)
+            return result
+
+        scan_stage: TaskStage[Any, Any] = TaskStage(  # type: ignore[reportUnknownVariableType]
+            f"{name} (scan)", scan_dir, execution_mode="thread"
+        )
+        split_stage = TaskSplitter(f"{name} (split)")
+        dispatch_stage: TaskStage[Any, Any] = TaskStage(  # type: ignore[reportUnknownVariableType]
+            f"{name} (dispatch)", dispatch_item, execution_mode="serial"
+        )
+        handle_stage: TaskStage[Any, Any] = TaskStage(  # type: ignore[reportUnknownVariableType]
+            name,
+            wait_item,
+            execution_mode="thread",
+            max_workers=scheduler.total_budget,
+            persist_result=True,
+        )
+        stages = [scan_stage, split_stage, dispatch_stage, handle_stage]
+        for stage in stages:
+            stage.add_observer(TaskProgress())
+
+        # stage_mode 为 thread 时各阶段同时运行，扫描、分发与处理形成流水线
+        chain = TaskChain(name, stages, stage_mode="thread")
+        scan_tasks = [dir_path] + [
+            Path(entry.path)
+            for entry in os.scandir(dir_path)
+            if entry.is_dir(follow_symlinks=False)
+        ]
+        chain.start_chain({scan_stage.get_tag(): scan_tasks})  # type: ignore[reportUnknownMemberType]
+
+    error_pairs = [
+        (file_path, error)
+        for (file_path, _), error in handle_stage.get_error_pairs()  # type: ignore[union-attr]
+    ]
+    return _copy_error_files(
+        error_pairs,
+        dir_path,
+        new_dir_path,
+        copy_failed=True,
+        name=name,
     )
-    handlefile_executor.start(file_path_iter)
-
-    error_path_dict: defaultdict[tuple[str, str], list[Path]] = defaultdict(list)
-    for file_path, error in handlefile_executor.get_error_pairs():  # type: ignore[union-attr]
-        rel_path = file_path.relative_to(handlefile_executor.dir_path)  # type: ignore[union-attr]
-        new_file_path = handlefile_executor.new_dir_path / rel_path  # type: ignore[union-attr]
-        shutil.copy(file_path, new_file_path)  # type: ignore[arg-type]
-        error_path_dict[(type(error).__name__, str(error))].append(new_file_path)  # type: ignore[arg-type]
-
-    return dict(error_path_dict)
 
 
 def handle_subdirs(
     dir_path: str | Path,
-    rules: dict[
-        str,
-        tuple[
-            Callable[..., Any],
-            Callable[[Path], Path],
-            dict[str, Any],
-        ],
-    ],
+    rules: dict[str, FileRule],
     execution_mode: str = "serial",
     name: str = "Processing dirs",
     dir_name_suffix: str = "_re",
+    max_workers: int | None = None,
+    cpu_budget: int | None = None,
+    io_budget: int | None = None,
+    journal_path: str | Path | None = None,
+    adopt_existing: bool = False,
 ) -> dict[tuple[str, str], list[Path]]:
     """
     遍历指定文件夹，根据文件后缀名对文件进行处理，并将处理后的文件存储到新的目录中。
     不属于指定后缀的文件将被直接复制到新目录中。处理后的文件会保持原始的目录结构。
     如果目标文件已存在，则会跳过处理。处理过程中遇到的任何错误都会被记录并返回。
+    "dir" 规则同样可以附带选项字典，语义与 handle_dir_files 一致；进度日志的用法也与 handle_dir_files 相同。
 
     :param dir_path: 要处理的文件夹的路径，可以是相对路径或绝对路径。
     :param rules: 一个字典，键为文件后缀，值为处理该类型文件的函数和重命名函数的元组。
     :param execution_mode: 执行模式，可以是 'serial' 或 'thread' 'process'。默认为 'serial'。
     :param name: 任务名称。
+    :param dir_name_suffix: 新目录名称的后缀。
+    :param max_workers: 未指定选项时的并发上限。
+    :param cpu_budget: 全局 CPU 预算，默认为 CPU 核心数。
+    :param io_budget: 全局 I/O 预算，默认为 CPU 核心数的两倍（至少 8）。
+    :param journal_path: 进度日志路径，默认放在输出目录旁边（'<输出目录名>.journal.jsonl'）。
+    :param adopt_existing: 是否接管日志中没有记录、但已经存在且完整的输出，默认重新生成。
     :return: 包含因错误未能正确处理的文件及其对应错误信息的列表。每个元素是一个元组，包括文件路径和错误对象。
     """
     dir_path = Path(dir_path)
     new_dir_path = dir_path.parent / (dir_path.name + dir_name_suffix)
+    _ensure_dir.cache_clear()
 
-    def handle_item_wrapper(task: Path) -> Any:
-        rel_path = task.relative_to(dir_path)
-        new_sub_dir_path = new_dir_path / rel_path
+    default_policy = RulePolicy(
+        execution_mode=execution_mode,
+        max_workers=max_workers,
+        resource="cpu" if execution_mode == "process" else "io",
+    )
+    action_func, rename_func, args_extra, policy = _parse_rule(
+        rules.get("dir", (shutil.copy, lambda x: x, {})),  # type: ignore[arg-type]
+        default_policy,
+    )
 
-        action_func, rename_func, args_extra = rules.get(
-            "dir",
-            (shutil.copy, lambda x: x, {}),  # type: ignore[assignment]
+    with (
+        RuleScheduler(cpu_budget, io_budget) as scheduler,
+        JobJournal(
+            journal_path or _default_journal_path(new_dir_path),
+            adopt_existing=adopt_existing,
+        ) as journal,
+    ):
+        if policy.execution_mode == "process":
+            action_func = partial(scheduler.offload, action_func)
+
+        def handle_item_wrapper(task: Path) -> Any:
+            rel_path = task.relative_to(dir_path)
+            new_sub_dir_path = new_dir_path / rel_path
+
+            final_path = rename_func(new_sub_dir_path)
+            return scheduler.submit(
+                policy, handle_item, task, final_path, action_func, args_extra, journal
+            ).result()
+
+        handlefile_executor = TaskExecutor(
+            name=name,
+            func=handle_item_wrapper,
+            execution_mode="thread",
+            max_workers=scheduler.total_budget,
+            persist_result=True,
         )
 
-        final_path = rename_func(new_sub_dir_path)
-        return handle_item(task, final_path, action_func, args_extra)
+        sub_dir_list = find_pure_dirs(dir_path, True)
+        handlefile_executor.start(sub_dir_list)
 
-    handlefile_executor = TaskExecutor(
+    return _copy_error_files(
+        handlefile_executor.get_error_pairs(),  # type: ignore[union-attr]
+        dir_path,
+        new_dir_path,
+        copy_failed=False,
         name=name,
-        func=handle_item_wrapper,
-        execution_mode=execution_mode,
-        persist_result=True,
     )
 
-    sub_dir_list = find_pure_dirs(dir_path, True)
-    handlefile_executor.start(sub_dir_list)
-
-    error_path_dict: defaultdict[tuple[str, str], list[Path]] = defaultdict(list)
-    for file_path, error in handlefile_executor.get_error_pairs():  # type: ignore[union-attr]
-        rel_path = file_path.relative_to(handlefile_executor.dir_path)  # type: ignore[union-attr]
-        new_file_path = handlefile_executor.new_dir_path / rel_path  # type: ignore[union-attr]
-        # shutil.copy(file_path, new_file_path)
-        error_path_dict[(type(error).__name__, str(error))].append(new_file_path)  # type: ignore[arg-type]
-
-    return dict(error_path_dict)
-
 
 def compress_dir(
-    dir_path: str | Path, execution_mode: str = "thread"
+    dir_path: str | Path,
+    execution_mode: str = "thread",
+    journal_path: str | Path | None = None,
 ) -> dict[tuple[str, str], list[Path]]:
     """
     遍历指定文件夹，根据文件后缀名对文件进行压缩处理，并将处理后的文件存储到新的目录中。
     支持的文件类型包括图片、视频和PDF。不属于这三种类型的文件将被直接复制到新目录中。
     压缩后的文件会保持原始的目录结构。如果目标文件已存在，则会跳过处理。处理过程中遇到的任何错误都会被记录并返回。
 
+    图片压缩是 CPU 密集型任务，交给进程池；视频压缩由 ffmpeg 自行占满多核，只保留少量并发；
+    其余文件的复制属于 I/O 任务，使用较宽的线程池。三类任务同时运行。
+
     :param dir_path: 要处理的文件夹的路径，可以是相对路径或绝对路径。
-    :param execution_mode: 执行模式，可以是 'serial' 或 'thread' 'process'。默认为 'thread'。
+    :param execution_mode: 复制等未指定选项的规则使用的执行模式，可以是 'serial' 或 'thread' 'process'。默认为 'thread'。
+    :param journal_path: 进度日志路径，默认放在输出目录旁边，中断后重新运行会从日志处继续。
     :return: 包含因错误未能正确处理的文件及其对应错误信息的列表。每个元素是一个元组，包括文件路径和错误对象。
     """
 
@@ -222,44 +469,163 @@ def compress_dir(
 
     # from .DocumentConversion import compress_pdf
 
-    rules: dict[
-        str, tuple[Callable[..., Any], Callable[[Path], Path], dict[str, Any]]
-    ] = {suffix: (compress_img, lambda x: x, {}) for suffix in IMG_SUFFIXES}  # type: ignore[assignment]
+    img_options = {"execution_mode": "process", "resource": "cpu", "priority": 1}
+    video_options = {
+        "execution_mode": "thread",
+        "max_workers": 2,
+        "resource": "cpu",
+        "priority": 2,
+    }
+
+    rules: dict[str, FileRule] = {
+        suffix: (compress_img, lambda x: x, {}, img_options) for suffix in IMG_SUFFIXES  # type: ignore[assignment]
+    }
     rules.update(  # type: ignore
-        {suffix: (compress_video, rename_mp4, {}) for suffix in VIDEO_SUFFIXES}  # type: ignore[assignment]
+        {
+            suffix: (compress_video, rename_mp4, {}, video_options)  # type: ignore[assignment]
+            for suffix in VIDEO_SUFFIXES
+        }
     )
     # rules.update(  # type: ignore{'.pdf': (compress_pdf,rename_pdf, {})})
 
-    return handle_dir_files(dir_path, rules, execution_mode, name="Compressing Folder")
+    return handle_dir_files(
+        dir_path,
+        rules,
+        execution_mode,
+        name="Compressing Folder",
+        journal_path=journal_path,
+    )
+
+
+def _safe_member_path(destination: Path, member_name: str) -> Path:
+    """
+    将压缩包内的成员名映射为 destination 下的路径。
+    与 zipfile.extract 的规则一致：去掉盘符、根路径以及 "." / ".." 组成部分，避免越界写入。
+
+    :param destination: 解压缩的目标路径。
+    :param member_name: 压缩包内的成员名。
+    :return: 成员在目标路径下的实际路径。
+    """
+    parts = [
+        part
+        for part in re.split(r"[\\/]+", member_name)
+        if part not in ("", ".", "..") and not part.endswith(":")
+    ]
+    return destination.joinpath(*parts)
+
 
+def _balance_members(
+    members: list[zipfile.ZipInfo], bucket_num: int
+) -> list[list[zipfile.ZipInfo]]:
+    """
+    按解压后大小将成员贪心地分配到 bucket_num 个分组中，使各组总字节数尽量均衡。
+
+    :param members: 需要解压的成员列表。
+    :param bucket_num: 分组数量。
+    :return: 非空分组列表。
+    """
+    buckets: list[list[zipfile.ZipInfo]] = [[] for _ in range(bucket_num)]
+    heap = [(0, index) for index in range(bucket_num)]
+    for info in sorted(members, key=lambda i: i.file_size, reverse=True):
+        load, index = heapq.heappop(heap)
+        buckets[index].append(info)
+        heapq.heappush(heap, (load + info.file_size, index))
 
-def unzip_zip_file(zip_file: Path, destination: Path) -> None:
+    return [bucket for bucket in buckets if bucket]
+
+
+def _extract_zip_members(
+    zip_file: Path,
+    destination: Path,
+    members: list[zipfile.ZipInfo],
+    buffer_size: int,
+) -> int:
+    """
+    使用独立的 ZipFile 句柄，以流式方式依次解压一组成员。
+
+    :param zip_file: zip 文件路径。
+    :param destination: 解压缩的目标路径。
+    :param members: 本组需要解压的成员。
+    :param buffer_size: 每次读写的缓冲区大小。
+    :return: 本组解压出的字节数。
+    """
+    extracted_bytes = 0
+    with zipfile.ZipFile(zip_file) as zf:
+        for info in members:
+            target = _safe_member_path(destination, info.filename)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with zf.open(info) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, buffer_size)
+            extracted_bytes += info.file_size
+
+    return extracted_bytes
+
+
+def unzip_zip_file(
+    zip_file: Path,
+    destination: Path,
+    max_workers: int = 4,
+    buffer_size: int = 1024 * 1024,
+    parallel_threshold: int = 8 * 1024 * 1024,
+) -> int:
     """
     解压缩指定的 zip 文件。
+    成员按大小均衡分组后由多个线程并行解压，每个线程持有自己的 ZipFile 句柄，
+    并以大缓冲区流式写出，不会把整个成员读入内存（zlib 解压时会释放 GIL）。
 
     :param zip_file: 要解压缩的 zip 文件路径。
+    :param destination: 解压缩的目标路径。
+    :param max_workers: 并行解压的线程数，小于等于 1 时串行解压。
+    :param buffer_size: 流式复制时的缓冲区大小，默认 1MB。
+    :param parallel_threshold: 解压后总大小低于该值时直接串行解压，默认 8MB。
+    :return: 解压出的总字节数。
     :raises ValueError: 如果文件不是有效的 zip 文件或发生其他错误。
     """
     try:
         with zipfile.ZipFile(zip_file) as zf:
-            zf.extractall(destination)
+            infos = zf.infolist()
+
+        file_infos: list[zipfile.ZipInfo] = []
+        for info in infos:
+            if info.is_dir():
+                _safe_member_path(destination, info.filename).mkdir(
+                    parents=True, exist_ok=True
+                )
+            else:
+                file_infos.append(info)
+
+        total_size = sum(info.file_size for info in file_infos)
+        if max_workers <= 1 or len(file_infos) < 2 or total_size < parallel_threshold:
+            return _extract_zip_members(zip_file, destination, file_infos, buffer_size)
+
+        buckets = _balance_members(file_infos, min(max_workers, len(file_infos)))
+        with ThreadPoolExecutor(max_workers=len(buckets)) as pool:
+            futures = [
+                pool.submit(
+                    _extract_zip_members, zip_file, destination, bucket, buffer_size
+                )
+                for bucket in buckets
+            ]
+            return sum(future.result() for future in futures)
     except zipfile.BadZipFile as e:
         raise ValueError(f"{zip_file} 不是一个有效的 zip 文件") from e
     except zipfile.LargeZipFile as e:
         raise ValueError(f"{zip_file} 太大了，无法解压缩") from e
     except RuntimeError as e:
-        raise ValueError("{zip_file} 受密码保护，无法解压缩") from e
+        raise ValueError(f"{zip_file} 受密码保护，无法解压缩") from e
 
 
-def unzip_rar_file(rar_file: Path, destination: Path) -> None:
+def unzip_rar_file(rar_file: Path, destination: Path) -> int:
     """
     解压缩指定的 rar 文件。
 
     :param rar_file: 要解压缩的 rar 文件路径。
+    :return: 解压出的总字节数。
     """
     try:
         with rarfile.RarFile(rar_file) as rf:
             rf.extractall(destination)  # type: ignore[union-attr]
+            return sum(info.file_size for info in rf.infolist() if not info.is_dir())
     except rarfile.BadRarFile as e:
         raise ValueError(f"{rar_file} 不是一个有效的 rar 文件") from e
     except rarfile.LargeRarFile as e:  # type: ignore[name-defined]
@@ -268,12 +634,13 @@ def unzip_rar_file(rar_file: Path, destination: Path) -> None:
         raise ValueError(f"{rar_file} 受密码保护，无法解压缩") from e
 
 
-def unzip_tar_file(tar_file: Path, destination: Path) -> None:
+def unzip_tar_file(tar_file: Path, destination: Path) -> int:
     """
     解压缩指定的 tar 文件。
 
     :param tar_file: 要解压缩的 tar 文件路径。
     :param destination: 解压缩的目标路径。
+    :return: 解压出的总字节数。
     :raises ValueError: 如果文件不是有效的 tar 文件或发生其他错误。
     """
     # 检查是否为有效的 tar 文件
@@ -284,22 +651,28 @@ def unzip_tar_file(tar_file: Path, destination: Path) -> None:
         with tarfile.open(tar_file) as tar:
             # 提取所有内容到目标路径
             tar.extractall(path=destination)
+            return sum(member.size for member in tar.getmembers() if member.isfile())
     except tarfile.ReadError as e:
         raise ValueError(f"{tar_file} 读取错误，可能不是一个有效的 tar 文件") from e
     except Exception as e:
         raise ValueError(f"解压 {tar_file} 时发生错误: {e}") from e
 
 
-def unzip_7z_file(seven_zip_file: Path, destination: Path) -> None:
+def unzip_7z_file(seven_zip_file: Path, destination: Path) -> int:
     """
     解压缩指定的 7z 文件。
 
     :param seven_zip_file: 要解压缩的 7z 文件路径。
+    :return: 解压出的总字节数。
     :raises ValueError: 如果文件不是有效的 7z 文件或发生其他错误。
     """
     try:
         with py7zr.SevenZipFile(seven_zip_file, mode="r") as szf:
+            total_size = sum(
+                info.uncompressed for info in szf.list() if not info.is_directory
+            )
             szf.extractall(destination)
+            return total_size
     except py7zr.Bad7zFile as e:
         raise ValueError(f"{seven_zip_file} 不是一个有效的 7z 文件") from e
     except py7zr.Large7zFile as e:  # type: ignore[name-defined]
@@ -308,12 +681,31 @@ def unzip_7z_file(seven_zip_file: Path, destination: Path) -> None:
         raise ValueError(f"{seven_zip_file} 受密码保护，无法解压缩") from e
 
 
-def unzip_dir(dir_path: str | Path) -> dict[tuple[str, str], list[Path]]:
+def unzip_dir(
+    dir_path: str | Path,
+    execution_mode: str = "thread",
+    member_workers: int = 4,
+    journal_path: str | Path | None = None,
+) -> dict[tuple[str, str], list[Path]]:
     """
-    遍历指定文件夹，解压缩所有支持的压缩文件。支持的文件类型包括 zip 和 rar。
+    遍历指定文件夹，解压缩所有支持的压缩文件。支持的文件类型包括 zip、rar、tar 和 7z。
+    多个压缩包同时解压，zip 包内部的成员也会并行解压，结束后打印解压吞吐量。
 
     :param dir_path: 要处理的文件夹的路径，可以是相对路径或绝对路径。
+    :param execution_mode: 压缩包之间的执行模式，默认为 'thread'。
+    :param member_workers: 单个 zip 包内部并行解压的线程数。
+    :param journal_path: 进度日志路径，默认放在输出目录旁边，中断后重新运行会从日志处继续。
+    :return: 包含因错误未能正确处理的文件及其对应错误信息的字典。
     """
+    extracted_bytes = 0
+    bytes_lock = threading.Lock()
+
+    def count_bytes(_source: Path, result: Any) -> None:
+        # 各 unzip_* 返回解压出的字节数，已完成而跳过的文件返回提示字符串
+        nonlocal extracted_bytes
+        if isinstance(result, int):
+            with bytes_lock:
+                extracted_bytes += result
 
     def rename_unzip(file_path: Path) -> Path:
         name = file_path.stem
@@ -329,13 +721,329 @@ def unzip_dir(dir_path: str | Path) -> dict[tuple[str, str], list[Path]]:
             dict[str, Any],
         ],
     ] = {
-        ".zip": (unzip_zip_file, rename_unzip, {}),
+        ".zip": (unzip_zip_file, rename_unzip, {"max_workers": member_workers}),
         ".rar": (unzip_rar_file, rename_unzip, {}),
         ".tar": (unzip_tar_file, rename_unzip, {}),
         ".7z": (unzip_7z_file, rename_unzip, {}),
     }
 
-    return handle_dir_files(dir_path, rules, name="Unziping dir")
+    start_time = time.perf_counter()
+    error_path_dict = handle_dir_files(
+        dir_path,
+        rules,
+        execution_mode,
+        name="Unziping dir",
+        journal_path=journal_path,
+        on_result=count_bytes,
+    )
+    elapsed = time.perf_counter() - start_time
+
+    speed = HumanBytes(extracted_bytes / elapsed) if elapsed > 0 else HumanBytes(0)
+    print(
+        f"\nExtracted {HumanBytes(extracted_bytes)} in {elapsed:.2f}s ({speed}/s)"
+    )
+
+    return error_path_dict
+
+
+# 已经压缩过的格式，再次 deflate 只会浪费 CPU
+STORED_SUFFIXES = frozenset(IMG_SUFFIXES + VIDEO_SUFFIXES + ZIP_SUFFIXES)
+
+
+def _compress_member(
+    entry: Path, compress_type: int, level: int, chunk_size: int, spool_size: int
+) -> tuple[tempfile.SpooledTemporaryFile, int, int, int]:
+    """
+    在线程池中压缩单个成员：按块生成 raw deflate 流（zip 成员格式）并计算 CRC32。
+    结果暂存在内存中，超过 spool_size 时自动转存到临时文件。
+
+    :param entry: 成员文件路径。
+    :param compress_type: zipfile.ZIP_DEFLATED 或 zipfile.ZIP_STORED。
+    :param level: zlib 压缩级别。
+    :param chunk_size: 每次读取的块大小。
+    :param spool_size: 暂存在内存中的最大字节数。
+    :return: (已回到开头的暂存文件, CRC32, 原始大小, 压缩后大小) 元组。
+    """
+    compressor = (
+        zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        if compress_type == zipfile.ZIP_DEFLATED
+        else None
+    )
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_size)
+    crc = file_size = 0
+    try:
+        with open(entry, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                crc = zlib.crc32(chunk, crc)
+                file_size += len(chunk)
+                spool.write(compressor.compress(chunk) if compressor else chunk)
+        if compressor is not None:
+            spool.write(compressor.flush())
+        compress_size = spool.tell()
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return spool, crc, file_size, compress_size
+
+
+def _encode_zip_name(zinfo: zipfile.ZipInfo) -> tuple[bytes, int]:
+    """
+    编码成员名：能用 ASCII 表示时按 ASCII，否则按 UTF-8 并设置通用标志位 0x800。
+
+    :param zinfo: 成员信息。
+    :return: (编码后的成员名, 通用标志位) 元组。
+    """
+    try:
+        return zinfo.filename.encode("ascii"), zinfo.flag_bits
+    except UnicodeEncodeError:
+        return zinfo.filename.encode("utf-8"), zinfo.flag_bits | 0x800
+
+
+def _write_zip_directory(out, members: list[zipfile.ZipInfo]) -> None:
+    """
+    写入 zip 的中央目录与结束记录，成员数、大小或偏移超出限制时写入 zip64 记录。
+
+    :param out: 已写完所有成员数据的输出文件。
+    :param members: 成员信息列表，header_offset 等字段均已填写。
+    """
+    start_dir = out.tell()
+    for zinfo in members:
+        file_size, compress_size = zinfo.file_size, zinfo.compress_size
+        header_offset = zinfo.header_offset
+        zip64_fields = []
+        if file_size > zipfile.ZIP64_LIMIT or compress_size > zipfile.ZIP64_LIMIT:
+            zip64_fields += [file_size, compress_size]
+            file_size = compress_size = 0xFFFFFFFF
+        if header_offset > zipfile.ZIP64_LIMIT:
+            zip64_fields.append(header_offset)
+            header_offset = 0xFFFFFFFF
+
+        extra = zinfo.extra
+        extract_version = zinfo.extract_version
+        if zip64_fields:
+            extra = (
+                struct.pack(
+                    f"<HH{len(zip64_fields)}Q", 1, 8 * len(zip64_fields), *zip64_fields
+                )
+                + extra
+            )
+            extract_version = max(extract_version, zipfile.ZIP64_VERSION)
+
+        year, month, day, hour, minute, second = zinfo.date_time
+        filename, flag_bits = _encode_zip_name(zinfo)
+        out.write(
+            struct.pack(
+                zipfile.structCentralDir,
+                zipfile.stringCentralDir,
+                max(zinfo.create_version, extract_version),
+                zinfo.create_system,
+                extract_version,
+                zinfo.reserved,
+                flag_bits,
+                zinfo.compress_type,
+                hour << 11 | minute << 5 | second // 2,
+                (year - 1980) << 9 | month << 5 | day,
+                zinfo.CRC,
+                compress_size,
+                file_size,
+                len(filename),
+                len(extra),
+                len(zinfo.comment),
+                0,
+                zinfo.internal_attr,
+                zinfo.external_attr,
+                header_offset,
+            )
+        )
+        out.write(filename + extra + zinfo.comment)
+
+    end_dir = out.tell()
+    count, dir_size, dir_offset = len(members), end_dir - start_dir, start_dir
+    if (
+        count > zipfile.ZIP_FILECOUNT_LIMIT
+        or dir_size > zipfile.ZIP64_LIMIT
+        or dir_offset > zipfile.ZIP64_LIMIT
+    ):
+        out.write(
+            struct.pack(
+                zipfile.structEndArchive64,
+                zipfile.stringEndArchive64,
+                44,
+                zipfile.ZIP64_VERSION,
+                zipfile.ZIP64_VERSION,
+                0,
+                0,
+                count,
+                count,
+                dir_size,
+                dir_offset,
+            )
+        )
+        out.write(
+            struct.pack(
+                zipfile.structEndArchive64Locator,
+                zipfile.stringEndArchive64Locator,
+                0,
+                end_dir,
+                1,
+            )
+        )
+        count = min(count, 0xFFFF)
+        dir_size = min(dir_size, 0xFFFFFFFF)
+        dir_offset = min(dir_offset, 0xFFFFFFFF)
+    out.write(
+        struct.pack(
+            zipfile.structEndArchive,
+            zipfile.stringEndArchive,
+            0,
+            0,
+            count,
+            count,
+            dir_size,
+            dir_offset,
+            0,
+        )
+    )
+
+
+def _compress_to_zip(
+    dir_path: Path,
+    archive_path: Path,
+    level: int,
+    workers: int,
+    max_member_memory: int,
+    chunk_size: int = 1024 * 1024,
+) -> None:
+    """
+    多线程构建 zip 压缩包：各成员在线程池中并行压缩（raw deflate + CRC32），
+    写入线程按原顺序写入本地文件头与压缩数据，最后写入中央目录。
+
+    :param dir_path: 要压缩的文件夹，成员名为相对于它的路径。
+    :param archive_path: 输出的 zip 路径。
+    :param level: zlib 压缩级别。
+    :param workers: 压缩线程数。
+    :param max_member_memory: 单个成员的压缩结果在内存中暂存的上限，超过时转存到临时文件。
+    :param chunk_size: 读取文件的块大小。
+    """
+    entries = sorted(dir_path.rglob("*"))
+    members: list[zipfile.ZipInfo] = []
+
+    with (
+        open(archive_path, "wb") as out,
+        ThreadPoolExecutor(max_workers=workers) as pool,
+    ):
+        # 预先提交一个窗口的压缩任务，写入顺序与 entries 保持一致，同时限制暂存结果的数量
+        window = max(workers * 2, 1)
+        futures: dict[int, Future[tuple[Any, int, int, int]]] = {}
+
+        def compress_type_of(entry: Path) -> int:
+            if entry.suffix.lower() in STORED_SUFFIXES:
+                return zipfile.ZIP_STORED
+            return zipfile.ZIP_DEFLATED
+
+        def submit(index: int) -> None:
+            if index >= len(entries) or not entries[index].is_file():
+                return
+            entry = entries[index]
+            futures[index] = pool.submit(
+                _compress_member,
+                entry,
+                compress_type_of(entry),
+                level,
+                chunk_size,
+                max_member_memory,
+            )
+
+        try:
+            for index in range(window):
+                submit(index)
+
+            for index, entry in enumerate(tqdm(entries, desc="Compressing to zip")):
+                submit(index + window)
+                arcname = entry.relative_to(dir_path).as_posix()
+
+                if entry.is_dir():
+                    if any(entry.iterdir()):
+                        continue
+                    zinfo = zipfile.ZipInfo.from_file(entry, arcname)
+                    spool, crc, file_size, compress_size = None, 0, 0, 0
+                else:
+                    zinfo = zipfile.ZipInfo.from_file(entry, arcname)
+                    zinfo.compress_type = compress_type_of(entry)
+                    spool, crc, file_size, compress_size = futures.pop(index).result()
+
+                zinfo.CRC = crc
+                zinfo.file_size = file_size
+                zinfo.compress_size = compress_size
+                zinfo.header_offset = out.tell()
+                out.write(zinfo.FileHeader())
+                if spool is not None:
+                    with spool:
+                        shutil.copyfileobj(spool, out, chunk_size)
+                members.append(zinfo)
+
+            _write_zip_directory(out, members)
+        finally:
+            for future in futures.values():
+                future.cancel()
+                if not future.cancelled() and future.exception() is None:
+                    future.result()[0].close()
+
+
+def compress_to_archive(
+    dir_path: str | Path,
+    fmt: str = "zip",
+    level: int = 6,
+    workers: int | None = None,
+    archive_path: str | Path | None = None,
+    max_member_memory: int = 64 * 1024 * 1024,
+) -> Path:
+    """
+    将文件夹压缩为归档文件，归档内的成员名均为相对于该文件夹的路径（不含文件夹本身）。
+    zip 格式下各成员在线程池中并行压缩，再按原顺序写入压缩包；
+    图片、视频和压缩包等已压缩格式以 ZIP_STORED 存储，不再重复压缩。
+    tar 系列格式（'tar', 'gztar', 'bztar', 'xztar'）为单流格式，按顺序串行写入。
+
+    :param dir_path: 要压缩的文件夹路径。
+    :param fmt: 归档格式，可以是 'zip', 'tar', 'gztar', 'bztar', 'xztar'。默认为 'zip'。
+    :param level: 压缩级别（0-9），默认为 6。
+    :param workers: zip 格式的压缩线程数，默认为 CPU 核心数。
+    :param archive_path: 输出的归档路径，默认为与文件夹同名的归档文件。
+    :param max_member_memory: zip 格式下单个成员的压缩结果在内存中暂存的上限，超过时转存到临时文件。
+    :return: 生成的归档文件路径。
+    :raises ValueError: 如果路径不是文件夹或归档格式不受支持。
+    """
+    tar_modes = {"tar": "w", "gztar": "w:gz", "bztar": "w:bz2", "xztar": "w:xz"}
+    tar_suffixes = {"tar": "tar", "gztar": "tar.gz", "bztar": "tar.bz2", "xztar": "tar.xz"}
+
+    dir_path = Path(dir_path)
+    if not dir_path.is_dir():
+        raise ValueError(f"The provided path {dir_path} is not a directory.")
+    if fmt != "zip" and fmt not in tar_modes:
+        raise ValueError(f"不支持的归档格式: {fmt}")
+
+    archive_path = Path(
+        archive_path or dir_to_file_path(dir_path, tar_suffixes.get(fmt, fmt))
+    )
+    archive_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if fmt == "zip":
+        workers = workers or os.cpu_count() or 1
+        _compress_to_zip(dir_path, archive_path, level, workers, max_member_memory)
+        return archive_path
+
+    tar_kwargs: dict[str, Any] = {}
+    if fmt in ("gztar", "bztar"):
+        tar_kwargs["compresslevel"] = max(level, 1)
+    elif fmt == "xztar":
+        tar_kwargs["preset"] = level
+    with tarfile.open(archive_path, tar_modes[fmt], **tar_kwargs) as tar:  # type: ignore[call-overload]
+        # 与 zip 相同，成员名相对于 dir_path
+        for entry in sorted(dir_path.iterdir()):
+            tar.add(entry, arcname=entry.name)
+
+    return archive_path
 
 
 def delete_file_or_dir(path: Path) -> None:
@@ -7,6 +7,7 @@ from tqdm import tqdm
 
 from ..constants.pi_digit import PI_STR_1E6
 from .ListDictTools import list_to_square_matrix
+from .TextTools import char_counts
 
 
 def get_pi_digits(start: int, end: int) -> str:
@@ -235,13 +236,11 @@ def digit_frequency(target_str: str) -> dict[str, float]:
     :param target_str: 目标数字字符串
     :return: 各个数字及其出现比率的字典
     """
-    frequency = {}
-    total_length = 0
-
-    for digit in target_str:
-        if digit.isdigit():  # 只统计数字字符
-            frequency[digit] = frequency.get(digit, 0) + 1
-            total_length += 1
+    # 只统计数字字符，isdigit 只需在去重后的字符上判断
+    frequency = {
+        char: count for char, count in char_counts(target_str).items() if char.isdigit()
+    }
+    total_length = sum(frequency.values())
 
     # 将频率转换为比率
     ratio = {char: count / total_length for char, count in frequency.items()}
@@ -1,16 +1,28 @@
 # pyright: reportGeneralTypeIssues=false
 
 import base64
+import bz2
+import codecs
+import importlib.util
+import lzma
 import math
+import os
 import re
 import string
 import struct
+import time
 import zlib
-from itertools import zip_longest
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from itertools import accumulate, zip_longest
+from operator import add
 from pathlib import Path
 from pprint import pprint
+from typing import Any
 
 import charset_normalizer
+import numpy as np
 import reedsolo
 
 # import jieba
@@ -134,42 +146,103 @@ def string_split(string: str, split_str: str = "\n") -> list[str]:
     return [s for s in string.split(split_str) if s]
 
 
-def calculate_valid_chinese_text(text: str) -> float:
+# 字符类别及其匹配规则，用于构建码位 -> 类别位的查找表；规则与原先逐字符匹配的正则一致
+_CHAR_CLASS_PATTERNS = {
+    "cjk": r"[\u4e00-\u9fff]",
+    "zh_punct": r"[。，、？！《》“”‘’：（）【】]",
+    "alnum": r"[0-9a-zA-Z]",
+    "printable": f"[{string.printable}]",
+    "replacement": "\ufffd",
+}
+_CHAR_CLASS_BITS = {name: 1 << index for index, name in enumerate(_CHAR_CLASS_PATTERNS)}
+# 由若干类别组合而成的统计项
+_CHAR_CLASS_GROUPS = {
+    "chinese": ("cjk", "zh_punct", "alnum"),
+    "valid": ("cjk", "zh_punct", "printable"),
+}
+
+
+@lru_cache(maxsize=1)
+def _char_class_table() -> np.ndarray:
+    """
+    构建 BMP 码位到类别位的查找表，最后一项代表 BMP 之外的码位（不属于任何类别）。
+    """
+    bmp = "".join(map(chr, range(0x10000)))
+    table = np.zeros(0x10001, dtype=np.uint8)
+    for name, pattern in _CHAR_CLASS_PATTERNS.items():
+        positions = [match.start() for match in re.finditer(pattern, bmp)]
+        table[positions] |= _CHAR_CLASS_BITS[name]
+    return table
+
+
+def text_to_codepoints(text: str | np.ndarray) -> np.ndarray:
     """
-    计算文本中中文字符（含中文标点和数字字母）的比例。
+    把文本转换为码位数组，之后的各项统计都基于该数组向量化计算，可在多个统计函数间复用。
 
-    :param text: 待分析的文本。
-    :return: 中文字符占总字符数的比例。
+    :param text: 待转换的文本；已经是码位数组时原样返回。
+    :return: uint32 码位数组。
     """
-    # 定义一个正则表达式来匹配中文字符
-    chinese_char_pattern = re.compile(
-        r"[\u4e00-\u9fff" r"。，、？！《》“”‘’：（）【】" r"0-9a-zA-Z]"
-    )
+    if isinstance(text, np.ndarray):
+        return text
+    return np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype="<u4")
 
-    # 计算中文字符的数量
-    chinese_char_count = len(chinese_char_pattern.findall(text))
 
-    # 计算文本中中文字符的比例
-    return chinese_char_count / len(text)
+def char_class_counts(text: str | np.ndarray) -> dict[str, int]:
+    """
+    统计文本中各类字符的数量，一次查表与一次直方图得到全部类别。
 
+    :param text: 待统计的文本或 text_to_codepoints 得到的码位数组。
+    :return: 字典，包含 'total'（总字符数）、'cjk'（中日韩统一表意文字）、'zh_punct'（常见中文标点）、
+        'alnum'（ASCII 数字字母）、'printable'（ASCII 可打印字符）、'replacement'（替换字符 U+FFFD），
+        以及组合项 'chinese'（cjk + zh_punct + alnum）与 'valid'（cjk + zh_punct + printable）。
+    """
+    codepoints = text_to_codepoints(text)
+    table = _char_class_table()
+    class_bits = table[np.minimum(codepoints, len(table) - 1)]
+    histogram = np.bincount(class_bits, minlength=1 << len(_CHAR_CLASS_BITS))
+    bit_values = np.arange(len(histogram))
+
+    def count(*names: str) -> int:
+        mask = sum(_CHAR_CLASS_BITS[name] for name in names)
+        return int(histogram[(bit_values & mask) != 0].sum())
+
+    counts = {"total": len(codepoints)}
+    counts.update({name: count(name) for name in _CHAR_CLASS_BITS})
+    counts.update({name: count(*names) for name, names in _CHAR_CLASS_GROUPS.items()})
+    return counts
 
-def calculate_valid_text(text: str) -> float:
+
+def char_counts(text: str | np.ndarray) -> dict[str, int]:
     """
-    计算文本中有效字符（中文、英文、数字及常见标点）的比例。
+    统计文本中每个字符的出现次数。
 
-    :param text: 待分析的文本。
-    :return: 有效字符占总字符数的比例。
+    :param text: 待统计的文本或 text_to_codepoints 得到的码位数组。
+    :return: 字符到出现次数的字典，按码位排序。
     """
-    # 定义一个正则表达式来匹配所有常见语言字符和标点符号
-    valid_char_pattern = re.compile(
-        r"[\u4e00-\u9fff" r"。，、？！《》“”‘’：（）【】" f"{string.printable}]"
-    )
+    values, counts = np.unique(text_to_codepoints(text), return_counts=True)
+    return dict(zip(map(chr, values.tolist()), counts.tolist()))
+
 
-    # 计算有效字符的数量
-    valid_char_count = len(valid_char_pattern.findall(text))
+def calculate_valid_chinese_text(text: str | np.ndarray) -> float:
+    """
+    计算文本中中文字符（含中文标点和数字字母）的比例。
+
+    :param text: 待分析的文本或 text_to_codepoints 得到的码位数组。
+    :return: 中文字符占总字符数的比例。
+    """
+    counts = char_class_counts(text)
+    return counts["chinese"] / counts["total"]
 
-    # 计算文本中有效字符的比例
-    return valid_char_count / len(text)
+
+def calculate_valid_text(text: str | np.ndarray) -> float:
+    """
+    计算文本中有效字符（中文、英文、数字及常见标点）的比例。
+
+    :param text: 待分析的文本或 text_to_codepoints 得到的码位数组。
+    :return: 有效字符占总字符数的比例。
+    """
+    counts = char_class_counts(text)
+    return counts["valid"] / counts["total"]
 
 
 def is_valid_chinese_text(text: str, threshold: float = 0.8) -> bool:
@@ -338,9 +411,8 @@ def encode_bytes_to_base64(data: bytes) -> str:
     :param data: 原始字节串。
     :return: Base64 编码后的 UTF-8 文本。
     """
-    length_prefix = struct.pack(">I", len(data))  # 4 字节长度头
-    payload = length_prefix + data
-    return base64.b64encode(payload).decode("utf-8")
+    # 长度头与数据分段编码，不再拼接出带头部的副本
+    return frame_to_base64(data, length_headers=1, crc=False)
 
 
 def decode_bytes_from_base64(text: str) -> bytes:
@@ -364,36 +436,32 @@ def decode_bytes_from_base64(text: str) -> bytes:
     return raw[4 : 4 + true_len]
 
 
-def compress_text_to_bytes(text: str) -> bytes:
+def compress_text_to_bytes(
+    text: str, algorithm: str = "zlib", level: int | None = None
+) -> bytes:
     """
     压缩文本并返回字节流，前 4 字节存储真实压缩长度。
 
     :param text: 待压缩的文本。
-    :return: 带 4 字节长度头的压缩字节流。
+    :param algorithm: 压缩算法，COMPRESSION_BACKENDS 中的名称，或 'auto' 由 choose_compression 按采样结果选择。
+    :param level: 压缩级别，默认为各算法的默认级别。
+    :return: 带 4 字节长度头的压缩字节流，所用算法记录在帧中，解压时自动识别。
     """
-    compressed_data = zlib.compress(text.encode("utf-8"))
-    length_prefix = struct.pack(">I", len(compressed_data))  # 4 字节长度头
-    return length_prefix + compressed_data
+    if algorithm == "auto":
+        algorithm, level = choose_compression(text)
+    # 分块编码并流式压缩，不生成整段 UTF-8 副本；zlib 时输出与 zlib.compress 相同
+    return bytes(compress_to_frame(iter_text_bytes(text), level, algorithm))
 
 
 def decompress_text_from_bytes(compressed_data: bytes) -> str:
     """
-    从字节流中解压缩文本，利用前 4 字节长度头截取真实压缩数据。
+    从字节流中解压缩文本，利用前 4 字节长度头截取真实压缩数据，并按帧中记录的算法解压。
 
     :param compressed_data: 带 4 字节长度头的压缩字节流。
     :return: 解压缩后的原始文本。
-    :raises ValueError: 数据不足或不完整时抛出。
+    :raises ValueError: 数据不足、不完整或压缩算法未知时抛出。
     """
-    if len(compressed_data) < 4:
-        raise ValueError("压缩数据过短，缺少长度头")
-
-    true_len = struct.unpack(">I", compressed_data[:4])[0]
-    if len(compressed_data) < 4 + true_len:
-        raise ValueError("数据不完整或损坏，无法解压")
-
-    compressed_part = compressed_data[4 : 4 + true_len]
-
-    return zlib.decompress(compressed_part).decode("utf-8")
+    return bytes(decompress_frame(compressed_data)).decode("utf-8")
 
 
 def rs_encode(data: bytes, nsym: int) -> bytes:
@@ -540,6 +608,425 @@ def pad_to_align(data: bytes, align: int) -> bytes:
     return data + padding
 
 
+# 分帧使用的 4 字节 big-endian 无符号整数（长度头与 CRC32）
+_FRAME_FIELD = struct.Struct(">I")
+# pad_bytes / pad_to_align 使用的补位字节
+_PAD_PATTERN = b"\xec\x11"
+
+
+def iter_buffer_chunks(
+    data: bytes | bytearray | memoryview, chunk_size: int = 1 << 20
+) -> Iterator[memoryview]:
+    """
+    把字节缓冲按 chunk_size 切为 memoryview 切片，不复制数据。
+
+    :param data: 字节缓冲。
+    :param chunk_size: 每个切片的字节数。
+    :return: memoryview 切片的生成器。
+    """
+    view = memoryview(data).cast("B")
+    for start in range(0, len(view), chunk_size):
+        yield view[start : start + chunk_size]
+
+
+def iter_text_bytes(text: str, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+    """
+    把文本分段编码为 UTF-8，避免一次生成整段文本的字节副本。
+
+    :param text: 原始文本。
+    :param chunk_size: 每段的字符数。
+    :return: UTF-8 字节段的生成器，拼接后等于 text.encode('utf-8')。
+    """
+    for start in range(0, len(text), chunk_size):
+        yield text[start : start + chunk_size].encode("utf-8")
+
+
+def crc32_chunks(chunks: Iterable[bytes | bytearray | memoryview], crc: int = 0) -> int:
+    """
+    增量计算 CRC32。
+
+    :param chunks: 字节段的可迭代对象。
+    :param crc: 初始值，可传入上一次的结果继续计算。
+    :return: 与对拼接结果调用 zlib.crc32 相同的校验和。
+    """
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _frame_header(view: memoryview, length_headers: int, crc: bool) -> bytes:
+    """
+    计算数据前的帧头：由外到内依次为 length_headers 个长度头（各自记录其后全部字节数）与可选的 CRC32。
+    """
+    header = _FRAME_FIELD.pack(crc32_chunks(iter_buffer_chunks(view))) if crc else b""
+    for _ in range(length_headers):
+        header = _FRAME_FIELD.pack(len(header) + len(view)) + header
+    return header
+
+
+def frame_bytes(
+    data: bytes | bytearray | memoryview,
+    length_headers: int = 1,
+    crc: bool = True,
+    target_len: int | None = None,
+    align: int = 1,
+) -> bytearray:
+    """
+    一次分配完成分帧：[长度头 × length_headers][CRC32][数据][补位]。
+
+    CRC32 在原数据上增量计算，帧头写入预留的前缀空间，数据只复制一次，
+    等价于依次调用 crc_encode_bytes、add_length_header_to_bytes（或 pad_bytes）与 pad_to_align，
+    但不产生中间副本。
+
+    :param data: 原始数据。
+    :param length_headers: 长度头的层数。
+    :param crc: 是否在数据前加入 CRC32。
+    :param target_len: 帧的目标总长度，不足时用 0xEC, 0x11 循环补齐。
+    :param align: 补齐到该字节数的倍数。
+    :return: 分帧后的字节缓冲。
+    :raises ValueError: target_len 小于帧头与数据的总长度时抛出。
+    """
+    view = memoryview(data).cast("B")
+    header = _frame_header(view, length_headers, crc)
+    size = len(header) + len(view)
+
+    total = size if target_len is None else target_len
+    if total < size:
+        raise ValueError(f"target_len 不能小于帧头与数据的总长度 {size}")
+    if align > 1:
+        total += -total % align
+
+    frame = bytearray(total)
+    # 通过 memoryview 写入，bytearray 的切片赋值会先复制一份临时数据
+    target = memoryview(frame)
+    target[: len(header)] = header
+    target[len(header) : size] = view
+    pad_len = total - size
+    target[size:] = (_PAD_PATTERN * (pad_len // 2 + 1))[:pad_len]
+    target.release()
+    return frame
+
+
+def unframe_bytes(
+    frame: bytes | bytearray | memoryview, length_headers: int = 1, crc: bool = True
+) -> memoryview:
+    """
+    frame_bytes 的逆操作：逐层解析长度头并校验 CRC32，返回数据部分的 memoryview，不复制数据。
+    长度头之后多余的字节（如补位）会被忽略。
+
+    :param frame: 分帧后的字节缓冲。
+    :param length_headers: 长度头的层数。
+    :param crc: 数据前是否有 CRC32。
+    :return: 指向原始数据的 memoryview。
+    :raises ValueError: 数据不完整或 CRC32 校验失败时抛出。
+    """
+    view = memoryview(frame).cast("B")
+    for _ in range(length_headers):
+        if len(view) < 4:
+            raise ValueError("数据不足 4 字节，缺少长度头")
+        (true_len,) = _FRAME_FIELD.unpack_from(view)
+        if len(view) < 4 + true_len:
+            raise ValueError("数据不完整，无法按长度头读取")
+        view = view[4 : 4 + true_len]
+
+    if crc:
+        if len(view) < 4:
+            raise ValueError("数据长度不足，没有包含 CRC32。")
+        (crc_received,) = _FRAME_FIELD.unpack_from(view)
+        view = view[4:]
+        if crc32_chunks(iter_buffer_chunks(view)) != crc_received:
+            raise ValueError("CRC32 校验失败。")
+    return view
+
+
+class CompressionBackend:
+    """
+    压缩后端：提供流式压缩器与解压函数，并以帧中紧跟长度头的一个标记字节标识。
+
+    zlib 的标记为空：zlib 数据流的首字节总是 0x78，旧版本生成的帧因此无需修改即可识别，
+    其他后端的标记字节不能与之冲突。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        tag: bytes,
+        make_compressor: Callable[[int | None], Any],
+        decompress: Callable[[memoryview], bytes],
+        auto_levels: tuple[int | None, ...] = (None,),
+    ):
+        """
+        :param name: 算法名称。
+        :param tag: 写在压缩数据前的标记字节，zlib 为 b''。
+        :param make_compressor: 由压缩级别创建带 compress / flush 方法的流式压缩器，级别为 None 时使用默认值。
+        :param decompress: 解压整段数据的函数。
+        :param auto_levels: choose_compression 自动选择时尝试的级别。
+        """
+        self.name = name
+        self.tag = tag
+        self.make_compressor = make_compressor
+        self.decompress = decompress
+        self.auto_levels = auto_levels
+
+
+class _LZ4FrameCompressor:
+    """把 lz4.frame 的 begin / compress / flush 接口适配为 compress / flush。"""
+
+    def __init__(self, level: int | None):
+        import lz4.frame
+
+        self._compressor = lz4.frame.LZ4FrameCompressor(compression_level=level or 0)
+        self._header = self._compressor.begin()
+
+    def compress(self, data: bytes | memoryview) -> bytes:
+        header, self._header = self._header, b""
+        return header + self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._header + self._compressor.flush()
+
+
+def _make_zstd_compressor(level: int | None):
+    import zstandard
+
+    return zstandard.ZstdCompressor(level=level or 3).compressobj()
+
+
+def _zstd_decompress(data: memoryview) -> bytes:
+    import zstandard
+
+    # 流式压缩的帧不带原始长度，需要用 decompressobj 解压
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+def _lz4_decompress(data: memoryview) -> bytes:
+    import lz4.frame
+
+    return lz4.frame.decompress(data)
+
+
+# 可用的压缩后端；zstd 与 lz4 只在安装了对应的库时注册
+COMPRESSION_BACKENDS: dict[str, CompressionBackend] = {}
+
+
+def register_compression_backend(backend: CompressionBackend) -> None:
+    """
+    注册压缩后端，之后即可在 compress_to_frame 等函数中按名称使用，解压时按标记字节自动识别。
+
+    :param backend: 压缩后端。
+    :raises ValueError: 标记字节非法或与已注册的后端冲突时抛出。
+    """
+    if backend.tag and (len(backend.tag) != 1 or backend.tag == b"\x78"):
+        raise ValueError(
+            f"压缩后端的标记必须是单个字节且不能为 0x78: {backend.tag!r}"
+        )
+    for other in COMPRESSION_BACKENDS.values():
+        if other.tag == backend.tag and other.name != backend.name:
+            raise ValueError(f"标记 {backend.tag!r} 已被压缩后端 {other.name} 使用")
+    COMPRESSION_BACKENDS[backend.name] = backend
+
+
+register_compression_backend(
+    CompressionBackend(
+        "zlib",
+        b"",
+        lambda level: zlib.compressobj(-1 if level is None else level),
+        zlib.decompress,
+        auto_levels=(1, 6, 9),
+    )
+)
+register_compression_backend(
+    CompressionBackend(
+        "bz2",
+        b"\x01",
+        lambda level: bz2.BZ2Compressor(9 if level is None else level),
+        bz2.decompress,
+        auto_levels=(9,),
+    )
+)
+register_compression_backend(
+    CompressionBackend(
+        "lzma",
+        b"\x02",
+        lambda level: lzma.LZMACompressor(preset=level),
+        lzma.decompress,
+        auto_levels=(1, 6),
+    )
+)
+if importlib.util.find_spec("zstandard") is not None:
+    register_compression_backend(
+        CompressionBackend(
+            "zstd",
+            b"\x03",
+            _make_zstd_compressor,
+            _zstd_decompress,
+            auto_levels=(3, 19),
+        )
+    )
+if importlib.util.find_spec("lz4") is not None:
+    register_compression_backend(
+        CompressionBackend(
+            "lz4", b"\x04", _LZ4FrameCompressor, _lz4_decompress, auto_levels=(0,)
+        )
+    )
+
+
+def _get_compression_backend(algorithm: str) -> CompressionBackend:
+    backend = COMPRESSION_BACKENDS.get(algorithm)
+    if backend is None:
+        raise ValueError(
+            f"未知或未安装的压缩算法: {algorithm}，可用: {list(COMPRESSION_BACKENDS)}"
+        )
+    return backend
+
+
+def compress_to_frame(
+    chunks: Iterable[bytes | bytearray | memoryview],
+    level: int | None = None,
+    algorithm: str = "zlib",
+) -> bytearray:
+    """
+    流式压缩字节段，输出写入预留了 4 字节长度头的缓冲。
+    格式为 [压缩长度][标记字节][压缩数据]，zlib 没有标记字节，与 compress_text_to_bytes 的旧格式相同。
+
+    :param chunks: 字节段的可迭代对象，如 iter_text_bytes 的结果。
+    :param level: 压缩级别，默认为各算法的默认级别。
+    :param algorithm: 压缩算法，COMPRESSION_BACKENDS 中的名称。
+    :return: 带长度头的压缩数据。
+    :raises ValueError: 压缩算法未知时抛出。
+    """
+    backend = _get_compression_backend(algorithm)
+    frame = bytearray(_FRAME_FIELD.size)  # 预留长度头
+    frame += backend.tag
+    compressor = backend.make_compressor(level)
+    for chunk in chunks:
+        frame += compressor.compress(chunk)
+    frame += compressor.flush()
+    _FRAME_FIELD.pack_into(frame, 0, len(frame) - _FRAME_FIELD.size)
+    return frame
+
+
+def decompress_frame(frame: bytes | bytearray | memoryview) -> bytes:
+    """
+    解压 compress_to_frame 生成的帧，根据标记字节自动选择压缩算法。
+
+    :param frame: 带长度头的压缩数据。
+    :return: 解压后的字节串。
+    :raises ValueError: 数据不足、不完整或压缩算法未知时抛出。
+    """
+    if len(frame) < 4:
+        raise ValueError("压缩数据过短，缺少长度头")
+    view = memoryview(frame).cast("B")
+    (true_len,) = _FRAME_FIELD.unpack_from(view)
+    if len(view) < 4 + true_len or true_len == 0:
+        raise ValueError("数据不完整或损坏，无法解压")
+    payload = view[4 : 4 + true_len]
+
+    if payload[0] == 0x78:  # zlib 数据流，不带标记字节
+        return zlib.decompress(payload)
+    tag = bytes(payload[:1])
+    for backend in COMPRESSION_BACKENDS.values():
+        if backend.tag == tag:
+            return backend.decompress(payload[1:])
+    raise ValueError(f"未知的压缩算法标记: {tag!r}")
+
+
+def _sample_payload(
+    data: str | bytes | bytearray | memoryview, sample_size: int, windows: int = 4
+) -> tuple[bytes, float]:
+    """
+    从文本或字节串中均匀截取若干窗口作为压缩采样。
+
+    :return: (采样的字节串, 全文与采样的大小之比)。
+    """
+    total = len(data)
+    if total <= sample_size:
+        sample = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        return sample, 1.0
+
+    window = sample_size // windows
+    parts = []
+    for index in range(windows):
+        start = (total - window) * index // max(windows - 1, 1)
+        part = data[start : start + window]
+        parts.append(part.encode("utf-8") if isinstance(part, str) else bytes(part))
+    return b"".join(parts), total / (window * windows)
+
+
+def choose_compression(
+    data: str | bytes | bytearray | memoryview,
+    time_budget: float = 1.0,
+    sample_size: int = 1 << 18,
+    candidates: Iterable[tuple[str, int | None]] | None = None,
+) -> tuple[str, int | None]:
+    """
+    对数据采样试压缩，在预计耗时不超过 time_budget 的组合中选择压缩率最高的算法与级别。
+
+    图像编码的尺寸与编解码耗时都随压缩后的大小增长，因此在时间允许时优先选择压缩率高的算法。
+
+    :param data: 待压缩的文本或字节串。
+    :param time_budget: 压缩全部数据的预计耗时上限（秒）。
+    :param sample_size: 采样的大小（文本为字符数，字节串为字节数）。
+    :param candidates: 候选的 (算法, 级别)，默认为各后端的 auto_levels。
+    :return: (算法, 级别)；没有组合满足时间预算时返回预计最快的组合。
+    """
+    sample, scale = _sample_payload(data, sample_size)
+    if candidates is None:
+        candidates = [
+            (name, level)
+            for name, backend in COMPRESSION_BACKENDS.items()
+            for level in backend.auto_levels
+        ]
+
+    results = []
+    for algorithm, level in candidates:
+        start = time.perf_counter()
+        size = len(compress_to_frame([sample], level, algorithm))
+        elapsed = (time.perf_counter() - start) * scale
+        results.append((size, elapsed, algorithm, level))
+
+    within_budget = [result for result in results if result[1] <= time_budget]
+    if within_budget:
+        _, _, algorithm, level = min(within_budget, key=lambda result: result[:2])
+    else:
+        _, _, algorithm, level = min(results, key=lambda result: result[1])
+    return algorithm, level
+
+
+def frame_to_base64(
+    data: bytes | bytearray | memoryview,
+    length_headers: int = 1,
+    crc: bool = False,
+    chunk_size: int = 3 << 18,
+) -> str:
+    """
+    分帧并编码为 Base64 文本：帧头与数据分段编码后写入预分配的输出缓冲，数据不会被复制成带头部的副本。
+
+    :param data: 原始数据。
+    :param length_headers: 长度头的层数。
+    :param crc: 是否在数据前加入 CRC32。
+    :param chunk_size: 每段编码的字节数，会向下取整为 3 的倍数。
+    :return: Base64 文本，与对 frame_bytes 的结果调用 base64.b64encode 相同。
+    """
+    view = memoryview(data).cast("B")
+    header = _frame_header(view, length_headers, crc)
+    # 帧头补上数据开头的几个字节凑成 3 的倍数，之后的数据段都从 3 字节边界开始
+    lead = min(-len(header) % 3, len(view))
+    chunk_size = max(chunk_size - chunk_size % 3, 3)
+    segments = [header + bytes(view[:lead])]
+    segments += iter_buffer_chunks(view[lead:], chunk_size)
+
+    output = bytearray(-(-(len(header) + len(view)) // 3) * 4)
+    target = memoryview(output)
+    position = 0
+    for segment in segments:
+        encoded = base64.b64encode(segment)
+        target[position : position + len(encoded)] = encoded
+        position += len(encoded)
+    target.release()
+    return output.decode("ascii")
+
+
 def compress_to_base64(text: str) -> str:
     """
     压缩文本并转换为Base64编码, 长度为4的倍数。
@@ -573,47 +1060,167 @@ def decode_from_base64(base64_text: str) -> str:
     return original_text
 
 
+# 字节顺序标记与对应的编码，UTF-32 须在 UTF-16 之前检查
+_BOM_ENCODINGS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _read_samples(file_path: Path, size: int, sample_size: int) -> list[bytes]:
+    """
+    读取文件开头 sample_size 字节与中间三个 sample_size // 4 字节的窗口；小文件直接整个读取。
+
+    :return: 样本列表，第一个为文件开头。
+    """
+    with open(file_path, "rb") as f:
+        if size <= sample_size * 2:
+            return [f.read()]
+        samples = [f.read(sample_size)]
+        window_size = sample_size // 4
+        for index in range(1, 4):
+            f.seek(size * index // 4 & ~3)  # 对齐到 4 字节，便于 UTF-16/32
+            samples.append(f.read(window_size))
+    return samples
+
+
+def _decode_sample(sample: bytes, encoding: str, truncated: bool) -> str:
+    """
+    解码一个样本。截取的样本可能从多字节字符中间开始、在字符中间结束：
+    UTF-8 时跳过开头的续字节，结尾不完整的字符交给增量解码器忽略。
+    """
+    if truncated and encoding == "utf-8":
+        skip = 0
+        while skip < min(3, len(sample)) and sample[skip] & 0xC0 == 0x80:
+            skip += 1
+        sample = sample[skip:]
+    errors = "strict" if encoding == "utf-8" else "replace"
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    return decoder.decode(sample, final=not truncated)
+
+
+@lru_cache(maxsize=4096)
+def _detect_encoding_cached(
+    file_path: str, size: int, mtime_ns: int, sample_size: int
+) -> str:
+    """按 (路径, 大小, 修改时间) 缓存的编码检测，文件变化后缓存键随之改变。"""
+    samples = _read_samples(Path(file_path), size, sample_size)
+    head = samples[0]
+
+    for bom, encoding in _BOM_ENCODINGS:
+        if head.startswith(bom):
+            return encoding
+
+    # UTF-8 的结构约束很强，其他编码的中文文本几乎不可能通过严格解码
+    complete = len(samples) == 1
+    try:
+        texts = [
+            _decode_sample(sample, "utf-8", truncated=index > 0 or not complete)
+            for index, sample in enumerate(samples)
+        ]
+        if not head or is_valid_text("".join(texts)):
+            return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    # 其他编码只用样本检测与校验，不解码整个文件
+    results = charset_normalizer.from_bytes(head)
+    encoding_list = [results.best().encoding] if results else []
+    encoding_list += ["gb18030", "big5", "utf-16", "latin-1"]
+    for encoding in encoding_list:
+        try:
+            text = "".join(
+                _decode_sample(sample, encoding, truncated=index > 0 or not complete)
+                for index, sample in enumerate(samples)
+            )
+        except (LookupError, UnicodeDecodeError):
+            continue
+        if text and is_valid_text(text):
+            return encoding
+
+    raise ValueError("无法使用检测到的编码解码文件")
+
+
+def detect_encoding(file_path: str | Path, sample_size: int = 1 << 16) -> str:
+    """
+    检测文本文件的编码。
+
+    只读取文件开头与中间几个窗口作为样本：先检查 BOM，再尝试严格的 UTF-8 解码，
+    最后用 charset-normalizer 与常见中文编码依次解码样本并校验。
+    结果按 (路径, 大小, 修改时间) 缓存，文件未变化时不再重复检测。
+
+    :param file_path: 文件路径。
+    :param sample_size: 开头样本的字节数，中间窗口为其四分之一。
+    :return: 可用于 bytes.decode 的编码名。
+    :raises ValueError: 如果所有候选编码都无法得到有效文本，抛出异常
+    """
+    file_path = Path(file_path)
+    stat = file_path.stat()
+    return _detect_encoding_cached(
+        str(file_path.resolve()), stat.st_size, stat.st_mtime_ns, sample_size
+    )
+
+
 def safe_open_txt(file_path: str | Path) -> str:
     """
-    尝试使用多种编码打开文本文件，并返回解码后的文本。
+    自动检测编码打开文本文件，并返回解码后的文本。换行符统一为 "\n"。
 
     :param file_path: 文件路径，可以是字符串或 Path 对象
     :return: 解码后的文本内容
     :raises ValueError: 如果无法用任何编码解码文件，抛出异常
     """
-    # 读取整个文件以进行编码检测
     file_path = Path(file_path)
-    raw = file_path.read_bytes()
+    encoding = detect_encoding(file_path)
+    # 只读取一次文件，在内存中解码；换行符的转换与文本模式读取（read_text）相同
+    text = file_path.read_bytes().decode(encoding, errors="replace")
+    return text.replace("\r\n", "\n").replace("\r", "\n")
 
-    # 使用 charset-normalizer 检测文件的最佳编码
-    results = charset_normalizer.from_bytes(raw)
-    encoding_list = [results.best().encoding] if results else []
 
-    # 添加其他常见编码供尝试：GB18030, Big5, UTF-8, UTF-16 和 Latin-1
-    encoding_list += ["gb18030", "big5", "utf-8", "utf-16", "latin-1"]
+def iter_text_chunks(
+    file_path: str | Path, chunk_size: int = 1 << 20, encoding: str | None = None
+) -> Iterator[str]:
+    """
+    自动检测编码，逐块读取并解码文本文件，内存占用与文件大小无关。换行符统一为 "\n"。
 
-    book_text = None
-    for encoding in encoding_list:
-        try:
-            # 尝试使用当前编码解码文本, 并验证解码后的文本是否合理
-            decoded_text = file_path.read_text(encoding, errors="replace")
+    :param file_path: 文件路径。
+    :param chunk_size: 每块的字符数。
+    :param encoding: 文件编码，默认由 detect_encoding 检测。
+    :return: 解码后文本块的生成器，拼接后与 safe_open_txt 的结果相同。
+    """
+    encoding = encoding or detect_encoding(file_path)
+    # 使用默认的通用换行模式，与 safe_open_txt 一致，写回文本模式时不会变成 "\r\r\n"
+    with open(file_path, encoding=encoding, errors="replace") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
 
-            if is_valid_text(decoded_text):
-                book_text = decoded_text
-                break
-        except (UnicodeDecodeError, TypeError):
-            continue  # 如果解码失败，尝试下一个编码
 
-    if book_text is None:
-        raise ValueError("无法使用检测到的编码解码文件")
+def write_text_chunks(
+    chunks: Iterable[str], target_file: str | Path, buffer_size: int = 1 << 20
+) -> int:
+    """
+    把文本块依次写入 UTF-8 文件，边生成边写入。
 
-    return book_text
+    :param chunks: 文本块的可迭代对象。
+    :param target_file: 目标文件路径。
+    :param buffer_size: 写入缓冲区的字节数。
+    :return: 写入的字符数。
+    """
+    total = 0
+    with open(target_file, "w", encoding="utf-8", buffering=buffer_size) as f:
+        for chunk in chunks:
+            f.write(chunk)
+            total += len(chunk)
+    return total
 
 
 def combine_txt_files(source_dir: str | Path, target_file: str | Path):
     """
     将指定文件夹内的所有txt文件按文件名中的数字排序，合并为一个新的txt文件。
     合并时每个文件的内容前面加入该文件的名字，合并文件名为文件夹名。
+    各文件自动检测编码并逐块读取、写入，不会整个载入内存。
 
     :param source_dir: 包含txt文件的文件夹路径。
     :param target_file: 合并后的txt文件路径。
@@ -626,6 +1233,13 @@ def combine_txt_files(source_dir: str | Path, target_file: str | Path):
         matches = re.findall(r"\d+", file_name.name)
         return int("".join(matches)) if matches else int("inf")
 
+    def iter_combined() -> Iterator[str]:
+        for txt_file in tqdm(text_files):
+            # 写入文件名和内容
+            yield f"== {txt_file.name} ==\n\n"
+            yield from iter_text_chunks(txt_file)
+            yield "\n\n"
+
     # 转换路径为 Path 对象
     source_dir = Path(source_dir)
 
@@ -642,13 +1256,7 @@ def combine_txt_files(source_dir: str | Path, target_file: str | Path):
         raise ValueError(f"No txt or md files found in {source_dir}.")
 
     # 合并文件
-    with open(target_file, "w", encoding="utf-8") as outfile:
-        for txt_file in tqdm(text_files):
-            with open(txt_file, encoding="utf-8") as infile:
-                content = infile.read()
-                # 写入文件名和内容
-                outfile.write(f"== {txt_file.name} ==\n\n")
-                outfile.write(content + "\n\n")
+    write_text_chunks(iter_combined(), target_file)
 
 
 def character_ratio(target_str: str) -> dict[str, float]:
@@ -659,82 +1267,257 @@ def character_ratio(target_str: str) -> dict[str, float]:
     :return: 各个字符及其出现比率的字典
     """
     total_length = len(target_str)
-    frequency = {}
+    return {
+        char: count / total_length for char, count in char_counts(target_str).items()
+    }
 
-    for char in target_str:
-        frequency[char] = frequency.get(char, 0) + 1
 
-    # 将频率转换为比率
-    ratio = {char: count / total_length for char, count in frequency.items()}
+def _trim_common(
+    seq1: Sequence, seq2: Sequence, lo1: int, hi1: int, lo2: int, hi2: int
+) -> tuple[int, int, int, int]:
+    """
+    去掉区间 seq1[lo1:hi1] 与 seq2[lo2:hi2] 的公共前缀与公共后缀。
+
+    :return: 去掉后的 (lo1, hi1, lo2, hi2)，公共前缀长度为返回的 lo1 减去传入的 lo1。
+    """
+    while lo1 < hi1 and lo2 < hi2 and seq1[lo1] == seq2[lo2]:
+        lo1 += 1
+        lo2 += 1
+    while lo1 < hi1 and lo2 < hi2 and seq1[hi1 - 1] == seq2[hi2 - 1]:
+        hi1 -= 1
+        hi2 -= 1
+    return lo1, hi1, lo2, hi2
+
+
+def _middle_snake(
+    seq1: Sequence, seq2: Sequence, lo1: int, hi1: int, lo2: int, hi2: int, max_d: int
+) -> tuple[int, int, int, int, int] | None:
+    """
+    Myers 线性空间算法中的中间蛇：同时从两端搜索最远到达的 D-path，在相遇处返回对角线段。
+
+    :param max_d: 单向搜索的最大编辑步数，超过时放弃。
+    :return: (x, y, u, v, D)：中间蛇的绝对坐标，即 seq1[x:u] == seq2[y:v]，D 为整个区间的编辑距离；
+        超过 max_d 时为 None。
+    """
+    n, m = hi1 - lo1, hi2 - lo2
+    delta = n - m
+    odd = delta & 1
+    limit = min((n + m + 1) // 2, max_d)
+    offset = limit + 1
+    # forward[k] 为对角线 k = x - y 上正向最远到达的 x，backward[k] 为反向最远到达（最小）的 x
+    # 不可到达的对角线分别记为 -1 与 n + 2；backward 以 c = k - delta 为下标
+    forward = [-1] * (2 * offset + 1)
+    backward = [n + 2] * (2 * offset + 1)
+    forward[offset + 1] = 0
+    backward[offset + 1] = n + 1
+
+    for d in range(limit + 1):
+        for k in range(-d, d + 1, 2):
+            down = forward[offset + k + 1]
+            right = forward[offset + k - 1] + 1 if k > -d else -1
+            if down >= 0 and down - k > m:
+                down = -1
+            if right > n or forward[offset + k - 1] < 0:
+                right = -1
+            x = max(down, right)
+            if x < 0:
+                forward[offset + k] = -1
+                continue
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and seq1[lo1 + x] == seq2[lo2 + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            c = k - delta
+            if odd and -(d - 1) <= c <= d - 1 and x >= backward[offset + c]:
+                return lo1 + x0, lo2 + y0, lo1 + x, lo2 + y, 2 * d - 1
+
+        for c in range(-d, d + 1, 2):
+            k = c + delta
+            up = backward[offset + c - 1] if c > -d else n + 2
+            left = backward[offset + c + 1] - 1
+            if up <= n and up - k < 0:
+                up = n + 2
+            if left < 0 or left > n:
+                left = n + 2
+            x = min(up, left)
+            if x > n:
+                backward[offset + c] = n + 2
+                continue
+            y = x - k
+            x0, y0 = x, y
+            while x > 0 and y > 0 and seq1[lo1 + x - 1] == seq2[lo2 + y - 1]:
+                x -= 1
+                y -= 1
+            backward[offset + c] = x
+            if not odd and -d <= k <= d and forward[offset + k] >= x:
+                return lo1 + x, lo2 + y, lo1 + x0, lo2 + y0, 2 * d
+    return None
+
+
+def _bit_lcs_row(seq1: Sequence, seq2: Sequence) -> list[int]:
+    """
+    位并行（Hyyrö）计算 seq1 与 seq2 各前缀的 LCS 长度，每处理 seq1 的一个元素只需几次大整数运算。
+
+    :return: 长度为 len(seq2) + 1 的列表，第 j 项为 LCS(seq1, seq2[:j]) 的长度。
+    """
+    m = len(seq2)
+    masks: dict = {}
+    for j, item in enumerate(seq2):
+        masks[item] = masks.get(item, 0) | (1 << j)
+
+    full = (1 << m) - 1
+    row_bits = full
+    for item in seq1:
+        mask = masks.get(item)
+        if mask:
+            matched = row_bits & mask
+            row_bits = ((row_bits + matched) | (row_bits - matched)) & full
+
+    # row_bits 中为 0 的位对应 LCS 增加的位置
+    bits = format(row_bits, f"0{m}b")[::-1] if m else ""
+    return [0, *accumulate(map("0".__eq__, bits))]
+
+
+def _hirschberg_split(
+    seq1: Sequence, seq2: Sequence, lo1: int, hi1: int, lo2: int, hi2: int
+) -> tuple[int, int, int, int]:
+    """
+    Hirschberg 分割：把较短的一方对半分开，用正反两行 LCS 长度找出另一方的最优分割点。
+
+    :return: (mid1, mid2, 前半 LCS 长度, 后半 LCS 长度)，分割点为绝对坐标。
+    """
+    if hi1 - lo1 <= hi2 - lo2:
+        mid1 = (lo1 + hi1) // 2
+        part2 = seq2[lo2:hi2]
+        head = _bit_lcs_row(seq1[lo1:mid1], part2)
+        tail = _bit_lcs_row(seq1[mid1:hi1][::-1], part2[::-1])
+        totals = list(map(add, head, reversed(tail)))
+        best = totals.index(max(totals))
+        return mid1, lo2 + best, head[best], tail[hi2 - lo2 - best]
+
+    mid2 = (lo2 + hi2) // 2
+    part1 = seq1[lo1:hi1]
+    head = _bit_lcs_row(seq2[lo2:mid2], part1)
+    tail = _bit_lcs_row(seq2[mid2:hi2][::-1], part1[::-1])
+    totals = list(map(add, head, reversed(tail)))
+    best = totals.index(max(totals))
+    return lo1 + best, mid2, head[best], tail[hi1 - lo1 - best]
+
+
+def _single_match(
+    seq1: Sequence, seq2: Sequence, lo1: int, hi1: int, lo2: int, hi2: int
+) -> list[tuple[int, int, int]]:
+    """其中一方只有一个元素时，在另一方中找到它的第一次出现，返回至多一个匹配 (i, j, 1)。"""
+    if hi1 - lo1 == 1:
+        item = seq1[lo1]
+        for j in range(lo2, hi2):
+            if seq2[j] == item:
+                return [(lo1, j, 1)]
+        return []
+    item = seq2[lo2]
+    for i in range(lo1, hi1):
+        if seq1[i] == item:
+            return [(i, lo2, 1)]
+    return []
+
+
+def get_matching_blocks(
+    seq1: Sequence, seq2: Sequence, max_d: int = 256
+) -> list[tuple[int, int, int]]:
+    """
+    求两个序列的最长公共子序列，返回其中连续相同的块。内存占用与序列长度成线性关系。
+
+    先去掉公共前缀与后缀；差异较少时用 Myers O(ND) 的中间蛇分治，
+    编辑步数超过 max_d 时改用位并行 LCS 的 Hirschberg 分治，直到其中一方只剩一个元素。
+
+    :param seq1: 第一个序列，支持字符串、列表、元组等可切片序列，元素需可哈希。
+    :param seq2: 第二个序列。
+    :param max_d: Myers 搜索的最大编辑步数。
+    :return: (seq1 起点, seq2 起点, 长度) 的列表，按位置排序，相邻的块已合并。
+    """
+    blocks: list[tuple[int, int, int]] = []
+    # 栈中的最后一项为区间的编辑距离，未知时为 None
+    stack: list[tuple[int, int, int, int, int | None]] = [
+        (0, len(seq1), 0, len(seq2), None)
+    ]
+
+    while stack:
+        lo1, hi1, lo2, hi2, distance = stack.pop()
+        start1, start2 = lo1, lo2
+        end1, end2 = hi1, hi2
+        lo1, hi1, lo2, hi2 = _trim_common(seq1, seq2, lo1, hi1, lo2, hi2)
+        if lo1 > start1:
+            blocks.append((start1, start2, lo1 - start1))
+        if hi1 < end1:
+            blocks.append((hi1, hi2, end1 - hi1))
+
+        if lo1 == hi1 or lo2 == hi2:
+            continue
+        if hi1 - lo1 == 1 or hi2 - lo2 == 1:
+            blocks.extend(_single_match(seq1, seq2, lo1, hi1, lo2, hi2))
+            continue
+
+        # Myers 的耗时约为 D²，位并行 Hirschberg 约为 短边 × log(短边)，按此估算选择
+        short = min(hi1 - lo1, hi2 - lo2)
+        budget = min(max_d, math.isqrt(4 * short * short.bit_length()))
+        if distance is None or distance <= budget:
+            snake = _middle_snake(seq1, seq2, lo1, hi1, lo2, hi2, budget)
+            if snake is not None:
+                x, y, u, v, distance = snake
+                if u > x:
+                    blocks.append((x, y, u - x))
+                stack.append((lo1, x, lo2, y, (distance + 1) // 2))
+                stack.append((u, hi1, v, hi2, distance // 2))
+                continue
+
+        # 差异过多时用 Hirschberg 分割，分割后两半的编辑距离可由 LCS 长度算出
+        mid1, mid2, head_lcs, tail_lcs = _hirschberg_split(
+            seq1, seq2, lo1, hi1, lo2, hi2
+        )
+        head_d = (mid1 - lo1) + (mid2 - lo2) - 2 * head_lcs
+        tail_d = (hi1 - mid1) + (hi2 - mid2) - 2 * tail_lcs
+        stack.append((lo1, mid1, lo2, mid2, head_d))
+        stack.append((mid1, hi1, mid2, hi2, tail_d))
 
-    return ratio
+    blocks.sort()
+    merged: list[tuple[int, int, int]] = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        else:
+            merged.append((i, j, size))
+    return merged
 
 
 def get_lcs(str1: str, str2: str) -> list[str]:
     """
     找出两个字符串的最长公共子序列，并按连续段落分组返回。
-    空字符串 "" 表示不匹配的间隔。
+    空字符串 "" 表示开头或结尾不匹配的间隔。
+    各段由 get_matching_blocks 求出，内存与字符串长度成线性关系。
 
     :param str1: 第一个字符串。
     :param str2: 第二个字符串。
     :return: 最长公共子序列的分段列表。
     """
-
-    def update_common(common_parts: list, current_part):
-        if current_part:
-            common_parts.append("".join(reversed(current_part)))
-        return common_parts, []  # 重置 current_part 为一个空列表
-
-    # 获取两个字符串的长度
-    len1, len2 = len(str1), len(str2)
-
-    # 创建一个二维数组 dp，用于存储最长公共子序列的长度
-    dp = [[0] * (len2 + 1) for _ in range(len1 + 1)]
-
-    # 填充 DP 表，找出最长公共子序列长度
-    for i in range(1, len1 + 1):
-        for j in range(1, len2 + 1):
-            if str1[i - 1] == str2[j - 1]:  # 如果两个字符串当前字符相等
-                dp[i][j] = dp[i - 1][j - 1] + 1  # 当前格子的值为左上格子值加 1
-            else:
-                dp[i][j] = max(dp[i - 1][j], dp[i][j - 1])  # 否则为上方或左方的较大值
-
-    # 从右下角开始回溯，寻找最长公共子序列的字符
-    i, j = len1, len2
-    common_parts = []  # 用于存储找到的相似部分
-    current_part = []  # 存储当前连续相似的字符部分
-
-    # 回溯寻找最长公共子序列，并分段记录
-    while i > 0 and j > 0:
-        if str1[i - 1] == str2[j - 1]:  # 如果当前字符相同
-            current_part.append(str1[i - 1])  # 将字符加入当前部分
-
-            if i == 1 or j == 1:
-                common_parts, current_part = update_common(common_parts, current_part)
-                common_parts.append("") if i != j else None
-
-            i -= 1  # 移动到左上格子
-            j -= 1
-        elif dp[i - 1][j] > dp[i][j - 1] or (
-            dp[i - 1][j] == dp[i][j - 1] and str1[i - 1] != str1[0]
-        ):  # 如果上方格子值较大
-            common_parts, current_part = update_common(common_parts, current_part)
-            if (i == len1 or j == len2 or i == 1) and not (
-                common_parts and common_parts[-1] == ""
-            ):
-                common_parts.append("")
-            i -= 1  # 移动到上方格子
-        else:  # 左方格子值较大
-            common_parts, current_part = update_common(common_parts, current_part)
-            if (i == len1 or j == len2 or j == 1) and not (
-                common_parts and common_parts[-1] == ""
-            ):
-                common_parts.append("")
-            j -= 1  # 移动到左方格子
-
-    # 反转整个 common_parts 列表，因为回溯是从字符串的末尾开始
-    common_parts.reverse()
-
+    if not str1 or not str2:
+        return []
+
+    common_parts = [str1[i : i + size] for i, _, size in get_matching_blocks(str1, str2)]
+    if not common_parts:
+        return [""]
+
+    # Findiffer.get_diff_ranges 从末尾起依次查找各段，首尾的间隔按同样的位置判断
+    start1, start2 = len(str1), len(str2)
+    for part in reversed(common_parts):
+        start1 = str1.rfind(part, 0, start1)
+        start2 = str2.rfind(part, 0, start2)
+    last = common_parts[-1]
+    if not (str1.endswith(last) and str2.endswith(last)):
+        common_parts.append("")
+    if start1 or start2:
+        common_parts.insert(0, "")
     return common_parts
 
 
@@ -758,6 +1541,183 @@ def calculate_similarity(
     return similarity
 
 
+# MinHash 使用的哈希函数 (a * x + b) mod p，p 为小于 2**32 的最大素数
+_MINHASH_PRIME = 4294967291
+
+
+def shingle_text(text: str, k: int = 5) -> np.ndarray:
+    """
+    把文本切成长度为 k 的字符片段（shingle），并用多项式滚动哈希映射为 32 位整数。
+    哈希与进程无关，不同进程计算的结果可以直接比较。
+
+    :param text: 待处理的文本。
+    :param k: 片段长度，文本短于 k 时整段作为一个片段。
+    :return: 去重并排序后的 uint64 哈希数组；空文本返回空数组。
+    """
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if codes.size == 0:
+        return codes
+    k = min(k, codes.size)
+    count = codes.size - k + 1
+
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(k):
+        # uint64 溢出即为模 2**64 运算
+        hashes = hashes * np.uint64(1000003) + codes[offset : offset + count]
+    hashes ^= hashes >> np.uint64(29)
+    return np.unique(hashes & np.uint64(0xFFFFFFFF))
+
+
+def minhash_signature(
+    text: str, num_perm: int = 128, k: int = 5, seed: int = 1
+) -> np.ndarray:
+    """
+    计算文本的 MinHash 签名，两个签名中相等分量的比例近似于两段文本片段集合的 Jaccard 相似度。
+
+    :param text: 待处理的文本。
+    :param num_perm: 签名长度（哈希函数个数）。
+    :param k: 片段长度。
+    :param seed: 生成哈希函数的随机种子，相互比较的签名必须使用相同的种子。
+    :return: 长度为 num_perm 的 uint64 数组；空文本的签名全部为 p。
+    """
+    rng = np.random.default_rng(seed)
+    # a < 2**31、x < 2**32 时 a * x + b 不会超出 uint64
+    a = rng.integers(1, 2**31, size=num_perm, dtype=np.uint64)[:, None]
+    b = rng.integers(0, _MINHASH_PRIME, size=num_perm, dtype=np.uint64)[:, None]
+    prime = np.uint64(_MINHASH_PRIME)
+
+    signature = np.full(num_perm, _MINHASH_PRIME, dtype=np.uint64)
+    shingles = shingle_text(text, k)
+    # 分块计算，避免 num_perm × 片段数 的中间数组过大
+    for start in range(0, shingles.size, 4096):
+        block = shingles[None, start : start + 4096]
+        np.minimum(signature, ((a * block + b) % prime).min(axis=1), out=signature)
+    return signature
+
+
+# 工作进程中的文本列表，由进程池的 initializer 在每个进程中设置一次
+_worker_texts: list[str] = []
+
+
+def _init_text_worker(texts: list[str]) -> None:
+    global _worker_texts
+    _worker_texts = texts
+
+
+def _signature_task(index: int, num_perm: int, k: int) -> np.ndarray:
+    return minhash_signature(_worker_texts[index], num_perm=num_perm, k=k)
+
+
+def _similarity_task(pair: tuple[int, int]) -> float:
+    index_a, index_b = pair
+    return calculate_similarity(_worker_texts[index_a], _worker_texts[index_b])
+
+
+def find_similar_texts(
+    texts: dict[Any, str] | list[str],
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    bands: int = 32,
+    k: int = 5,
+    max_workers: int | None = None,
+) -> dict[tuple[Any, Any], float]:
+    """
+    在大量文本中找出相似度不低于阈值的文本对。
+
+    先用 MinHash 签名与 LSH 分桶找出候选对（签名在某一段上完全相同的文本），
+    再只对候选对用 calculate_similarity 计算精确相似度，签名与精确计算都在进程池中进行。
+    分桶的召回阈值约为 (1 / bands) ** (bands / num_perm)（片段集合的 Jaccard 相似度）。
+
+    :param texts: 文本字典（键可以是文件路径等）或文本列表（键为下标）。
+    :param threshold: calculate_similarity 的阈值。
+    :param num_perm: MinHash 签名长度。
+    :param bands: LSH 分段数，必须整除 num_perm；越大召回越高、候选越多。
+    :param k: 片段长度。
+    :param max_workers: 进程池大小，None 时为 CPU 核数。
+    :return: 稀疏相似度矩阵 {(键a, 键b): 相似度}，键a 在输入中位于键b 之前。
+    :raises ValueError: bands 不能整除 num_perm 时抛出。
+    """
+    if num_perm % bands:
+        raise ValueError(f"bands 必须整除 num_perm: {bands}, {num_perm}")
+    items = dict(enumerate(texts)) if isinstance(texts, list) else texts
+    keys = [key for key, text in items.items() if text]
+    text_list = [items[key] for key in keys]
+    rows = num_perm // bands
+    workers = max_workers or os.cpu_count() or 1
+
+    # 文本只在每个工作进程启动时传输一次，之后的任务只传下标
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_text_worker,
+        initargs=(text_list,),
+    ) as executor:
+        signatures = list(
+            executor.map(
+                partial(_signature_task, num_perm=num_perm, k=k),
+                range(len(text_list)),
+                chunksize=max(1, len(text_list) // (workers * 4)),
+            )
+        )
+
+        candidates: set[tuple[int, int]] = set()
+        for band in range(bands):
+            buckets: dict[bytes, list[int]] = {}
+            for index, signature in enumerate(signatures):
+                band_key = signature[band * rows : (band + 1) * rows].tobytes()
+                buckets.setdefault(band_key, []).append(index)
+            for bucket in buckets.values():
+                for pos, index_a in enumerate(bucket):
+                    for index_b in bucket[pos + 1 :]:
+                        candidates.add((index_a, index_b))
+
+        # 相似度不超过短文本与长文本的长度之比，长度相差过大的候选对直接跳过
+        pairs = []
+        for index_a, index_b in sorted(candidates):
+            len_a, len_b = len(text_list[index_a]), len(text_list[index_b])
+            if min(len_a, len_b) >= threshold * max(len_a, len_b):
+                pairs.append((index_a, index_b))
+
+        similarities = executor.map(
+            _similarity_task,
+            pairs,
+            chunksize=max(1, len(pairs) // (workers * 4)),
+        )
+        return {
+            (keys[index_a], keys[index_b]): similarity
+            for (index_a, index_b), similarity in zip(pairs, similarities)
+            if similarity >= threshold
+        }
+
+
+def cluster_similar_texts(
+    similarities: dict[tuple[Any, Any], float],
+) -> list[list[Any]]:
+    """
+    把 find_similar_texts 找到的相似文本对合并为簇（相似关系的连通分量）。
+
+    :param similarities: find_similar_texts 返回的稀疏相似度矩阵。
+    :return: 簇的列表，每个簇至少包含两个键，按首次出现的顺序排列。
+    """
+    parent: dict[Any, Any] = {}
+
+    def find(key):
+        parent.setdefault(key, key)
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for key_a, key_b in similarities:
+        root_a, root_b = find(key_a), find(key_b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    clusters: dict[Any, list[Any]] = {}
+    for key in parent:
+        clusters.setdefault(find(key), []).append(key)
+    return list(clusters.values())
+
+
 def find_nth_occurrence(target_str: str, similar_str: str, occurrence: int) -> tuple:
     """
     查找目标字符串中指定第n次出现的子字符串位置，并返回其起始和结束索引。
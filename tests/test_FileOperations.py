@@ -1,16 +1,197 @@
 import pytest, logging
+from pathlib import Path
+
 from celestialvault.tools.FileOperations import (
     detect_identical_files,
     duplicate_report,
+    handle_dir_files,
 )
 
 
+def _upper_text(source: Path, destination: Path) -> int:
+    text = source.read_text(encoding="utf-8")
+    if "boom" in text:
+        raise ValueError("boom")
+    destination.write_text(text.upper(), encoding="utf-8")
+    return len(text)
+
+
+def _reverse_text(source: Path, destination: Path, suffix: str = "") -> int:
+    text = source.read_text(encoding="utf-8")
+    destination.write_text(text[::-1] + suffix, encoding="utf-8")
+    return len(text)
+
+
+_processed: list[str] = []
+
+
+def _record_upper(source: Path, destination: Path) -> None:
+    _processed.append(source.name)
+    destination.write_text(source.read_text(encoding="utf-8").upper(), encoding="utf-8")
+
+
+def _make_tree(root: Path, files: dict[str, str]) -> None:
+    for rel, text in files.items():
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel).write_text(text, encoding="utf-8")
+
+
 def _test_compress_dir():
     # Test with a valid directory
     # compress_dir(r'C:\Users\27342\OneDrive\Videos\compress_temp')
     pass
 
 
+def test_handle_dir_files(tmp_path):
+    source = tmp_path / "source"
+    _make_tree(
+        source,
+        {
+            "a.txt": "alpha",
+            "bad.txt": "boom",
+            "sub/b.txt": "beta",
+            "sub/deep/c.md": "gamma",
+            "sub/deep/d.bin": "raw",
+        },
+    )
+    rules = {
+        # 默认执行模式的规则、单独指定线程数的规则，以及交给进程池的规则同时运行
+        ".txt": (_upper_text, lambda p: p, {}),
+        ".md": (
+            _reverse_text,
+            lambda p: p.with_suffix(".rev.md"),
+            {"suffix": "!"},
+            {"execution_mode": "process", "resource": "cpu"},
+        ),
+    }
+    errors = handle_dir_files(source, rules, "thread", max_workers=2)
+
+    target = tmp_path / "source_re"
+    assert (target / "a.txt").read_text(encoding="utf-8") == "ALPHA"
+    assert (target / "sub/b.txt").read_text(encoding="utf-8") == "BETA"
+    assert (target / "sub/deep/c.rev.md").read_text(encoding="utf-8") == "ammag!"
+    assert (target / "sub/deep/d.bin").read_text(encoding="utf-8") == "raw"
+
+    # 处理失败的文件原样复制到新目录，并按错误归类返回
+    assert errors == {("ValueError", "boom"): [target / "bad.txt"]}
+    assert (target / "bad.txt").read_text(encoding="utf-8") == "boom"
+
+
+def _rename_or_fail(path: Path) -> Path:
+    if path.stem == "unnamed":
+        raise ValueError("cannot rename")
+    return path
+
+
+def test_handle_dir_files_rename_error(tmp_path):
+    source = tmp_path / "source"
+    _make_tree(source, {"a.txt": "alpha", "sub/unnamed.txt": "beta"})
+    rules = {".txt": (_upper_text, _rename_or_fail, {})}
+    errors = handle_dir_files(source, rules, "thread")
+
+    # 重命名函数的错误与处理函数的错误一样被记录，原文件复制到新目录
+    target = tmp_path / "source_re"
+    assert (target / "a.txt").read_text(encoding="utf-8") == "ALPHA"
+    assert errors == {("ValueError", "cannot rename"): [target / "sub/unnamed.txt"]}
+    assert (target / "sub/unnamed.txt").read_text(encoding="utf-8") == "beta"
+
+
+def test_handle_dir_files_resume(tmp_path):
+    source = tmp_path / "source"
+    _make_tree(source, {"a.txt": "a", "b.txt": "b", "sub/c.txt": "c", "legacy.txt": "l"})
+    target = tmp_path / "source_re"
+    # 启用进度日志之前已经生成的输出
+    _make_tree(target, {"legacy.txt": "LEGACY(old run)"})
+    rules = {".txt": (_record_upper, lambda p: p, {})}
+
+    _processed.clear()
+    assert handle_dir_files(source, rules, "thread", adopt_existing=True) == {}
+    assert sorted(_processed) == ["a.txt", "b.txt", "c.txt"]
+    assert (target / "legacy.txt").read_text(encoding="utf-8") == "LEGACY(old run)"
+    assert (tmp_path / "source_re.journal.jsonl").exists()
+
+    # 重新运行：只处理内容变化的文件
+    (source / "b.txt").write_text("bb", encoding="utf-8")
+    _processed.clear()
+    assert handle_dir_files(source, rules, "thread") == {}
+    assert _processed == ["b.txt"]
+    assert (target / "b.txt").read_text(encoding="utf-8") == "BB"
+    assert not list(target.rglob(".*.part*"))
+
+
 def test_detect_identical_files():
     identical_dict = detect_identical_files(r".")
     duplicate_report(identical_dict)
+
+
+def test_unzip_zip_file(tmp_path):
+    import os, zipfile
+    from celestialvault.tools.FileOperations import unzip_zip_file
+
+    members = {f"dir_{i % 3}/file_{i}.bin": os.urandom(1024 * (i + 1)) for i in range(12)}
+    zip_path = tmp_path / "sample.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("empty_dir/", "")
+        for name, data in members.items():
+            zf.writestr(name, data)
+
+    destination = tmp_path / "sample_unzip"
+    extracted = unzip_zip_file(zip_path, destination, max_workers=4, parallel_threshold=0)
+
+    assert extracted == sum(len(data) for data in members.values())
+    assert (destination / "empty_dir").is_dir()
+    for name, data in members.items():
+        assert (destination / name).read_bytes() == data
+    logging.info(f"Extracted bytes: {extracted}")
+
+
+def test_compress_to_archive(tmp_path):
+    import os, tarfile, zipfile
+    from celestialvault.tools.FileOperations import compress_to_archive
+
+    source = tmp_path / "source"
+    members = {
+        "a/text_0.txt": b"hello celestial " * 4096,
+        "a/random.bin": os.urandom(200 * 1024),
+        "b/image.jpg": os.urandom(50 * 1024),
+        "b/c/large.txt": b"0123456789" * 50000,
+    }
+    for name, data in members.items():
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_bytes(data)
+    (source / "empty").mkdir()
+
+    zip_path = compress_to_archive(source, "zip", workers=4, max_member_memory=256 * 1024)
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        assert zf.getinfo("b/image.jpg").compress_type == zipfile.ZIP_STORED
+        assert "empty/" in zf.namelist()
+        for name, data in members.items():
+            assert zf.read(name) == data
+
+    tar_path = compress_to_archive(source, "gztar", archive_path=tmp_path / "out.tar.gz")
+    with tarfile.open(tar_path) as tar:
+        assert tar.extractfile("b/c/large.txt").read() == members["b/c/large.txt"]
+        tar_files = {member.name for member in tar.getmembers() if member.isfile()}
+
+    # zip 与 tar 的成员都相对于源文件夹
+    with zipfile.ZipFile(zip_path) as zf:
+        zip_files = {name for name in zf.namelist() if not name.endswith("/")}
+    assert zip_files == tar_files == set(members)
+
+    with pytest.raises(ValueError):
+        compress_to_archive(source, "rar")
+    logging.info(f"Archive sizes: {zip_path.stat().st_size}, {tar_path.stat().st_size}")
+
+
+def test_iter_dir_files(tmp_path):
+    from celestialvault.tools.FileOperations import _iter_dir_files
+
+    for rel in ("a.txt", "sub/b.txt", "sub/deep/c.txt", "other/d.txt"):
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text(rel)
+    (tmp_path / "empty").mkdir()
+
+    expected = {p for p in tmp_path.glob("**/*") if p.is_file()}
+    assert set(_iter_dir_files(tmp_path)) == expected
+    assert set(_iter_dir_files(tmp_path, recursive=False)) == {tmp_path / "a.txt"}
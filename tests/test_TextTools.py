@@ -1,18 +1,46 @@
 import pytest
 import logging
-import os, random
+import math, os, random, re, string
 from celestialvault.tools.TextTools import (
     pro_slash,
     str_to_dict,
-    language_fingerprint,
     calculate_valid_chinese_text,
     calculate_valid_text,
+    char_class_counts,
+    character_ratio,
+    text_to_codepoints,
     format_table,
     string_split,
+    get_lcs,
+    get_matching_blocks,
+    calculate_similarity,
+    find_similar_texts,
+    safe_open_txt,
+    iter_text_chunks,
+    combine_txt_files,
+    detect_encoding,
+    cluster_similar_texts,
     rs_encode,
     rs_decode,
     pad_bytes,
     unpad_bytes,
+    pad_to_align,
+    crc_encode_bytes,
+    add_length_header_to_bytes,
+    encode_bytes_to_base64,
+    decode_bytes_from_base64,
+    compress_text_to_bytes,
+    decompress_text_from_bytes,
+    frame_bytes,
+    unframe_bytes,
+    frame_to_base64,
+    compress_to_frame,
+    iter_text_bytes,
+    decompress_frame,
+    choose_compression,
+    register_compression_backend,
+    CompressionBackend,
+    COMPRESSION_BACKENDS,
 )
 from celestialvault.tools.NumberUtils import (
     choose_square_container,
@@ -122,6 +150,28 @@ def test_calculate_valid_text():
     logging.info(f"{'Valid rate':<18}: {valid_rate}")
 
 
+def test_char_class_counts():
+    random.seed(3)
+    chars = ["a", "Z", "7", " ", "\\", "\n", "中", "文", "。", "“", "\ufffd", "é", "😀", "٣"]
+    text = "".join(random.choice(chars) for _ in range(10000))
+    codepoints = text_to_codepoints(text)
+
+    counts = char_class_counts(codepoints)
+    valid_pattern = re.compile(r"[\u4e00-\u9fff" r"。，、？！《》“”‘’：（）【】" f"{string.printable}]")
+    assert counts["total"] == len(text)
+    assert counts["valid"] == len(valid_pattern.findall(text))
+    assert counts["replacement"] == text.count("\ufffd")
+    assert calculate_valid_text(text) == calculate_valid_text(codepoints)
+    assert calculate_valid_chinese_text(text) == (
+        sum(text.count(char) for char in "a Z 7 中 文 。 “".split()) / len(text)
+    )
+
+    ratio = character_ratio(text)
+    assert ratio["😀"] == text.count("😀") / len(text)
+    assert math.isclose(sum(ratio.values()), 1)
+    logging.info(f"Char class counts: {counts}")
+
+
 def test_format_table():
     data = [
         ["Alice", 24, "Engineer"],
@@ -147,6 +197,179 @@ def test_string_split():
     logging.info(result)
 
 
+def _lcs_length(str1, str2):
+    prev = [0] * (len(str2) + 1)
+    for char1 in str1:
+        cur = [0]
+        for j, char2 in enumerate(str2):
+            cur.append(prev[j] + 1 if char1 == char2 else max(prev[j + 1], cur[j]))
+        prev = cur
+    return prev[-1]
+
+
+def test_get_lcs():
+    assert get_lcs("abc", "abc") == ["abc"]
+    assert get_lcs("xabc", "abcy") == ["", "abc", ""]
+    assert get_lcs("abc", "xyz") == [""]
+    assert get_lcs("", "") == []
+    assert get_lcs("1234dtyjdtyjdtyj6789", "123456789") == ["1234", "6789"]
+    assert get_lcs("cca", "ccbccb") == ["", "cc", ""]
+    assert get_lcs("aca", "a") == ["", "a"]
+    assert calculate_similarity("abcde", "ace") == 0.6
+
+    random.seed(0)
+    for _ in range(300):
+        str1 = "".join(random.choice("abc") for _ in range(random.randint(0, 80)))
+        str2 = "".join(random.choice("abc") for _ in range(random.randint(0, 80)))
+        for max_d in (256, 0):
+            blocks = get_matching_blocks(str1, str2, max_d=max_d)
+            end1 = end2 = 0
+            for i, j, size in blocks:
+                assert i >= end1 and j >= end2
+                assert str1[i : i + size] == str2[j : j + size]
+                end1, end2 = i + size, j + size
+            assert sum(size for *_, size in blocks) == _lcs_length(str1, str2)
+        if str1 and str2:
+            assert len("".join(get_lcs(str1, str2))) == _lcs_length(str1, str2)
+
+    # 长文本：get_lcs 由 get_matching_blocks 求出，内存随长度线性增长，几处修改的两章应很快完成
+    chapter = "".join(random.choice("天地玄黄宇宙洪荒日月盈昃辰宿列张，。") for _ in range(20000))
+    revised = chapter[:5000] + "新增的一句话。" + chapter[5000:12000] + chapter[12100:]
+    parts = get_lcs(chapter, revised)
+    assert len("".join(parts)) == len(chapter) - 100
+    logging.info(f"{'LCS parts':<11}: {len(parts)}")
+
+
+def test_find_similar_texts():
+    random.seed(1)
+    chars = "天地玄黄宇宙洪荒日月盈昃辰宿列张寒来暑往秋收冬藏闰余成岁律吕调阳"
+    books = {
+        f"book{i}.txt": "".join(random.choice(chars) for _ in range(3000))
+        for i in range(20)
+    }
+    for i in range(2):
+        text = list(books[f"book{i}.txt"])
+        for _ in range(30):
+            text[random.randrange(len(text))] = random.choice(chars)
+        books[f"copy{i}.txt"] = "".join(text)
+    books["copy0_copy.txt"] = books["copy0.txt"] + "完"
+
+    similarities = find_similar_texts(books, threshold=0.8, max_workers=2)
+    clusters = cluster_similar_texts(similarities)
+
+    assert ("book1.txt", "copy1.txt") in similarities
+    assert sorted(map(sorted, clusters)) == [
+        ["book0.txt", "copy0.txt", "copy0_copy.txt"],
+        ["book1.txt", "copy1.txt"],
+    ]
+    logging.info(f"{'Similar':<11}: {similarities}")
+
+
+def test_safe_open_txt(tmp_path):
+    random.seed(2)
+    text = "".join(
+        random.choice(["这是一段普通的文本。", "他说：“你好”\n", "第十章 开始\n", "Hello. "])
+        for _ in range(40000)
+    )
+    for encoding in ("utf-8", "gb18030", "utf-16", "utf-8-sig"):
+        file_path = tmp_path / f"{encoding}.txt"
+        file_path.write_bytes(text.encode(encoding))
+        assert safe_open_txt(file_path) == text
+        assert detect_encoding(file_path) == encoding
+        logging.info(f"{encoding:<11}: {file_path.stat().st_size} bytes")
+
+    empty_path = tmp_path / "empty.txt"
+    empty_path.write_bytes(b"")
+    assert safe_open_txt(empty_path) == ""
+
+    # 与文本模式读取一样统一换行符
+    crlf_path = tmp_path / "crlf.txt"
+    crlf_path.write_bytes("第一章\r\n内容一\r第二章\n".encode("gb18030"))
+    assert safe_open_txt(crlf_path) == "第一章\n内容一\n第二章\n"
+
+    # 文件内容改变后缓存失效
+    file_path = tmp_path / "utf-8.txt"
+    file_path.write_bytes(text.encode("gb18030") + "尾".encode("gb18030"))
+    assert detect_encoding(file_path) == "gb18030"
+
+
+def test_combine_txt_files(tmp_path):
+    source_dir = tmp_path / "book"
+    source_dir.mkdir()
+    (source_dir / "2.txt").write_bytes("第二章\n内容二".encode("gb18030"))
+    (source_dir / "1.txt").write_bytes("第一章\r\n内容一".encode("utf-8"))
+    (source_dir / "10.md").write_bytes("第十章".encode("utf-16"))
+
+    assert "".join(iter_text_chunks(source_dir / "1.txt", chunk_size=2)) == "第一章\n内容一"
+    # \r\n 恰好落在块边界上、单独的 \r 也统一为 \n
+    crlf_path = tmp_path / "crlf.txt"
+    crlf_path.write_bytes("一\r\n二\r\r\n三\r".encode("utf-8"))
+    for chunk_size in (1, 2, 3, 100):
+        chunks = iter_text_chunks(crlf_path, chunk_size=chunk_size)
+        assert "".join(chunks) == safe_open_txt(crlf_path) == "一\n二\n\n三\n"
+
+    target_file = tmp_path / "book.txt"
+    combine_txt_files(source_dir, target_file)
+    assert target_file.read_bytes().decode("utf-8") == (
+        "== 1.txt ==\n\n第一章\n内容一\n\n"
+        "== 2.txt ==\n\n第二章\n内容二\n\n"
+        "== 10.md ==\n\n第十章\n\n"
+    )
+
+
+def test_frame_bytes():
+    for size in (0, 1, 2, 3, 1000, 100001):
+        data = os.urandom(size)
+        # 与逐步调用旧函数的结果一致
+        framed = frame_bytes(data, length_headers=1, crc=True)
+        assert framed == add_length_header_to_bytes(crc_encode_bytes(data))
+        assert frame_bytes(data, length_headers=1, crc=False, target_len=size + 9) == pad_bytes(data, size + 9)
+        assert frame_bytes(data, length_headers=0, crc=False, align=3) == pad_to_align(data, 3)
+        assert frame_to_base64(data, chunk_size=6) == encode_bytes_to_base64(data)
+        assert decode_bytes_from_base64(encode_bytes_to_base64(data)) == data
+
+        view = unframe_bytes(framed + b"\xec\x11", length_headers=1, crc=True)
+        assert isinstance(view, memoryview) and view.obj is not None
+        assert view == data
+
+    framed = frame_bytes(b"payload", length_headers=2, crc=True)
+    framed[-1] ^= 0xFF
+    with pytest.raises(ValueError):
+        unframe_bytes(framed, length_headers=2, crc=True)
+    with pytest.raises(ValueError):
+        unframe_bytes(framed[:-1], length_headers=2, crc=True)
+    with pytest.raises(ValueError):
+        frame_bytes(b"payload", target_len=4)
+
+    text = "流式压缩测试😀\n" * 10000
+    assert compress_to_frame(iter_text_bytes(text, chunk_size=777)) == compress_text_to_bytes(text)
+    assert decompress_text_from_bytes(compress_text_to_bytes(text)) == text
+
+
+def test_compression_backends():
+    text = "压缩后端测试 compression backend\n" * 5000 + "".join(map(chr, range(0x4E00, 0x5E00)))
+    sizes = {}
+    for algorithm in COMPRESSION_BACKENDS:
+        compressed = compress_text_to_bytes(text, algorithm)
+        # 算法记录在帧中，解压时无需指定
+        assert decompress_text_from_bytes(compressed) == text
+        sizes[algorithm] = len(compressed)
+    assert compress_text_to_bytes(text, "zlib", 1) != compress_text_to_bytes(text, "zlib", 9)
+    logging.info(f"Compressed sizes: {sizes}")
+
+    algorithm, level = choose_compression(text, time_budget=10)
+    assert algorithm in COMPRESSION_BACKENDS
+    assert len(compress_text_to_bytes(text, algorithm, level)) <= sizes["zlib"]
+    assert choose_compression(text, time_budget=0, candidates=[("zlib", 1)]) == ("zlib", 1)
+
+    with pytest.raises(ValueError):
+        compress_text_to_bytes(text, "unknown")
+    with pytest.raises(ValueError):
+        register_compression_backend(CompressionBackend("bad", b"\x78", None, None))
+    with pytest.raises(ValueError):
+        decompress_frame(b"\x00\x00\x00\x02\x7f\x00")
+
+
 def test_rs_encode_decode():
     # 1. 造一段随机数据
     data = os.urandom(1024)  # 1KB 随机数据
@@ -0,0 +1,134 @@
+import pytest, logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from celestialvault.instances.inst_cas import ContentStore
+from celestialvault.instances.inst_fetch import Fetcher
+from celestialvault.instances.inst_save import Saver
+
+
+class _Handler(BaseHTTPRequestHandler):
+    files = {
+        "/a.bin": b"same content " * 500,
+        "/mirror/a.bin": b"same content " * 500,
+        "/b.bin": b"other content " * 300,
+    }
+    hits = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        data = self.files[self.path]
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def cas_server():
+    _Handler.hits.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", _Handler
+    server.shutdown()
+    server.server_close()
+
+
+def test_content_store(cas_server, tmp_path):
+    base_url, handler = cas_server
+    store = ContentStore(tmp_path / "store")
+
+    with Fetcher() as fetcher:
+        digest, object_path = store.fetch(fetcher, f"{base_url}/a.bin")
+        assert store.fetch(fetcher, f"{base_url}/a.bin") == (digest, object_path)
+        # 不同 URL、相同内容只保存一份
+        mirror_digest, _ = store.fetch(fetcher, f"{base_url}/mirror/a.bin")
+        store.fetch(fetcher, f"{base_url}/b.bin")
+
+    assert mirror_digest == digest
+    assert handler.hits["/a.bin"] == 1
+    assert len(store) == 2
+    assert object_path.read_bytes() == handler.files["/a.bin"]
+    assert not any(store.tmp_dir.iterdir())
+
+    first, second = tmp_path / "first.bin", tmp_path / "second.bin"
+    assert store.link(digest, first)
+    assert store.link(digest, second)
+    assert first.stat().st_ino == second.stat().st_ino == object_path.stat().st_ino
+    assert store.resolve(second) == object_path
+    store.close()
+
+    # 重新打开后 URL 索引仍然有效
+    with ContentStore(tmp_path / "store", use_hardlinks=False) as store:
+        with Fetcher() as fetcher:
+            assert store.fetch(fetcher, f"{base_url}/a.bin")[0] == digest
+        assert handler.hits["/a.bin"] == 1
+
+        third = tmp_path / "third.bin"
+        assert not store.link(digest, third)
+        assert not third.exists()
+        assert store.resolve(third) == object_path
+
+        with pytest.raises(FileNotFoundError):
+            store.link("0" * 64, third)
+
+
+def test_content_store_link_fallback(tmp_path, monkeypatch):
+    import os
+
+    with ContentStore(tmp_path / "store") as store:
+        digest, object_path = store.add_bytes(b"payload")
+
+        def cross_device_link(*args):
+            raise OSError(18, "Invalid cross-device link")
+
+        # 硬链接失败时从对象复制一份，目标仍然可用
+        monkeypatch.setattr(os, "link", cross_device_link)
+        target = tmp_path / "copy.bin"
+        assert not store.link(digest, target)
+        assert target.read_bytes() == b"payload"
+        assert target.stat().st_ino != object_path.stat().st_ino
+        assert store.resolve(target) == object_path
+        assert not list(tmp_path.glob(".copy.bin.*"))
+
+
+def test_saver_with_content_store(cas_server, tmp_path):
+    base_url, handler = cas_server
+    store = ContentStore(tmp_path / "store")
+    saver = Saver(tmp_path / "out", content_store=store)
+
+    path1, size1 = saver.download_content(f"{base_url}/a.bin", "copy1", ".bin")
+    path2, size2 = saver.download_content(f"{base_url}/mirror/a.bin", "copy2", ".bin")
+
+    assert size1 == size2 == len(handler.files["/a.bin"])
+    assert path1.read_bytes() == path2.read_bytes() == handler.files["/a.bin"]
+    assert path1.stat().st_ino == path2.stat().st_ino
+    assert len(store) == 1
+    logging.info(f"CAS requests: {handler.hits}")
+    store.close()
+
+
+def test_async_download_with_content_store(cas_server, tmp_path):
+    import asyncio
+
+    base_url, handler = cas_server
+    saver = Saver(tmp_path / "out", content_store=ContentStore(tmp_path / "store"))
+    task_list = [
+        (f"{base_url}/a.bin", "copy1", ".bin"),
+        (f"{base_url}/mirror/a.bin", "copy2", ".bin"),
+        (f"{base_url}/b.bin", "other", ".bin"),
+    ]
+
+    results = asyncio.run(saver.download_urls_async(task_list))
+    (path1, size1), (path2, _), (path3, _) = (results[task] for task in task_list)
+    assert size1 == len(handler.files["/a.bin"])
+    assert path1.read_bytes() == path2.read_bytes() == handler.files["/a.bin"]
+    assert path1.stat().st_ino == path2.stat().st_ino
+    assert path3.read_bytes() == handler.files["/b.bin"]
+    assert len(saver.content_store) == 2
+    saver.content_store.close()
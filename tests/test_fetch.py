@@ -0,0 +1,466 @@
+import pytest, logging
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from celestialvault.instances.inst_fetch import AsyncFetcher
+from celestialvault.instances.inst_save import Saver
+
+
+class _Handler(BaseHTTPRequestHandler):
+    state = {"running": 0, "peak": 0}
+    hits = {}
+    lock = threading.Lock()
+
+    blob = bytes(range(256)) * 4096
+    ranges = []
+
+    def _send_blob(self):
+        data, status = self.blob, 200
+        range_header = self.headers.get("Range")
+        self.ranges.append(range_header)
+        if range_header and self.path == "/blob":
+            start, _, end = range_header.removeprefix("bytes=").partition("-")
+            start, end = int(start), int(end or len(self.blob) - 1)
+            data, status = self.blob[start : end + 1], 206
+        self.send_response(status)
+        if status == 206:
+            self.send_header(
+                "Content-Range", f"bytes {start}-{end}/{len(self.blob)}"
+            )
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_etag(self):
+        with self.lock:
+            self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        etag = f'"{self.path}-v1"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = self.path.encode() * 100
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_slow(self):
+        with self.lock:
+            self.hits[self.path] = self.hits.get(self.path, 0) + 1
+            first = self.hits[self.path] == 1
+        if first:
+            # 第一次请求超过客户端的读超时
+            time.sleep(0.6)
+        body = self.path.encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def do_GET(self):
+        if self.path.startswith("/slow"):
+            return self._send_slow()
+        if self.path in ("/blob", "/blob-norange"):
+            return self._send_blob()
+        if self.path.startswith("/etag"):
+            return self._send_etag()
+        with self.lock:
+            self.hits[self.path] = self.hits.get(self.path, 0) + 1
+            throttled = self.path.startswith("/throttle") and self.hits[self.path] == 1
+        if throttled:
+            self.send_response(429)
+            if not self.path.startswith("/throttle-bare"):
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        with self.lock:
+            self.state["running"] += 1
+            self.state["peak"] = max(self.state["peak"], self.state["running"])
+        time.sleep(0.02)
+        body = self.path.encode() * 100
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.lock:
+            self.state["running"] -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    _Handler.state.update(running=0, peak=0)
+    _Handler.hits.clear()
+    _Handler.ranges.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", _Handler.state
+    server.shutdown()
+    server.server_close()
+
+
+def test_async_fetcher(http_server):
+    base_url, state = http_server
+
+    async def main():
+        async with AsyncFetcher(max_concurrency=10, per_host_concurrency=3) as fetcher:
+            return await asyncio.gather(
+                *(fetcher.getContent(f"{base_url}/item/{i}") for i in range(20))
+            )
+
+    contents = asyncio.run(main())
+    assert contents[7] == b"/item/7" * 100
+    assert state["peak"] <= 3
+    logging.info(f"Peak concurrency per host: {state['peak']}")
+
+
+def test_download_urls_async(http_server, tmp_path):
+    base_url, _ = http_server
+    saver = Saver(tmp_path)
+    task_list = [(f"{base_url}/img/{i}", f"img_{i}", ".bin") for i in range(10)]
+
+    results = asyncio.run(saver.download_urls_async(task_list))
+    for url, file_name, file_suffix in task_list:
+        path, size = results[(url, file_name, file_suffix)]
+        assert path.read_bytes() == url[len(base_url):].encode() * 100
+        assert size == path.stat().st_size
+
+
+def test_fetcher_shared_across_threads(http_server):
+    from concurrent.futures import ThreadPoolExecutor
+    from celestialvault.instances.inst_fetch import Fetcher
+
+    base_url, state = http_server
+    fetcher = Fetcher(max_connections=4, max_keepalive_connections=4)
+
+    with fetcher, ThreadPoolExecutor(max_workers=16) as pool:
+        client = fetcher.cl
+        contents = list(
+            pool.map(lambda i: fetcher.getContent(f"{base_url}/page/{i}"), range(40))
+        )
+        # 所有线程共用同一个客户端，连接数受 max_connections 限制
+        assert fetcher.cl is client and fetcher._client_users[client] == 0
+
+    assert client.is_closed
+    assert state["peak"] <= 4
+    assert contents[25] == b"/page/25" * 100
+
+
+def test_fetcher_honors_retry_after(http_server):
+    from celestialvault.instances.inst_fetch import Fetcher
+
+    base_url, _ = http_server
+    with Fetcher() as fetcher:
+        start = time.perf_counter()
+        content = fetcher.getContent(f"{base_url}/throttle/1")
+        elapsed = time.perf_counter() - start
+
+        state = fetcher.rate_limiter.get_host_state(base_url)
+    assert content == b"/throttle/1" * 100
+    assert elapsed >= 0.9
+    # 默认并发窗口为 max_connections，收到 429 后减半
+    assert state["concurrency"] == 50
+    logging.info(f"Throttled request finished in {elapsed:.2f}s, state: {state}")
+
+
+def test_fetcher_backoff_without_retry_after(http_server):
+    from celestialvault.instances.inst_fetch import Fetcher
+
+    base_url, _ = http_server
+    with Fetcher() as fetcher:
+        start = time.perf_counter()
+        content = fetcher.getContent(f"{base_url}/throttle-bare/1")
+        elapsed = time.perf_counter() - start
+    # 没有 Retry-After 时按指数退避等待后重试
+    assert content == b"/throttle-bare/1" * 100
+    assert elapsed >= 0.25
+
+    async def main():
+        async with AsyncFetcher() as fetcher:
+            start = time.perf_counter()
+            content = await fetcher.getContent(f"{base_url}/throttle-bare/2")
+            return content, time.perf_counter() - start
+
+    content, elapsed = asyncio.run(main())
+    assert content == b"/throttle-bare/2" * 100
+    assert elapsed >= 0.25
+
+
+def test_cancelled_request_releases_limiter(http_server):
+    base_url, _ = http_server
+
+    async def main():
+        async with AsyncFetcher() as fetcher:
+            # 请求在响应前被取消，限速器名额仍要归还
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    fetcher.getContent(f"{base_url}/slow/cancel"), timeout=0.2
+                )
+            return fetcher.rate_limiter.get_host_state(base_url)
+
+    state = asyncio.run(main())
+    assert state["in_flight"] == 0
+
+
+def test_direct_read_timeout_retries(http_server):
+    from httpx import ReadTimeout
+    from celestialvault.instances.inst_fetch import Fetcher
+
+    base_url, _ = http_server
+    with Fetcher(wait_time=0.3) as fetcher:
+        # 直连模式下读超时退避后重试，而不是立即抛出
+        assert fetcher.getContent(f"{base_url}/slow/1") == b"/slow/1"
+        assert _Handler.hits["/slow/1"] == 2
+
+    with Fetcher(wait_time=0.3, max_repeat=1) as fetcher:
+        with pytest.raises(ReadTimeout):
+            fetcher.getContent(f"{base_url}/slow/2")
+
+    async def main():
+        async with AsyncFetcher(wait_time=0.3) as fetcher:
+            return await fetcher.getContent(f"{base_url}/slow/3")
+
+    assert asyncio.run(main()) == b"/slow/3"
+    assert _Handler.hits["/slow/3"] == 2
+
+
+def test_host_rate_limiter():
+    from celestialvault.instances.inst_ratelimit import HostRateLimiter, parse_retry_after
+
+    url = "http://example.com/a"
+    limiter = HostRateLimiter(rate=20, burst=1, concurrency=2, max_concurrency=4)
+
+    start = time.perf_counter()
+    for _ in range(6):
+        limiter.acquire(url)
+        limiter.release(url, 200)
+    assert time.perf_counter() - start >= 0.2
+
+    state = limiter.get_host_state(url)
+    assert state["concurrency"] == 4
+    assert state["rate"] > 20
+
+    limiter.release(url, 429, {"Retry-After": "2"})
+    state = limiter.get_host_state(url)
+    assert state["concurrency"] == 2
+    assert state["rate"] < 20
+    assert 1.5 < state["blocked_for"] <= 2
+    assert limiter.get_host_state("http://other.com")["blocked_for"] == 0
+
+    assert parse_retry_after("3") == 3
+    assert parse_retry_after("not a date") is None
+
+
+def test_stream_to_file_resume(http_server, tmp_path):
+    import hashlib
+    from celestialvault.instances.inst_fetch import Fetcher
+
+    base_url, _ = http_server
+    blob = _Handler.blob
+    target = tmp_path / "blob.bin"
+    # 模拟上次中断留下的部分文件
+    (tmp_path / "blob.bin.part").write_bytes(blob[:300000])
+
+    with Fetcher() as fetcher:
+        path, size, digest = fetcher.stream_to_file(f"{base_url}/blob", target, chunk_size=65536)
+        assert _Handler.ranges[-1] == "bytes=300000-"
+        assert path.read_bytes() == blob and size == len(blob)
+        assert digest == hashlib.sha256(blob).hexdigest()
+        assert not (tmp_path / "blob.bin.part").exists()
+
+        # 服务器不支持 Range 时从头下载
+        (tmp_path / "norange.bin.part").write_bytes(b"garbage")
+        path, size, digest = fetcher.stream_to_file(f"{base_url}/blob-norange", tmp_path / "norange.bin")
+        assert path.read_bytes() == blob
+        assert digest == hashlib.sha256(blob).hexdigest()
+
+
+def test_async_stream_to_file_resume(http_server, tmp_path):
+    import hashlib
+
+    base_url, _ = http_server
+    blob = _Handler.blob
+    (tmp_path / "blob.bin.part").write_bytes(blob[:300000])
+
+    async def main():
+        async with AsyncFetcher() as fetcher:
+            resumed = await fetcher.stream_to_file(
+                f"{base_url}/blob", tmp_path / "blob.bin", chunk_size=65536
+            )
+            assert _Handler.ranges[-1] == "bytes=300000-"
+            (tmp_path / "norange.bin.part").write_bytes(b"garbage")
+            restarted = await fetcher.stream_to_file(
+                f"{base_url}/blob-norange", tmp_path / "norange.bin"
+            )
+            return resumed, restarted
+
+    digest = hashlib.sha256(blob).hexdigest()
+    for path, size, result_digest in asyncio.run(main()):
+        assert path.read_bytes() == blob and size == len(blob)
+        assert result_digest == digest
+        assert not path.with_name(path.name + ".part").exists()
+
+
+def test_saver_download_content_streams(http_server, tmp_path):
+    base_url, _ = http_server
+    saver = Saver(tmp_path)
+    path, size = saver.download_content(f"{base_url}/blob", "blob", ".bin")
+    assert size == len(_Handler.blob) and path.read_bytes() == _Handler.blob
+
+
+def test_download_ranged(http_server, tmp_path):
+    import hashlib
+    from celestialvault.instances.inst_error import DownloadError
+    from celestialvault.instances.inst_fetch import Fetcher
+
+    base_url, _ = http_server
+    blob = _Handler.blob
+    digest = hashlib.sha256(blob).hexdigest()
+
+    with Fetcher() as fetcher:
+        assert fetcher.probe(f"{base_url}/blob") == (len(blob), True)
+        assert fetcher.probe(f"{base_url}/blob-norange") == (len(blob), False)
+
+        _Handler.ranges.clear()
+        path, size, result_digest = fetcher.download_ranged(
+            f"{base_url}/blob", tmp_path / "blob.bin", connections=4, min_part_size=65536
+        )
+        assert path.read_bytes() == blob and size == len(blob)
+        assert result_digest == digest
+        assert sorted(_Handler.ranges)[1:] == sorted(
+            f"bytes={i * 262144}-{(i + 1) * 262144 - 1}" for i in range(4)
+        )
+
+        # 不支持 Range 时退回单连接下载
+        path, size, result_digest = fetcher.download_ranged(
+            f"{base_url}/blob-norange", tmp_path / "norange.bin", min_part_size=65536
+        )
+        assert result_digest == digest
+
+        with pytest.raises(DownloadError):
+            fetcher.download_ranged(
+                f"{base_url}/blob", tmp_path / "bad.bin", min_part_size=65536,
+                expected_hash="0" * 64,
+            )
+        assert not (tmp_path / "bad.bin").exists()
+
+
+def test_async_download_ranged(http_server, tmp_path):
+    import hashlib
+    from celestialvault.instances.inst_error import DownloadError
+
+    base_url, _ = http_server
+    blob = _Handler.blob
+    digest = hashlib.sha256(blob).hexdigest()
+
+    async def main():
+        async with AsyncFetcher() as fetcher:
+            assert await fetcher.probe(f"{base_url}/blob") == (len(blob), True)
+
+            _Handler.ranges.clear()
+            ranged = await fetcher.download_ranged(
+                f"{base_url}/blob", tmp_path / "blob.bin", connections=4, min_part_size=65536
+            )
+            assert sorted(_Handler.ranges)[1:] == sorted(
+                f"bytes={i * 262144}-{(i + 1) * 262144 - 1}" for i in range(4)
+            )
+            # 不支持 Range 时退回单连接下载
+            fallback = await fetcher.download_ranged(
+                f"{base_url}/blob-norange", tmp_path / "norange.bin", min_part_size=65536
+            )
+            with pytest.raises(DownloadError):
+                await fetcher.download_ranged(
+                    f"{base_url}/blob", tmp_path / "bad.bin", min_part_size=65536,
+                    expected_hash="0" * 64,
+                )
+            return ranged, fallback
+
+    for path, size, result_digest in asyncio.run(main()):
+        assert path.read_bytes() == blob and size == len(blob)
+        assert result_digest == digest
+    assert not (tmp_path / "bad.bin").exists()
+    assert not (tmp_path / "bad.bin.part").exists()
+
+
+def test_response_cache(http_server, tmp_path):
+    from celestialvault.instances.inst_cache import ResponseCache
+    from celestialvault.instances.inst_fetch import Fetcher
+
+    base_url, _ = http_server
+    url = f"{base_url}/etag/page"
+    with ResponseCache(tmp_path / "cache") as cache:
+        with Fetcher(cache=cache) as fetcher:
+            assert fetcher.getContent(url) == b"/etag/page" * 100
+            assert len(cache) == 1
+            # 第二次请求得到 304，内容来自缓存
+            assert fetcher.getContent(url) == b"/etag/page" * 100
+            # 不带校验头的响应不缓存
+            fetcher.getContent(f"{base_url}/plain")
+            assert len(cache) == 1
+
+        async def main():
+            async with AsyncFetcher(cache=cache) as fetcher:
+                return await fetcher.getText(url)
+
+        assert asyncio.run(main()) == "/etag/page" * 100
+        key = cache.make_key("GET", url)
+        assert cache.get_validators(key) == {"If-None-Match": '"/etag/page-v1"'}
+
+    # 重新打开缓存后仍然有效；超过大小上限时淘汰最久未访问的条目
+    with ResponseCache(tmp_path / "cache", max_size=2000) as cache:
+        assert len(cache) == 1
+        with Fetcher(cache=cache) as fetcher:
+            fetcher.getContent(f"{base_url}/etag/other")
+        assert key not in cache
+        assert cache.total_size == 1100
+    logging.info(f"ETag hits: {_Handler.hits}")
+
+
+def test_response_cache_missing_blob(http_server, tmp_path):
+    from celestialvault.instances.inst_cache import ResponseCache
+    from celestialvault.instances.inst_fetch import Fetcher
+
+    base_url, _ = http_server
+    url = f"{base_url}/etag/lost"
+    body = b"/etag/lost" * 100
+    with ResponseCache(tmp_path / "cache") as cache:
+        key = cache.make_key("GET", url)
+        get_validators = cache.get_validators
+
+        def evict_after_validators(key):
+            # 取得校验头之后响应体才被淘汰，服务器返回的 304 没有内容可用
+            validators = get_validators(key)
+            cache._blob_path(key).unlink(missing_ok=True)
+            return validators
+
+        with Fetcher(cache=cache) as fetcher:
+            assert fetcher.getContent(url) == body
+            # 响应体丢失时不再发送条件请求
+            cache._blob_path(key).unlink()
+            assert cache.get_validators(key) == {}
+            assert fetcher.getContent(url) == body
+
+            cache.get_validators = evict_after_validators
+            hits = _Handler.hits[url[len(base_url):]]
+            assert fetcher.getContent(url) == body
+            assert _Handler.hits[url[len(base_url):]] == hits + 2
+
+        async def main():
+            async with AsyncFetcher(cache=cache) as fetcher:
+                return await fetcher.getContent(url)
+
+        assert asyncio.run(main()) == body
@@ -46,3 +46,20 @@ def test_fd_dict():
     str_0_dict = str_to_dict(str_0, line_delimiter=";", key_value_delimiter="=")
     str_1_dict = str_to_dict(str_1, line_delimiter=";", key_value_delimiter="=")
     findiffer.fd_dict(str_0_dict, str_1_dict)
+
+
+def test_fd_str_lines():
+    findiffer = Findiffer("[", "]", "[]")
+    lines = [f"第{i}行：天地玄黄，宇宙洪荒。" for i in range(2000)]
+    revised = lines[:10] + ["插入的新行"] + lines[10:500] + [lines[500] + "改"] + lines[501:]
+
+    opcodes = findiffer.get_opcodes(lines, revised)
+    assert opcodes == [
+        ("equal", 0, 10, 0, 10),
+        ("insert", 10, 10, 10, 11),
+        ("equal", 10, 500, 11, 501),
+        ("replace", 500, 501, 501, 502),
+        ("equal", 501, 2000, 502, 2001),
+    ]
+    print("\n")
+    findiffer.fd_str("\n".join(lines), "\n".join(revised), "\n")
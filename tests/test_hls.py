@@ -0,0 +1,130 @@
+import pytest, logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import pad
+
+from celestialvault.instances.inst_error import DownloadError
+from celestialvault.instances.inst_hls import HLSDownloader, parse_m3u8
+
+KEY = bytes(range(16))
+EXPLICIT_IV = bytes(range(16, 32))
+SEGMENTS = [bytes([i]) * (1000 + i * 37) for i in range(6)]
+
+
+def _build_files():
+    files = {
+        "/master.m3u8": (
+            "#EXTM3U\n"
+            "#EXT-X-STREAM-INF:BANDWIDTH=100000\nlow/index.m3u8\n"
+            "#EXT-X-STREAM-INF:BANDWIDTH=900000,RESOLUTION=1280x720\nhigh/index.m3u8\n"
+        ).encode(),
+        "/high/key.bin": KEY,
+    }
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:10"]
+    for i, data in enumerate(SEGMENTS):
+        sequence = 10 + i
+        if i == 2:
+            # 隐式 IV：使用分段序号
+            lines.append('#EXT-X-KEY:METHOD=AES-128,URI="key.bin"')
+        elif i == 4:
+            lines.append(
+                f'#EXT-X-KEY:METHOD=AES-128,URI="/high/key.bin",IV=0x{EXPLICIT_IV.hex()}'
+            )
+        elif i == 5:
+            lines.append("#EXT-X-KEY:METHOD=NONE")
+
+        if 2 <= i <= 3:
+            iv = sequence.to_bytes(16, "big")
+            data = AES.new(KEY, AES.MODE_CBC, iv).encrypt(pad(data, 16))
+        elif i == 4:
+            data = AES.new(KEY, AES.MODE_CBC, EXPLICIT_IV).encrypt(pad(data, 16))
+        lines += ["#EXTINF:4.0,", f"seg{i}.ts"]
+        files[f"/high/seg{i}.ts"] = data
+    lines.append("#EXT-X-ENDLIST")
+    files["/high/index.m3u8"] = "\n".join(lines).encode()
+    return files
+
+
+class _Handler(BaseHTTPRequestHandler):
+    files = _build_files()
+    hits = {}
+    broken = set()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        data = self.files.get(self.path)
+        if data is None or self.path in self.broken:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def hls_server():
+    _Handler.hits.clear()
+    _Handler.broken.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", _Handler
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_m3u8():
+    files = _build_files()
+    base_url = "http://example.com/high/index.m3u8"
+    playlist = parse_m3u8(files["/high/index.m3u8"].decode(), base_url)
+
+    assert not playlist.is_master
+    assert [segment.sequence for segment in playlist.segments] == list(range(10, 16))
+    assert playlist.segments[0].key is None
+    assert playlist.segments[3].key.uri == "http://example.com/high/key.bin"
+    assert playlist.segments[3].get_iv() == (13).to_bytes(16, "big")
+    assert playlist.segments[4].get_iv() == EXPLICIT_IV
+    assert playlist.segments[5].key is None
+
+    master = parse_m3u8(files["/master.m3u8"].decode(), "http://example.com/master.m3u8")
+    assert master.get_best_variant() == "http://example.com/high/index.m3u8"
+
+    with pytest.raises(ValueError):
+        parse_m3u8("<html></html>", base_url)
+
+
+def test_hls_download_and_resume(hls_server, tmp_path):
+    base_url, handler = hls_server
+    output_path = tmp_path / "video.ts"
+    downloader = HLSDownloader(max_workers=4, max_retries=1)
+
+    # 第一次下载：一个分段始终失败，其余分段应保留下来
+    handler.broken.add("/high/seg3.ts")
+    with pytest.raises(DownloadError):
+        downloader.download(f"{base_url}/master.m3u8", output_path)
+    assert not output_path.exists()
+    assert (tmp_path / "video.ts.segments" / "manifest.jsonl").exists()
+
+    handler.broken.clear()
+    hits_before = dict(handler.hits)
+    path, size = downloader.download(f"{base_url}/master.m3u8", output_path)
+
+    assert path.read_bytes() == b"".join(SEGMENTS)
+    assert size == sum(map(len, SEGMENTS))
+    assert not (tmp_path / "video.ts.segments").exists()
+    # 续传时只重新下载失败的分段，密钥只下载一次
+    for i in (0, 1, 2, 4, 5):
+        assert handler.hits[f"/high/seg{i}.ts"] == hits_before[f"/high/seg{i}.ts"]
+    assert handler.hits["/high/seg3.ts"] > hits_before["/high/seg3.ts"]
+    assert handler.hits["/high/key.bin"] == 1
+    logging.info(f"HLS requests: {handler.hits}")
@@ -1,6 +1,6 @@
 import pytest, logging
 from pathlib import Path
-from celestialvault.instances.inst_imgcodecs import CODEC_REGISTRY
+from celestialvault.instances.inst_imgcodecs import CODEC_REGISTRY, ChannelCodec
 
 
 def test_codecs_text():
@@ -55,6 +55,25 @@ def test_codecs_bytes():
     assert not exist_error, "Some codecs failed during bytes encoding/decoding."
 
 
+def test_codecs_compression():
+    """
+    测试不同压缩算法编码的图像都能自动识别并解码
+    """
+    sample_text = "压缩算法测试 compression test\n" * 200
+    codec = ChannelCodec("RGB", 3)
+    codec.show_progress = False
+
+    sizes = {}
+    for compression in ("zlib", "bz2", "lzma", "auto"):
+        codec.compression = compression
+        img = codec.encode_text(sample_text)
+        sizes[compression] = img.size
+        codec.compression = "zlib"
+        assert codec.decode_text(img) == sample_text
+
+    logging.info(f"Image sizes: {sizes}")
+
+
 def test_codecs_txt_file():
     """
     测试所有 codec 是否能正确进行 文本文件 -> 图像 -> 文本文件 的编解码
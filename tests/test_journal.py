@@ -0,0 +1,118 @@
+import pytest, logging
+import os
+import shutil
+
+from celestialvault.instances.inst_journal import JobJournal
+from celestialvault.tools.FileOperations import handle_item
+
+
+def test_job_journal_resume(tmp_path):
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    sources = []
+    for i in range(5):
+        source = source_dir / f"file_{i}.txt"
+        source.write_text("x" * (i + 1))
+        sources.append(source)
+
+    output_dir = tmp_path / "output"
+    journal_path = tmp_path / "output.journal.jsonl"
+    calls = []
+
+    def action(source, destination):
+        calls.append(source)
+        shutil.copy2(source, destination)
+
+    with JobJournal(journal_path) as journal:
+        for source in sources[:3]:
+            handle_item(source, output_dir / source.name, action, {}, journal)
+
+    # 模拟崩溃：一条写了一半的日志，以及一个写了一半的临时输出
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"source": "trunc')
+    JobJournal.temp_path(output_dir / sources[3].name).write_text("partial")
+    # 启用日志之前生成的输出：没有记录，开启 adopt_existing 时视为已完成而不是重新生成
+    (output_dir / sources[4].name).write_text("legacy")
+
+    calls.clear()
+    with JobJournal(journal_path, adopt_existing=True) as journal:
+        assert len(journal) == 3
+        results = [
+            handle_item(source, output_dir / source.name, action, {}, journal)
+            for source in sources
+        ]
+        assert len(journal) == 5
+
+    assert calls == [sources[3]]
+    assert results[0].endswith("already done.")
+    assert results[4].endswith("already done.")
+    for source in sources[:4]:
+        assert (output_dir / source.name).read_text() == source.read_text()
+    assert (output_dir / sources[4].name).read_text() == "legacy"
+    assert not list(output_dir.glob(".*.part*"))
+
+    # 源文件变化后重新处理
+    sources[0].write_text("changed!")
+    with JobJournal(journal_path) as journal:
+        assert not journal.is_done(sources[0], output_dir / sources[0].name)
+    logging.info(journal_path.read_text())
+
+
+def test_job_journal_dir_output(tmp_path):
+    source = tmp_path / "archive.bin"
+    source.write_bytes(b"data")
+    destination = tmp_path / "out" / "archive_unzip"
+
+    def action(source, destination):
+        assert destination.is_dir()
+        (destination / "member.txt").write_bytes(source.read_bytes())
+        return 4
+
+    with JobJournal(tmp_path / "job.jsonl") as journal:
+        assert handle_item(source, destination, action, {}, journal) == 4
+        assert journal.is_done(source, destination)
+    assert (destination / "member.txt").read_bytes() == b"data"
+
+    # 没有记录的已有输出文件夹不会被删除
+    legacy_source = tmp_path / "legacy.bin"
+    legacy_source.write_bytes(b"old")
+    legacy = tmp_path / "out" / "legacy_unzip"
+    legacy.mkdir()
+    (legacy / "kept.txt").write_bytes(b"kept")
+    with JobJournal(tmp_path / "job.jsonl", adopt_existing=True) as journal:
+        assert handle_item(legacy_source, legacy, action, {}, journal).endswith("already done.")
+        assert journal.is_done(legacy_source, legacy)
+    assert [path.name for path in legacy.iterdir()] == ["kept.txt"]
+
+
+def test_job_journal_adopt_existing(tmp_path):
+    source = tmp_path / "a.txt"
+    source.write_text("source")
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    calls = []
+
+    def action(source, destination):
+        calls.append(source)
+        shutil.copy2(source, destination)
+
+    # 默认不接管没有记录的已有输出，重新生成
+    (output_dir / "a.txt").write_text("legacy")
+    with JobJournal(tmp_path / "default.jsonl") as journal:
+        assert not journal.seed(source, output_dir / "a.txt")
+        handle_item(source, output_dir / "a.txt", action, {}, journal)
+    assert calls == [source]
+    assert (output_dir / "a.txt").read_text() == "source"
+
+    # 开启后也不接管空输出，以及早于源文件修改时间的输出
+    empty = output_dir / "empty.txt"
+    empty.touch()
+    stale = output_dir / "stale.txt"
+    stale.write_text("stale")
+    os.utime(stale, ns=(0, source.stat().st_mtime_ns - 1))
+    with JobJournal(tmp_path / "adopt.jsonl", adopt_existing=True) as journal:
+        assert not journal.seed(source, empty)
+        assert not journal.seed(source, stale)
+        assert journal.seed(source, output_dir / "a.txt")
+        # 已有记录的源文件不再接管
+        assert not journal.seed(source, output_dir / "a.txt")
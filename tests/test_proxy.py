@@ -0,0 +1,205 @@
+import pytest, logging
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from celestialvault.instances import inst_fetch
+from celestialvault.instances.inst_fetch import Fetcher
+from celestialvault.instances.inst_proxy import ProxyPool
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    """模拟的 HTTP 代理：直接以自身端口作为响应内容，不真正转发。"""
+
+    def do_GET(self):
+        body = f"{self.server.server_address[1]} {self.path}".encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def proxy_servers():
+    servers = [ThreadingHTTPServer(("127.0.0.1", 0), _ProxyHandler) for _ in range(2)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield [server.server_address[1] for server in servers]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class _ClashHandler(BaseHTTPRequestHandler):
+    """
+    模拟的 Clash：同一个端口既是 API（/proxies）又是混合代理端口。
+    代理请求以当前 GLOBAL 选中的节点作为响应内容，节点 a 被目标站点拒绝（403）。
+    """
+
+    selected = ["a"]
+    switches = []
+
+    def _send(self, status, body=b""):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/proxies":
+            delay = {"http://www.gstatic.com/generate_204": {"history": [{"delay": 50}]}}
+            proxies = {
+                "GLOBAL": {"all": ["DIRECT", "b", "a"]},
+                "a": {"extra": delay},
+                "b": {},
+            }
+            return self._send(200, json.dumps({"proxies": proxies}).encode())
+        node = self.selected[0]
+        time.sleep(0.02)
+        self._send(403 if node == "a" else 200, f"{node} {self.path}".encode())
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.selected[0] = json.loads(body)["name"]
+        self.switches.append(self.selected[0])
+        self._send(204)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def clash_server(monkeypatch):
+    monkeypatch.setattr(inst_fetch, "PROXY_SWITCH_DELAY", 0)
+    _ClashHandler.selected[:] = ["a"]
+    _ClashHandler.switches.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ClashHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    yield f"http://127.0.0.1:{port}", port
+    server.shutdown()
+    server.server_close()
+
+
+def _get_closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_proxy_pool_weighting():
+    pool = ProxyPool(
+        {"fast": "http://127.0.0.1:1", "slow": "http://127.0.0.1:2"},
+        latencies={"fast": 0.1, "slow": 2.0},
+    )
+    picks = []
+    for _ in range(200):
+        name = pool.acquire()
+        pool.release(name, 0.1 if name == "fast" else 2.0)
+        picks.append(name)
+    assert picks.count("fast") > picks.count("slow") * 3
+
+    for _ in range(10):
+        pool.release(pool.acquire({"slow"}), error=True)
+    stats = pool.get_stats()
+    assert stats["fast"]["error"] > 0.9
+    assert stats["fast"]["in_flight"] == 0
+    # 全部被排除时仍然返回一个代理
+    assert pool.acquire({"fast", "slow"}) in ("fast", "slow")
+
+    with pytest.raises(ValueError):
+        ProxyPool({})
+
+
+def test_fetcher_with_proxy_pool(proxy_servers):
+    dead_port = _get_closed_port()
+    proxies = {f"node-{port}": f"http://127.0.0.1:{port}" for port in proxy_servers}
+    proxies["dead"] = f"http://127.0.0.1:{dead_port}"
+    pool = ProxyPool(proxies, latencies={"dead": 0.01})
+
+    with Fetcher(proxy_pool=pool, max_repeat=5) as fetcher:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            texts = list(
+                executor.map(
+                    lambda i: fetcher.getText(f"http://example.test/page/{i}"),
+                    range(40),
+                )
+            )
+
+    used_ports = {text.split()[0] for text in texts}
+    assert used_ports == {str(port) for port in proxy_servers}
+    assert texts[7].endswith("/page/7")
+
+    stats = pool.get_stats()
+    assert stats["dead"]["error"] > 0
+    assert all(stat["in_flight"] == 0 for stat in stats.values())
+    logging.info(f"Proxy stats: {stats}")
+
+
+def test_async_fetcher_with_proxy_pool(proxy_servers):
+    import asyncio
+    from celestialvault.instances.inst_fetch import AsyncFetcher
+
+    pool = ProxyPool({f"node-{port}": f"http://127.0.0.1:{port}" for port in proxy_servers})
+
+    async def main():
+        async with AsyncFetcher(proxy_pool=pool) as fetcher:
+            return await asyncio.gather(
+                *(fetcher.getText(f"http://example.test/async/{i}") for i in range(20))
+            )
+
+    texts = asyncio.run(main())
+    assert {text.split()[0] for text in texts} <= {str(port) for port in proxy_servers}
+    assert texts[3].endswith("/async/3")
+    assert all(stat["in_flight"] == 0 for stat in pool.get_stats().values())
+
+
+def test_fetcher_switches_clash_selector(clash_server):
+    import asyncio
+    from celestialvault.instances.inst_fetch import AsyncFetcher
+
+    clash_api, port = clash_server
+    with Fetcher(use_proxy=True, clash_api=clash_api, clash_proxy_port=port) as fetcher:
+        # 未给出代理池时沿用单端口模式，节点按测速延迟排序
+        assert fetcher.proxy_pool is None and fetcher.proxy_list == ["a", "b"]
+        first_client = fetcher.cl
+        text = fetcher.getText("http://example.test/page")
+        assert first_client.is_closed and fetcher.cl is not first_client
+    assert text == "b http://example.test/page"
+    assert _ClashHandler.switches == ["b"]
+
+    async def main():
+        async with AsyncFetcher(
+            use_proxy=True, clash_api=clash_api, clash_proxy_port=port
+        ) as fetcher:
+            return await fetcher.getText("http://example.test/async")
+
+    _ClashHandler.selected[:] = ["a"]
+    assert asyncio.run(main()) == "b http://example.test/async"
+    assert _ClashHandler.switches == ["b", "b"]
+
+
+def test_selector_switch_across_threads(clash_server):
+    clash_api, port = clash_server
+    fetcher = Fetcher(use_proxy=True, clash_api=clash_api, clash_proxy_port=port)
+
+    with fetcher, ThreadPoolExecutor(max_workers=8) as executor:
+        first_client = fetcher.cl
+        texts = list(
+            executor.map(
+                lambda i: fetcher.getText(f"http://example.test/page/{i}"), range(32)
+            )
+        )
+        # 同一节点上同时失败的请求只触发一次切换；旧客户端在最后一个请求结束后关闭
+        assert _ClashHandler.switches == ["b"]
+        assert first_client.is_closed and fetcher.cl is not first_client
+        assert not fetcher._retired_clients
+
+    assert all(text.startswith("b ") for text in texts)
+    assert texts[9].endswith("/page/9")
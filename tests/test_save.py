@@ -26,3 +26,31 @@ def test_saver():
     # saver.fetch_threader.set_execution_mode('async')
     # saver.fetch_threader.start(task_list)
     # logging.info(f"Task result: {saver.fetch_threader.result_dict}.")
+
+
+def test_saver_write_behind(tmp_path):
+    import pandas as pd
+
+    data = {"name": "天", "values": [1, 2, 3]}
+    dataframe = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+
+    direct = Saver(tmp_path / "direct")
+    with Saver(tmp_path / "behind", write_behind=True, max_pending=4) as saver:
+        for i in range(50):
+            path, size = saver.save_content(bytes([i]) * (i + 1), f"blob_{i}", ".bin")
+            assert size == i + 1
+        # 尚未落盘的文件同样受覆盖保护
+        assert saver.save_content(b"other", "blob_49", ".bin")[1] is None
+
+        for target in (direct, saver):
+            target.save_text("line1\nline2\n", "text", file_suffix=".txt")
+            target.save_json(data, "data", ".json", encoding="utf-8")
+            target.save_dataframe(dataframe, "frame", ".csv")
+            target.save_pickle(data, "obj", ".pkl")
+        saver.flush()
+
+        for name in ("text.txt", "data.json", "frame.csv", "obj.pkl"):
+            assert (tmp_path / "behind" / name).read_bytes() == (tmp_path / "direct" / name).read_bytes()
+
+    assert (tmp_path / "behind" / "blob_49.bin").read_bytes() == bytes([49]) * 50
+    assert pd.read_csv(tmp_path / "behind" / "frame.csv", encoding="utf-8-sig").equals(dataframe)
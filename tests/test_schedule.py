@@ -0,0 +1,72 @@
+import pytest, logging
+import threading
+import time
+
+from celestialvault.instances.inst_schedule import PriorityGate, RulePolicy, RuleScheduler
+
+
+def test_rule_policy():
+    default = RulePolicy(execution_mode="process", resource="cpu")
+    policy = RulePolicy.from_options({"max_workers": 2, "priority": 3}, default)
+    assert policy == RulePolicy("process", 2, 3, "cpu")
+    assert RulePolicy("serial", max_workers=8).get_concurrency() == 1
+
+    with pytest.raises(ValueError):
+        RulePolicy.from_options({"workers": 2})
+    with pytest.raises(ValueError):
+        RulePolicy(execution_mode="async")
+
+
+def test_priority_gate():
+    gate = PriorityGate(1)
+    order = []
+    gate.acquire()
+
+    def worker(priority):
+        with gate.slot(priority):
+            order.append(priority)
+
+    threads = []
+    for priority in (0, 5, 1):
+        thread = threading.Thread(target=worker, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)
+
+    gate.release()
+    for thread in threads:
+        thread.join()
+    assert order == [5, 1, 0]
+
+
+def test_rule_scheduler_budget():
+    lock = threading.Lock()
+    running = {"img": 0, "video": 0, "copy": 0, "cpu": 0, "io": 0}
+    peak = dict(running)
+
+    def job(kind, resource):
+        with lock:
+            for key in (kind, resource):
+                running[key] += 1
+                peak[key] = max(peak[key], running[key])
+        time.sleep(0.01)
+        with lock:
+            running[kind] -= 1
+            running[resource] -= 1
+        return kind
+
+    img = RulePolicy("thread", resource="cpu")
+    video = RulePolicy("thread", max_workers=2, resource="cpu", priority=2)
+    copy = RulePolicy("thread", resource="io")
+
+    with RuleScheduler(cpu_budget=3, io_budget=6) as scheduler:
+        futures = [scheduler.submit(img, job, "img", "cpu") for _ in range(20)]
+        futures += [scheduler.submit(video, job, "video", "cpu") for _ in range(10)]
+        futures += [scheduler.submit(copy, job, "copy", "io") for _ in range(40)]
+        results = [future.result() for future in futures]
+
+    assert results.count("copy") == 40
+    assert peak["video"] <= 2
+    assert peak["cpu"] <= 3
+    assert peak["io"] <= 6
+    logging.info(f"Peak concurrency: {peak}")
@@ -1,6 +1,14 @@
 import pytest, logging
+import random
+from concurrent.futures import ProcessPoolExecutor
+from html import unescape
 from time import time
+from urllib.parse import unquote
+
+import regex as re
+
 from celestialvault.instances.inst_sub import Suber
+from celestialvault.tools.TextTools import pro_slash
 
 
 def test_suber():
@@ -64,5 +72,90 @@ def test_suber():
     # print(list(sub_text_1))
 
 
+def _clear_text_by_rules(suber, text):
+    """逐条规则在整段文本上执行 re.sub，作为对照。"""
+    text = unquote(unescape(pro_slash(text)))
+    for pattern, repl in suber.sub_text_list:
+        text = re.sub(pattern, repl, text, flags=re.S)
+    return text.strip()
+
+
+def test_suber_compiled_chunks():
+    random.seed(0)
+    pieces = list("ab第章节作者：字数20。」】#◆*…—（【 　\t\r\x150") + [
+        "\n", "\n", "\n\n", "\n\n\n", "章节", "作者：", "字数：1", "2023年", "&amp;",
+    ]
+    suber = Suber()
+    # 未合并字符分支、未改写后顾的原始换行规则
+    original = (
+        f"(?<!{suber.both_check_chars}|{suber.lookahead_only_chars})(\n+)"
+        f"(?!{suber.both_check_chars}|{suber.lookbehind_only_chars})"
+    )
+    rules = [(original, ""), ("(?<!\n)\n(?!\n)", "\n\n")] + suber.special_character_removal
+    for _ in range(500):
+        text = "".join(random.choice(pieces) for _ in range(random.randint(0, 200)))
+        expected = _clear_text_by_rules(Suber(), text)
+        for chunk_size in (1, 7, 1 << 16):
+            assert Suber(chunk_size).clear_text(text) == expected
+        for pattern, repl in rules:
+            steps = Suber._compile_steps([(pattern, repl)], re.S)
+            assert Suber._run_steps(text, steps) == re.sub(pattern, repl, text, flags=re.S)
+
+    book = "".join(
+        random.choice(["这是一段普通的文本。", "\n", "\n\n", "第十章 开始\n", "　　", "作者：某人\n"])
+        for _ in range(50000)
+    )
+    suber = Suber(chunk_size=4096)
+    start = time()
+    result = suber.clear_text(book)
+    logging.info(f"Clear {len(book)} chars in {time() - start:.3f}s")
+    assert result == _clear_text_by_rules(suber, book)
+    assert suber.sub_name("a:b/c*d?.txt") == "a_b_c_d_txt"
+
+
+def test_suber_process_pool(tmp_path):
+    random.seed(1)
+    book = "".join(
+        random.choice(["这是一段普通的文本。", "\n", "\n\n", "第十章 开始\n", "\t", "作者：某人\n"])
+        for _ in range(20000)
+    )
+    suber = Suber(parallel_chunk_size=10000)
+    expected = suber.clear_text(book)
+
+    book_path = tmp_path / "book.txt"
+    book_path.write_text(book, encoding="utf-8")
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert suber.clear_text(book, executor) == expected
+        assert suber.clear_text(book[:5000], executor) == suber.clear_text(book[:5000])
+        suber.clear_book(book_path, tmp_path / "book_re.txt", executor)
+    assert (tmp_path / "book_re.txt").read_text(encoding="utf-8") == expected
+
+
+def test_suber_streaming(tmp_path):
+    random.seed(2)
+    pieces = list("ab第章。」#◆ 　\t\r\\/") + ["\n", "\n\n", "\n\n\n", "作者：", "20", "&amp;", "%E4%B8%AD"]
+    suber = Suber(chunk_size=8)
+    for _ in range(500):
+        text = "".join(random.choice(pieces) for _ in range(random.randint(0, 150)))
+        cuts = sorted(random.sample(range(len(text) + 1), min(len(text) + 1, 6)))
+        parts = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+        assert "".join(suber.iter_clear_text(parts)) == suber.clear_text(text)
+
+    book = "".join(
+        random.choice(["这是一段普通的文本。", "\n", "\n\n", "第十章 开始\n", "\t", "作者：某人\n"])
+        for _ in range(20000)
+    )
+    book_path = tmp_path / "book.txt"
+    book_path.write_text(book, encoding="gb18030")
+    suber = Suber(chunk_size=1000, parallel_chunk_size=5000)
+    expected = suber.clear_text(book)
+
+    suber.clear_book(book_path, tmp_path / "book_re.txt")
+    assert (tmp_path / "book_re.txt").read_text(encoding="utf-8") == expected
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        streamed = suber.iter_clear_text([book[i : i + 3000] for i in range(0, len(book), 3000)], executor)
+        assert "".join(streamed) == expected
+
+
 if __name__ == "__main__":
     test_suber()